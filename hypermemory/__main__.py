@@ -3,6 +3,7 @@ from __future__ import annotations
 import argparse
 import json
 import os
+import sys
 
 from .config import Config
 
@@ -17,15 +18,45 @@ def cmd_doctor(args: argparse.Namespace) -> int:
 
 
 def cmd_eval(args: argparse.Namespace) -> int:
-    from .eval import run_eval
+    from dataclasses import asdict
+    from pathlib import Path
+
+    from .eval import compare_runs, run_eval, to_json
+
+    def load(path: str) -> dict:
+        return json.loads(Path(path).expanduser().read_text(encoding="utf-8"))
+
+    if args.compare and len(args.compare) > 2:
+        raise SystemExit("--compare takes BASE.json [CUR.json]")
+    if args.compare and len(args.compare) == 2:
+        print(json.dumps(compare_runs(load(args.compare[0]), load(args.compare[1])), ensure_ascii=False, indent=2))
+        return 0
 
     cfg = Config.from_env(args.workspace)
     min_recall = int(os.environ.get("MIN_RECALL", "0"))
-    res = run_eval(cfg, fast=args.fast, min_recall=min_recall)
+    res = run_eval(cfg, fast=args.fast, min_recall=min_recall, workers=args.workers or None)
+
+    if args.out:
+        Path(args.out).expanduser().write_text(to_json(res) + "\n", encoding="utf-8")
+    if args.compare:
+        print(json.dumps(compare_runs(load(args.compare[0]), asdict(res)), ensure_ascii=False, indent=2))
+        return 0
+    if args.json:
+        print(to_json(res))
+        return 0
 
     print("\n== summary ==")
     print(f"total={res.total} pass={res.passed} fail={res.failed} recall={res.recall_pct}%")
     print(f"pass_retrieve={res.pass_retrieve} pass_file={res.pass_file}")
+    if res.quality:
+        print("\n== ranking (expected-mode cases) ==")
+        for cat, q in res.quality.items():
+            metrics = " ".join(f"{k}={v:.3f}" for k, v in q.items() if k != "n")
+            print(f"{cat:<16} n={int(q['n']):<4} {metrics}")
+    if res.latency:
+        print(f"\n== latency ms (workers={res.workers}) ==")
+        for layer, st in res.latency.items():
+            print(f"{layer:<7} n={st['n']:<4} p50={st['p50']:.1f} p95={st['p95']:.1f} p99={st['p99']:.1f} max={st['max']:.1f}")
 
     return 0
 
@@ -50,12 +81,22 @@ def cmd_search(args: argparse.Namespace) -> int:
 
 
 def cmd_retrieve(args: argparse.Namespace) -> int:
+    from dataclasses import asdict
+
     from .retrieval import retrieve
+    from .tracing import TraceConfig, format_tree
 
     cfg = Config.from_env(args.workspace)
-    hits = retrieve(cfg.workspace, args.query, mode=args.mode, limit=10)
+    trace: dict | None = {} if args.trace or TraceConfig.from_env().enabled else None
+    hits = retrieve(cfg.workspace, args.query, mode=args.mode, limit=10, trace=trace)
+    if args.json:
+        print(json.dumps({"hits": [asdict(h) for h in hits], "trace": trace}, ensure_ascii=False, indent=2))
+        return 0
     for h in hits:
         print(f"[{h.score:.4f}] {h.why} {h.snippet}")
+    if trace:
+        print("\n== trace ==")
+        print(format_tree(trace))
     return 0
 
 
@@ -80,12 +121,15 @@ def cmd_cloud(args: argparse.Namespace) -> int:
         return 0
 
     if args.action == "pull":
-        p = pull_curated(cfg.workspace, ccfg, limit=args.limit)
+        if args.limit is not None:
+            # before delta sync, --limit capped pull at the newest N rows
+            print("cloud pull: --limit is ignored (pull syncs every new row); use --page-size", file=sys.stderr)
+        p = pull_curated(cfg.workspace, ccfg, page_size=args.page_size)
         print(str(p))
         return 0
 
     if args.action == "search":
-        for line in search_curated(ccfg, args.query, limit=args.limit):
+        for line in search_curated(ccfg, args.query, limit=args.limit or 200, mode=args.search_mode):
             print(line)
         return 0
 
@@ -112,6 +156,78 @@ def cmd_journal(args: argparse.Namespace) -> int:
     raise SystemExit("unknown journal action")
 
 
+def cmd_benchmark(args: argparse.Namespace) -> int:
+    from pathlib import Path
+
+    from .benchmark import WorkspaceSpec, run_scaling
+
+    base = WorkspaceSpec(
+        days=args.days,
+        bullets_per_day=args.bullets,
+        journal_events=args.events,
+        curated_items=args.curated,
+        entity_density=args.entity_density,
+        seed=args.seed,
+    )
+    scales = [float(x) for x in args.scales.split(",") if x.strip()]
+    keep = Path(args.keep).expanduser() if args.keep else None
+    if keep:
+        keep.mkdir(parents=True, exist_ok=True)
+    res = run_scaling(base, scales, queries=args.queries, appends=args.appends, keep_dir=keep)
+    text = json.dumps(res, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).expanduser().write_text(text + "\n", encoding="utf-8")
+    print(text)
+    return 0
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    from pathlib import Path
+
+    from .export import SOURCES, export_corpus
+
+    cfg = Config.from_env(args.workspace)
+    sources = tuple(s for s in args.sources.split(",") if s)
+    unknown = [s for s in sources if s not in SOURCES]
+    if unknown:
+        raise SystemExit(f"unknown --sources: {','.join(unknown)} (choose from {','.join(SOURCES)})")
+    stats = export_corpus(
+        cfg.workspace,
+        out_dir=Path(args.out).expanduser() if args.out else None,
+        redact=args.redact,
+        strict=args.strict,
+        workers=args.workers or None,
+        max_records=args.max_records,
+        max_bytes=args.max_mb * 1024 * 1024,
+        sources=sources,
+    )
+    print(json.dumps(stats.__dict__, ensure_ascii=False, indent=2))
+    return 0
+
+
+def cmd_metrics(args: argparse.Namespace) -> int:
+    from . import metrics
+
+    cfg = Config.from_env(args.workspace)
+    metrics.REGISTRY.register_collector(metrics.freshness_collector(cfg.workspace))
+
+    if args.action == "dump":
+        print(metrics.exposition(), end="")
+        return 0
+    if args.action == "serve":
+        srv = metrics.make_server(args.addr or None)
+        print(f"serving metrics on {args.addr or os.environ.get('HYPERMEMORY_METRICS_ADDR') or metrics.DEFAULT_ADDR}", flush=True)
+        try:
+            srv.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            srv.server_close()
+        return 0
+
+    raise SystemExit("unknown metrics action")
+
+
 def cmd_entity(args: argparse.Namespace) -> int:
     from .entity_index import build_entity_index, search_entities
 
@@ -147,7 +263,7 @@ def cmd_vector(args: argparse.Namespace) -> int:
     if args.action == "search":
         if not args.query:
             raise SystemExit("--query is required")
-        for line in search_workspace(vcfg, args.query, limit=args.limit):
+        for line in search_workspace(vcfg, args.query, limit=args.limit, workspace=cfg.workspace):
             print(line)
         return 0
 
@@ -164,6 +280,15 @@ def build_parser() -> argparse.ArgumentParser:
 
     s = sub.add_parser("eval", help="Run eval harness")
     s.add_argument("--fast", action="store_true")
+    s.add_argument("--workers", type=int, default=0, help="Parallel cases (default: HYPERMEMORY_EVAL_WORKERS or min(8, CPUs))")
+    s.add_argument("--json", action="store_true", help="Print the full result (per-case + per-layer latency) as JSON")
+    s.add_argument("--out", default="", help="Also write the JSON result to this file")
+    s.add_argument(
+        "--compare",
+        nargs="+",
+        metavar="RUN.json",
+        help="Diff against a saved --out run (BASE.json), or diff two saved runs (BASE.json CUR.json)",
+    )
     s.set_defaults(func=cmd_eval)
 
     s = sub.add_parser("index", help="Build/update local indexes")
@@ -177,13 +302,22 @@ def build_parser() -> argparse.ArgumentParser:
     s = sub.add_parser("retrieve", help="Run retrieval")
     s.add_argument("mode", choices=["auto", "targeted", "broad"])
     s.add_argument("query")
+    s.add_argument("--trace", action="store_true", help="Print per-stage timings (also: HYPERMEMORY_TRACE=1)")
+    s.add_argument("--json", action="store_true", help="Print hits (and the trace, if enabled) as JSON")
     s.set_defaults(func=cmd_retrieve)
 
     s = sub.add_parser("cloud", help="Cloud L3 (BYO pgvector) commands")
     s.add_argument("action", choices=["init", "push", "pull", "search"])
     s.add_argument("--commit", action="store_true", help="For push: actually commit to cloud")
-    s.add_argument("--limit", type=int, default=200)
+    s.add_argument("--limit", type=int, default=None, help="For search: max results (default 200)")
+    s.add_argument("--page-size", type=int, default=200, help="For pull: rows fetched per query")
     s.add_argument("--query", default="")
+    s.add_argument(
+        "--search-mode",
+        choices=["vector", "hybrid"],
+        default=None,
+        help="For search: override HYPERMEMORY_CLOUD_SEARCH_MODE (hybrid = vector + full-text, RRF in SQL)",
+    )
     s.set_defaults(func=cmd_cloud)
 
     s = sub.add_parser("journal", help="Durable WAL journal + projections")
@@ -195,6 +329,45 @@ def build_parser() -> argparse.ArgumentParser:
     s.add_argument("--tail-limit", default="200")
     s.set_defaults(func=cmd_journal)
 
+    s = sub.add_parser("benchmark", help="In-process scaling benchmark on synthetic workspaces (JSON)")
+    s.add_argument("--scales", default="1,2,4", help="Comma-separated multipliers for days/events/curated items")
+    s.add_argument("--days", type=int, default=30)
+    s.add_argument("--bullets", type=int, default=40, help="Bullets per daily file")
+    s.add_argument("--events", type=int, default=2000, help="Journal events")
+    s.add_argument("--curated", type=int, default=200, help="MEMORY.md items")
+    s.add_argument("--entity-density", type=float, default=0.25, help="Fraction of lines carrying an entity")
+    s.add_argument("--seed", type=int, default=0)
+    s.add_argument("--queries", type=int, default=50, help="bm25/retrieve calls per scale")
+    s.add_argument("--appends", type=int, default=200, help="journal append_event calls per scale")
+    s.add_argument("--keep", default="", help="Generate workspaces under this directory and keep them")
+    s.add_argument("--out", default="", help="Also write the JSON result to this file")
+    s.set_defaults(func=cmd_benchmark)
+
+    s = sub.add_parser("export", help="Stream journal + memory corpus to rotating gzip JSONL")
+    s.add_argument(
+        "--redact",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Redact secrets and run the allowlist check on every record (default: on)",
+    )
+    s.add_argument(
+        "--strict",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Drop records that fail the allowlist; --no-strict keeps them, annotated (default: on)",
+    )
+    s.add_argument("--out", default="", help="Output directory (default: memory/export/<utc timestamp>)")
+    s.add_argument("--workers", type=int, default=0, help="Redaction processes (default: CPU count)")
+    s.add_argument("--max-records", type=int, default=100_000, help="Records per output part")
+    s.add_argument("--max-mb", type=int, default=64, help="Uncompressed MB per output part")
+    s.add_argument("--sources", default="memory,daily,journal")
+    s.set_defaults(func=cmd_export)
+
+    s = sub.add_parser("metrics", help="Prometheus text exposition (index freshness + this process's counters)")
+    s.add_argument("action", choices=["serve", "dump"])
+    s.add_argument("--addr", default="", help="host:port or unix:/path.sock (default: HYPERMEMORY_METRICS_ADDR or 127.0.0.1:9464)")
+    s.set_defaults(func=cmd_metrics)
+
     s = sub.add_parser("entity", help="Deterministic entity/fact index (SQLite)")
     s.add_argument("action", choices=["index", "search"])
     s.add_argument("--include-pending", action="store_true")
@@ -202,7 +375,7 @@ def build_parser() -> argparse.ArgumentParser:
     s.add_argument("--query", default="")
     s.set_defaults(func=cmd_entity)
 
-    s = sub.add_parser("vector", help="Local pgvector semantic index/search (curated+distilled only)")
+    s = sub.add_parser("vector", help="Local semantic index/search, pgvector or embedded (curated+distilled only)")
     s.add_argument("action", choices=["index", "search"])
     s.add_argument("--include-pending", action="store_true")
     s.add_argument("--batch", type=int, default=64)
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+"""In-process scaling benchmark on deterministic synthetic workspaces.
+
+`generate_workspace` writes a workspace of a given shape (days × bullets,
+journal events, curated MEMORY.md items, entity density) from a seed; the
+same spec always produces byte-identical files.
+
+`run_benchmark` times, without subprocess overhead:
+- fts.build_index (full rebuild, then a no-op incremental pass)
+- build_entity_index
+- bm25.search and retrieve (per-call percentiles; retrieve per layer)
+- journal.append_event throughput
+
+retrieve runs under `_PINNED_ENV` (no pgvector, embeddings server, cloud
+fallback or tracing), so the numbers cover the local layers only and do not
+depend on the caller's shell.
+
+`run_scaling` repeats this for several scale factors and returns JSON-ready
+curves for regression tracking.
+"""
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+
+from .bm25 import search as bm25_search
+from .entity_index import build_entity_index
+from .eval import LAYERS, _percentile
+from .fts import build_index
+from .journal import append_event
+from .retrieval import retrieve
+
+# 2026-01-01T00:00:00Z; fixed so generated dates/timestamps are reproducible.
+_BASE_TS_MS = 1767225600000
+_DAY_MS = 86_400_000
+
+# None = unset. The synthetic workspace has no embedded vector store, so the
+# vec layer is skipped rather than embedding every query.
+_PINNED_ENV: dict[str, str | None] = {
+    "DATABASE_URL": None,
+    "MF_EMBED_URL": None,
+    "HYPERMEMORY_VECTOR_BACKEND": "embedded",
+    "HYPERMEMORY_CLOUD_FALLBACK": "0",
+    "HYPERMEMORY_TRACE": "0",
+    "HYPERMEMORY_SLOW_QUERY_MS": "0",
+}
+
+_TOPICS = ("deploy", "restart", "migration", "backup", "incident", "review", "upgrade", "rollback", "config", "alert")
+_ERRORS = ("EADDRINUSE", "ECONNREFUSED", "ETIMEDOUT", "ENOSPC", "OOM_KILLED", "SIGTERM_TIMEOUT")
+
+
+@dataclass
+class WorkspaceSpec:
+    days: int = 30
+    bullets_per_day: int = 40
+    journal_events: int = 2000
+    curated_items: int = 200
+    # Fraction of lines that carry an entity (service:port, node, error, path).
+    entity_density: float = 0.25
+    vocab: int = 4000
+    seed: int = 0
+
+    def scaled(self, factor: float) -> "WorkspaceSpec":
+        return replace(
+            self,
+            days=max(1, int(self.days * factor)),
+            journal_events=int(self.journal_events * factor),
+            curated_items=int(self.curated_items * factor),
+        )
+
+
+class _TextGen:
+    def __init__(self, spec: WorkspaceSpec):
+        self.rng = random.Random(spec.seed)
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        self.words = ["".join(self.rng.choices(letters, k=self.rng.randint(3, 10))) for _ in range(spec.vocab)]
+        self.services = [f"{w}-api.service" for w in self.words[:50]]
+        self.nodes = [f"node-{w}" for w in self.words[50:80]]
+        self.density = spec.entity_density
+        self.probes: list[str] = []
+
+    def _entity(self) -> str:
+        r = self.rng.random()
+        if r < 0.4:
+            return f"{self.rng.choice(self.services)} bound to :{self.rng.randint(1024, 65535)}"
+        if r < 0.6:
+            return f"{self.rng.choice(self.nodes)} deployed"
+        if r < 0.8:
+            return f"saw {self.rng.choice(_ERRORS)} on {self.rng.choice(self.nodes)}"
+        return f"config at /etc/{self.rng.choice(self.words)}/{self.rng.choice(self.words)}.conf"
+
+    def line(self) -> str:
+        # Zipf-ish word choice so BM25/FTS see realistic term skew.
+        words = [self.words[min(int(self.rng.paretovariate(1.1)) - 1, len(self.words) - 1)] for _ in range(self.rng.randint(6, 18))]
+        text = f"{self.rng.choice(_TOPICS)}: " + " ".join(words)
+        if self.rng.random() < self.density:
+            ent = self._entity()
+            text += f" ({ent})"
+            if len(self.probes) < 256:
+                self.probes.append(ent)
+        return text
+
+
+def generate_workspace(root: Path, spec: WorkspaceSpec) -> dict:
+    """Write a synthetic workspace under `root` (must be empty or missing)."""
+
+    gen = _TextGen(spec)
+    mem = root / "memory"
+    mem.mkdir(parents=True, exist_ok=True)
+    n_bytes = 0
+
+    lines = ["# MEMORY", ""]
+    for sec in range(max(1, spec.curated_items // 25)):
+        lines += [f"## {gen.rng.choice(_TOPICS).title()} {sec}", ""]
+        lines += [f"- {gen.line()}" for _ in range(min(25, spec.curated_items - sec * 25))]
+        lines.append("")
+    text = "\n".join(lines) + "\n"
+    (root / "MEMORY.md").write_text(text, encoding="utf-8")
+    n_bytes += len(text.encode("utf-8"))
+
+    for d in range(spec.days):
+        day = time.strftime("%Y-%m-%d", time.gmtime((_BASE_TS_MS + d * _DAY_MS) / 1000.0))
+        text = f"# {day}\n\n" + "".join(f"- {gen.line()}\n" for _ in range(spec.bullets_per_day))
+        (mem / f"{day}.md").write_text(text, encoding="utf-8")
+        n_bytes += len(text.encode("utf-8"))
+
+    span = max(1, spec.days) * _DAY_MS
+    with (mem / "journal.jsonl").open("w", encoding="utf-8") as f:
+        for i in range(spec.journal_events):
+            ev = {
+                "ts_ms": _BASE_TS_MS + (i * span) // max(1, spec.journal_events),
+                "channel": gen.rng.choice(("telegram", "slack", "cli")),
+                "session_key": f"s{gen.rng.randint(0, 99)}",
+                "role": gen.rng.choice(("user", "assistant")),
+                "message": gen.line(),
+            }
+            line = json.dumps(ev, ensure_ascii=False) + "\n"
+            f.write(line)
+            n_bytes += len(line.encode("utf-8"))
+
+    return {
+        "files": spec.days + 2,
+        "bytes": n_bytes,
+        "bullets": spec.days * spec.bullets_per_day + spec.curated_items,
+        "events": spec.journal_events,
+        "probes": gen.probes,
+    }
+
+
+def _stats_ms(samples: list[float]) -> dict[str, float]:
+    vals = sorted(samples)
+    if not vals:
+        return {"n": 0}
+    return {
+        "n": len(vals),
+        "mean": round(sum(vals) / len(vals), 3),
+        "p50": round(_percentile(vals, 50), 3),
+        "p95": round(_percentile(vals, 95), 3),
+        "p99": round(_percentile(vals, 99), 3),
+    }
+
+
+def _timed_s(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    return res, round(time.perf_counter() - t0, 4)
+
+
+def _queries(probes: list[str], rng: random.Random, n: int) -> list[str]:
+    if not probes:
+        return ["deploy restart"] * n
+    # Mix exact entity lookups (targeted) with longer topical queries (broad).
+    out = []
+    for i in range(n):
+        p = rng.choice(probes)
+        out.append(p if i % 2 == 0 else f"what happened around {p} and the follow-up discussion?")
+    return out
+
+
+@contextmanager
+def _pinned_env():
+    saved = {k: os.environ.get(k) for k in _PINNED_ENV}
+
+    def apply(values: dict[str, str | None]) -> None:
+        for k, v in values.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+    apply(_PINNED_ENV)
+    try:
+        yield
+    finally:
+        apply(saved)
+
+
+def run_benchmark(ws: Path, queries: list[str], appends: int = 200) -> dict:
+    ws = ws.resolve()
+    out: dict = {}
+
+    res, out["fts_build_s"] = _timed_s(build_index, ws, full_rebuild=True)
+    out["fts_docs"] = res.docs_indexed
+    _, out["fts_noop_s"] = _timed_s(build_index, ws)
+
+    res, out["entity_build_s"] = _timed_s(build_entity_index, ws)
+    out["entity_rows"] = res["rows"]
+
+    samples: list[float] = []
+    for q in queries:
+        t0 = time.perf_counter()
+        bm25_search(ws, q, limit=10)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    out["bm25_ms"] = _stats_ms(samples)
+
+    layer_samples: dict[str, list[float]] = {}
+    with _pinned_env():
+        for q in queries:
+            timings: dict[str, float] = {}
+            retrieve(ws, q, mode="auto", limit=10, timings=timings)
+            for k, v in timings.items():
+                layer_samples.setdefault(k, []).append(v)
+    out["retrieve_ms"] = {k: _stats_ms(layer_samples[k]) for k in LAYERS if k in layer_samples}
+
+    # Last: appends grow the daily files the other stages read.
+    samples = []
+    t_all = time.perf_counter()
+    for i in range(appends):
+        t0 = time.perf_counter()
+        append_event(ws, f"benchmark append {i}", channel="bench", ts_ms=_BASE_TS_MS + i)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    elapsed = time.perf_counter() - t_all
+    out["journal_append"] = {**_stats_ms(samples), "events_per_s": round(appends / elapsed, 1) if elapsed > 0 else 0.0}
+    return out
+
+
+def run_scaling(
+    base: WorkspaceSpec,
+    scales: list[float],
+    queries: int = 50,
+    appends: int = 200,
+    keep_dir: Path | None = None,
+) -> dict:
+    runs = []
+    for scale in scales:
+        spec = base.scaled(scale)
+        root = Path(tempfile.mkdtemp(prefix=f"hm-bench-{scale:g}-", dir=str(keep_dir) if keep_dir else None))
+        try:
+            corpus, gen_s = _timed_s(generate_workspace, root, spec)
+            probes = corpus.pop("probes")
+            qs = _queries(probes, random.Random(spec.seed + 1), queries)
+            run = {"scale": scale, "spec": asdict(spec), "corpus": corpus, "generate_s": gen_s}
+            run.update(run_benchmark(root, qs, appends=appends))
+            if keep_dir:
+                run["workspace"] = str(root)
+            runs.append(run)
+        finally:
+            if not keep_dir:
+                shutil.rmtree(root, ignore_errors=True)
+    return {"base": asdict(base), "queries": queries, "appends": appends, "runs": runs}
@@ -11,6 +11,8 @@ from collections import Counter, defaultdict
 from dataclasses import dataclass
 from pathlib import Path
 
+from . import tracing
+
 WORD_RE = re.compile(r"[A-Za-z0-9_:\./-]{2,}")
 
 
@@ -46,10 +48,18 @@ def search(workspace: Path, query: str, limit: int = 10, k1: float = 1.2, b: flo
     if not q_terms:
         return []
 
-    docs = iter_docs(workspace)
+    with tracing.span("bm25.read") as sp:
+        docs = iter_docs(workspace)
+        if sp is not None:
+            sp.set(docs=len(docs), chars=sum(len(t) for _p, t in docs))
     if not docs:
         return []
 
+    with tracing.span("bm25.score"):
+        return _score(docs, q_terms, limit, k1, b)
+
+
+def _score(docs: list[tuple[str, str]], q_terms: list[str], limit: int, k1: float, b: float) -> list[Bm25Hit]:
     doc_tf: list[Counter[str]] = []
     df: dict[str, int] = defaultdict(int)
     lengths: list[int] = []
@@ -5,15 +5,18 @@ import json
 import os
 import re
 import sys
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List
 
 import psycopg
-from pgvector.psycopg import register_vector
 from pgvector import Vector
+from psycopg import sql
 
+from . import embed_client as _embed_client
+from . import pg_codec, pg_pool, tracing
 from .redaction import redact as _redact, validate_allowlist
 
 M_SCORE_RE = re.compile(r"^\s*-\s*\[M([1-5])\]\s+(.*)$")
@@ -23,23 +26,12 @@ def sha256(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
-def http_json(url: str, payload: dict | None = None, timeout: float = 30.0):
-    if payload is None:
-        req = urllib.request.Request(url, method="GET")
-    else:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method="POST")
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-
 def embed_texts(embed_base_url: str, texts: List[str]) -> List[List[float]]:
-    return http_json(f"{embed_base_url.rstrip('/')}/embed", {"inputs": texts})
+    return _embed_client.embed_texts(embed_base_url, texts)
 
 
 def embed_one(embed_base_url: str, text: str) -> Vector:
-    v = http_json(f"{embed_base_url.rstrip('/')}/embed", {"inputs": [text]})
-    return Vector(v[0])
+    return Vector(_embed_client.embed_one(embed_base_url, text))
 
 
 SCHEMA_SQL = """\
@@ -67,8 +59,37 @@ CREATE TABLE IF NOT EXISTS hm_cloud_embedding (
 
 CREATE INDEX IF NOT EXISTS hm_cloud_item_created_at_idx
   ON hm_cloud_item(namespace, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS hm_cloud_item_pull_cursor_idx
+  ON hm_cloud_item(namespace, created_at, content_sha);
+
+CREATE INDEX IF NOT EXISTS hm_cloud_item_fts_idx
+  ON hm_cloud_item USING gin (to_tsvector('english', content));
 """
 
+# must match the expression of hm_cloud_item_fts_idx
+FTS_DOC = "to_tsvector('english', i.content)"
+FTS_QUERY = "websearch_to_tsquery('english', %s)"
+
+SEARCH_MODES = ("vector", "hybrid")
+
+# hybrid: each ranked list contributes `limit * _HYBRID_DEPTH` candidates to RRF
+_HYBRID_DEPTH = 5
+_RRF_K = 60
+
+
+def _search_mode_from_env() -> str:
+    mode = os.environ.get("HYPERMEMORY_CLOUD_SEARCH_MODE", "vector")
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"HYPERMEMORY_CLOUD_SEARCH_MODE must be one of {SEARCH_MODES}")
+    return mode
+
+
+def _partition_from_env() -> str:
+    spec = os.environ.get("HYPERMEMORY_CLOUD_PARTITION", "none")
+    _parse_partition(spec)
+    return spec
+
 
 @dataclass
 class CloudConfig:
@@ -78,6 +99,13 @@ class CloudConfig:
     embed_url: str = "http://127.0.0.1:8080"
     model_id: str = "local"
     allowlist: bool = True
+    codec: str = "vector"
+    push_batch: int = 64
+    push_concurrency: int = 4
+    pull_overlap_s: float = 60.0
+    dedup: bool = True
+    search_mode: str = "vector"
+    partition: str = "none"
 
     @staticmethod
     def from_env() -> "CloudConfig":
@@ -91,13 +119,188 @@ class CloudConfig:
             embed_url=os.environ.get("HYPERMEMORY_CLOUD_EMBED_URL", "http://127.0.0.1:8080"),
             model_id=os.environ.get("HYPERMEMORY_CLOUD_MODEL_ID", "local"),
             allowlist=os.environ.get("HYPERMEMORY_CLOUD_ALLOWLIST", "1") == "1",
+            codec=pg_codec.codec_from_env("HYPERMEMORY_CLOUD_CODEC"),
+            push_batch=int(os.environ.get("HYPERMEMORY_CLOUD_PUSH_BATCH", "64")),
+            push_concurrency=int(os.environ.get("HYPERMEMORY_CLOUD_PUSH_CONCURRENCY", "4")),
+            pull_overlap_s=float(os.environ.get("HYPERMEMORY_CLOUD_PULL_OVERLAP", "60")),
+            dedup=os.environ.get("HYPERMEMORY_CLOUD_DEDUP", "1") == "1",
+            search_mode=_search_mode_from_env(),
+            partition=_partition_from_env(),
+        )
+
+
+_PARTITIONED_SQL = """\
+CREATE TABLE hm_cloud_item_p (
+  namespace text NOT NULL,
+  content_sha text NOT NULL,
+  content text NOT NULL,
+  score int NOT NULL,
+  source_meta jsonb NOT NULL DEFAULT '{{}}'::jsonb,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY(namespace, content_sha)
+) PARTITION BY {strategy} (namespace);
+
+CREATE TABLE hm_cloud_embedding_p (
+  namespace text NOT NULL,
+  content_sha text NOT NULL,
+  model_id text NOT NULL,
+  dims int NOT NULL,
+  embedding vector NOT NULL,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY(namespace, content_sha, model_id)
+) PARTITION BY {strategy} (namespace);
+"""
+
+_CLOUD_TABLES = ("hm_cloud_item", "hm_cloud_embedding")
+
+
+def _parse_partition(spec: str) -> tuple[str, int]:
+    """`none` | `list` | `hash:N` -> (strategy, modulus)."""
+
+    if spec in ("", "none"):
+        return "none", 0
+    if spec == "list":
+        return "list", 0
+    if spec.startswith("hash:") and spec[5:].isdigit() and int(spec[5:]) > 0:
+        return "hash", int(spec[5:])
+    raise ValueError("HYPERMEMORY_CLOUD_PARTITION must be none, list or hash:N")
+
+
+def _partition_name(table: str, namespace: str) -> str:
+    return f"{table}_ns_{hashlib.sha1(namespace.encode('utf-8')).hexdigest()[:12]}"
+
+
+def _partition_strategy(con: psycopg.Connection, table: str) -> str | None:
+    """'list' / 'hash' for a partitioned table, 'none' for a plain one, None if missing."""
+
+    row = con.execute(
+        """
+        SELECT c.relkind, p.partstrat
+        FROM pg_class c
+        LEFT JOIN pg_partitioned_table p ON p.partrelid = c.oid
+        WHERE c.oid = to_regclass(%s);
+        """,
+        (table,),
+    ).fetchone()
+    if row is None:
+        return None
+    if row[0] != "p":
+        return "none"
+    return {"l": "list", "h": "hash"}.get(row[1], "other")
+
+
+def _ensure_list_partition(con: psycopg.Connection, table: str, namespace: str) -> None:
+    """Attach a LIST partition for `namespace`, moving its rows out of the default partition."""
+
+    name = _partition_name(table, namespace)
+    if con.execute("SELECT to_regclass(%s)", (name,)).fetchone()[0] is not None:
+        return
+    ident = sql.Identifier(name)
+    con.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)").format(ident, sql.Identifier(table)))
+    con.execute(
+        sql.SQL("WITH moved AS (DELETE FROM {} WHERE namespace = %s RETURNING *) INSERT INTO {} SELECT * FROM moved").format(
+            sql.Identifier(f"{table}_default"), ident
+        ),
+        (namespace,),
+    )
+    con.execute(
+        sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES IN ({})").format(
+            sql.Identifier(table), ident, sql.Literal(namespace)
         )
+    )
+
+
+def _migrate_partitioned(con: psycopg.Connection, strategy: str, modulus: int, namespace: str) -> list[int]:
+    """Rebuild both cloud tables as partitioned-by-namespace copies, in one transaction.
+
+    Returns the embedding dims present, so their codec indexes can be rebuilt.
+    """
+
+    con.execute("LOCK TABLE hm_cloud_item, hm_cloud_embedding IN ACCESS EXCLUSIVE MODE")
+    con.execute(_PARTITIONED_SQL.format(strategy=strategy.upper()))
+    for table in _CLOUD_TABLES:
+        parent = sql.Identifier(f"{table}_p")
+        if strategy == "hash":
+            for r in range(modulus):
+                con.execute(
+                    sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES WITH (MODULUS {}, REMAINDER {})").format(
+                        sql.Identifier(f"{table}_h{r}"), parent, sql.SQL(str(int(modulus))), sql.SQL(str(int(r)))
+                    )
+                )
+        else:
+            con.execute(sql.SQL("CREATE TABLE {} PARTITION OF {} DEFAULT").format(sql.Identifier(f"{table}_default"), parent))
+            namespaces = {namespace} | {r[0] for r in con.execute(sql.SQL("SELECT DISTINCT namespace FROM {}").format(sql.Identifier(table)))}
+            for ns in sorted(namespaces):
+                con.execute(
+                    sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES IN ({})").format(
+                        sql.Identifier(_partition_name(table, ns)), parent, sql.Literal(ns)
+                    )
+                )
+        con.execute(sql.SQL("INSERT INTO {} SELECT * FROM {}").format(parent, sql.Identifier(table)))
+
+    dims = [r[0] for r in con.execute("SELECT DISTINCT dims FROM hm_cloud_embedding")]
+    for table in _CLOUD_TABLES:
+        con.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(table)))
+        con.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(f"{table}_p"), sql.Identifier(table)))
+        con.execute(
+            sql.SQL("ALTER TABLE {} RENAME CONSTRAINT {} TO {}").format(
+                sql.Identifier(table), sql.Identifier(f"{table}_p_pkey"), sql.Identifier(f"{table}_pkey")
+            )
+        )
+    return dims
+
+
+_SCHEMA_INDEXES = ("hm_cloud_item_created_at_idx", "hm_cloud_item_pull_cursor_idx", "hm_cloud_item_fts_idx")
+
+
+def schema_ready(con: psycopg.Connection, cfg: CloudConfig) -> bool:
+    """True if `init_schema(cfg)` has nothing to do; catalog reads only, no DDL or locks."""
+
+    strategy, _modulus = _parse_partition(cfg.partition)
+    current = {t: _partition_strategy(con, t) for t in _CLOUD_TABLES}
+    if None in current.values():
+        return False
+    for name in _SCHEMA_INDEXES:
+        if con.execute("SELECT to_regclass(%s)", (name,)).fetchone()[0] is None:
+            return False
+    if strategy == "none":
+        return True
+    if current["hm_cloud_item"] == "none":
+        return False  # partitioning requested, not migrated yet
+    if current["hm_cloud_item"] == "list":
+        return all(con.execute("SELECT to_regclass(%s)", (_partition_name(t, cfg.namespace),)).fetchone()[0] for t in _CLOUD_TABLES)
+    return True
 
 
 def init_schema(cfg: CloudConfig) -> None:
-    with psycopg.connect(cfg.database_url) as con:
+    """Create the cloud schema; with `cfg.partition`, migrate it to per-namespace partitions.
+
+    Partitioning is opt-in and one-way: an existing partitioned schema is left
+    as-is when the setting is turned off or changed (re-partitioning a live
+    tenant table is an operator decision).
+    """
+
+    strategy, modulus = _parse_partition(cfg.partition)
+    with pg_pool.connection(cfg.database_url) as con:
         con.execute(SCHEMA_SQL)
         con.commit()
+        pg_pool.ensure_vector(con)
+        if strategy == "none":
+            return
+
+        current = _partition_strategy(con, "hm_cloud_item")
+        if current == "none":
+            dims = _migrate_partitioned(con, strategy, modulus, cfg.namespace)
+            # secondary and codec indexes were dropped with the old heaps;
+            # on the partitioned parents they are created on every partition
+            con.execute(SCHEMA_SQL)
+            codec = pg_codec.effective(con, cfg.database_url, cfg.codec)
+            for d in dims:
+                pg_codec.ensure_index(con, "hm_cloud_embedding", codec, d)
+        elif current == "list":
+            for table in _CLOUD_TABLES:
+                _ensure_list_partition(con, table, cfg.namespace)
+        con.commit()
 
 
 def _parse_pending(path: Path, threshold: int) -> list[tuple[int, str]]:
@@ -115,6 +318,28 @@ def _parse_pending(path: Path, threshold: int) -> list[tuple[int, str]]:
     return items
 
 
+def existing_shas(cfg: CloudConfig, shas: list[str]) -> set[str]:
+    """Subset of `shas` already pushed (item + embedding for this model), in one query."""
+
+    if not shas:
+        return set()
+    try:
+        with pg_pool.connection(cfg.database_url) as con:
+            rows = con.execute(
+                """
+                SELECT content_sha
+                FROM hm_cloud_embedding
+                WHERE namespace=%s AND model_id=%s AND content_sha = ANY(%s);
+                """,
+                (cfg.namespace, cfg.model_id, shas),
+                prepare=True,
+            ).fetchall()
+    except psycopg.errors.UndefinedTable:
+        # `cloud init` hasn't run yet: nothing has been pushed
+        return set()
+    return {r[0] for r in rows}
+
+
 def prepare_payload(workspace: Path, cfg: CloudConfig) -> Path:
     ws = workspace.resolve()
     pending = ws / "memory" / "staging" / "MEMORY.pending.md"
@@ -142,23 +367,41 @@ def prepare_payload(workspace: Path, cfg: CloudConfig) -> Path:
     if not redacted:
         raise SystemExit(f"No items eligible to push after allowlist/redaction (skipped={skipped}).")
 
-    # embed to get dims and ensure embed server works
-    vecs = embed_texts(cfg.embed_url, ["passage: " + t for _s, t in redacted])
-    if not vecs:
-        raise SystemExit("Embedding server returned no vectors")
-    dims = len(vecs[0])
+    # cloud shas are hashes of the *redacted* text, so dedup can only run after
+    # redaction; it still saves the embedding + push of everything already there
+    audit_non_skipped = [a for a in audit if not a.get("skipped")]
+    shas = [sha256(t) for _s, t in redacted]
+    existing: set[str] = set()
+    if cfg.dedup:
+        try:
+            existing = existing_shas(cfg, list(dict.fromkeys(shas)))
+        except psycopg.Error as e:
+            print(f"cloud dedup check failed, pushing all items: {type(e).__name__}: {e}", file=sys.stderr)
 
     payload_items = []
-    audit_non_skipped = [a for a in audit if not a.get("skipped")]
-    for (score, text), a in zip(redacted, audit_non_skipped):
+    seen: set[str] = set()
+    for (score, text), sha, a in zip(redacted, shas, audit_non_skipped):
+        if sha in existing or sha in seen:
+            a["existing"] = True
+            continue
+        seen.add(sha)
         payload_items.append({
             "score": score,
             "content": text,
-            "content_sha": sha256(text),
+            "content_sha": sha,
             "redactions": a.get("redactions", 0),
             "rules": a.get("rules", []),
         })
 
+    if not payload_items:
+        raise SystemExit(f"No new items to push ({len(existing)} already in cloud, skipped={skipped}).")
+
+    # embed one item to get dims and ensure embed server works
+    vecs = embed_texts(cfg.embed_url, ["passage: " + payload_items[0]["content"]])
+    if not vecs:
+        raise SystemExit("Embedding server returned no vectors")
+    dims = len(vecs[0])
+
     payload = {
         "namespace": cfg.namespace,
         "threshold": cfg.threshold,
@@ -167,6 +410,7 @@ def prepare_payload(workspace: Path, cfg: CloudConfig) -> Path:
         "dims": dims,
         "count": len(payload_items),
         "skipped": skipped,
+        "existing": len(redacted) - len(payload_items),
         "items": payload_items,
     }
 
@@ -184,119 +428,390 @@ def prepare_payload(workspace: Path, cfg: CloudConfig) -> Path:
     return payload_path
 
 
+_PUSH_ITEM_SQL = """
+INSERT INTO hm_cloud_item(namespace, content_sha, content, score, source_meta)
+VALUES (%s,%s,%s,%s,%s)
+ON CONFLICT(namespace, content_sha)
+DO UPDATE SET content=excluded.content, score=excluded.score, source_meta=excluded.source_meta;
+"""
+
+_PUSH_EMBEDDING_SQL = """
+INSERT INTO hm_cloud_embedding(namespace, content_sha, model_id, dims, embedding)
+VALUES (%s,%s,%s,%s,%s)
+ON CONFLICT(namespace, content_sha, model_id)
+DO UPDATE SET dims=excluded.dims, embedding=excluded.embedding, updated_at=now();
+"""
+
+
+def _load_checkpoint(path: Path, key: str) -> set[int]:
+    try:
+        ck = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return set()
+    if ck.get("key") != key:
+        return set()
+    return {int(i) for i in ck.get("done", [])}
+
+
+def _save_checkpoint(path: Path, key: str, total: int, done: set[int]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"key": key, "batches": total, "done": sorted(done)}), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _push_batch(cfg: CloudConfig, items: list[dict], dims: int, meta_base: dict) -> list[dict]:
+    """Embed + upsert one batch in its own transaction; returns its audit records."""
+
+    vecs = embed_texts(cfg.embed_url, ["passage: " + it["content"] for it in items])
+    item_rows = []
+    emb_rows = []
+    audit = []
+    for it, vec in zip(items, vecs):
+        score = int(it["score"])
+        content_sha = str(it["content_sha"])
+        item_rows.append((cfg.namespace, content_sha, str(it["content"]), score, json.dumps({"score": score, **meta_base})))
+        emb_rows.append((cfg.namespace, content_sha, cfg.model_id, dims, vec))
+        audit.append({"action": "push", "namespace": cfg.namespace, "sha": content_sha, "score": score})
+
+    for attempt in range(2):
+        try:
+            with pg_pool.connection(cfg.database_url) as con:
+                with con.cursor() as cur:
+                    cur.executemany(_PUSH_ITEM_SQL, item_rows)
+                    cur.executemany(_PUSH_EMBEDDING_SQL, emb_rows)
+            return audit
+        except psycopg.OperationalError:
+            # dropped connection: the pool discards it, retry once on a fresh one
+            if attempt:
+                raise
+    return audit
+
+
 def commit_payload(workspace: Path, cfg: CloudConfig) -> int:
+    """Push the prepared payload in committed batches; resumable after interruption.
+
+    Batches (`push_batch` items) are embedded and written concurrently
+    (`push_concurrency`), each in its own transaction. Finished batches are
+    recorded in memory/staging/cloud-push.checkpoint.json, so re-running after
+    a failure skips them. Returns the number of items pushed by this call.
+    """
+
     ws = workspace.resolve()
     payload_path = ws / "memory" / "staging" / "cloud-push.payload.json"
     if not payload_path.exists():
         payload_path = prepare_payload(ws, cfg)
 
-    payload = json.loads(payload_path.read_text(encoding="utf-8"))
+    raw = payload_path.read_bytes()
+    payload = json.loads(raw.decode("utf-8"))
     items = payload.get("items", [])
     if not items:
         return 0
 
-    # embed again for embeddings (deterministic server)
-    vecs = embed_texts(cfg.embed_url, ["passage: " + it["content"] for it in items])
-    dims = int(payload.get("dims") or len(vecs[0]))
-
-    init_schema(cfg)
+    step = max(1, cfg.push_batch)
+    batches = [items[i : i + step] for i in range(0, len(items), step)]
+    ck_path = payload_path.with_name("cloud-push.checkpoint.json")
+    ck_key = hashlib.sha256(raw + f"|{cfg.namespace}|{cfg.model_id}".encode("utf-8")).hexdigest()
+    done = _load_checkpoint(ck_path, ck_key)
+    todo = [i for i in range(len(batches)) if i not in done]
+    if done:
+        print(f"resuming cloud push: {len(done)}/{len(batches)} batches already committed", file=sys.stderr)
+
+    dims = int(payload.get("dims") or 0) or len(embed_texts(cfg.embed_url, ["passage: " + items[0]["content"]])[0])
+
+    # DDL (and a partition migration) only when needed: every push used to
+    # re-run it, queueing for locks behind concurrent readers/writers
+    with pg_pool.connection(cfg.database_url) as con:
+        ready = schema_ready(con, cfg)
+    if not ready:
+        init_schema(cfg)
+    with pg_pool.connection(cfg.database_url) as con:
+        pg_pool.ensure_vector(con)
+        pg_codec.ensure_index(con, "hm_cloud_embedding", pg_codec.effective(con, cfg.database_url, cfg.codec), dims)
+
+    meta_base = {"workspace": str(ws), "source": "staging/MEMORY.pending.md", "payload_path": str(payload_path)}
 
     audit_log = ws / "memory" / "cloud-sync.jsonl"
     audit_log.parent.mkdir(parents=True, exist_ok=True)
 
-    with psycopg.connect(cfg.database_url) as con:
-        register_vector(con)
-        pushed = 0
-        for it, vec in zip(items, vecs):
-            score = int(it["score"])
-            content = str(it["content"])
-            content_sha = str(it["content_sha"])
-            meta = {
-                "score": score,
-                "workspace": str(ws),
-                "source": "staging/MEMORY.pending.md",
-                "payload_path": str(payload_path),
-            }
-            con.execute(
-                """
-                INSERT INTO hm_cloud_item(namespace, content_sha, content, score, source_meta)
-                VALUES (%s,%s,%s,%s,%s)
-                ON CONFLICT(namespace, content_sha)
-                DO UPDATE SET content=excluded.content, score=excluded.score, source_meta=excluded.source_meta;
-                """,
-                (cfg.namespace, content_sha, content, score, json.dumps(meta)),
-            )
-            con.execute(
-                """
-                INSERT INTO hm_cloud_embedding(namespace, content_sha, model_id, dims, embedding)
-                VALUES (%s,%s,%s,%s,%s)
-                ON CONFLICT(namespace, content_sha, model_id)
-                DO UPDATE SET dims=excluded.dims, embedding=excluded.embedding, updated_at=now();
-                """,
-                (cfg.namespace, content_sha, cfg.model_id, dims, vec),
-            )
-            pushed += 1
-            with audit_log.open("a", encoding="utf-8") as f:
-                f.write(json.dumps({"action": "push", "namespace": cfg.namespace, "sha": content_sha, "score": score}) + "\n")
+    pushed = 0
+    failed: list[tuple[int, BaseException]] = []
+    with audit_log.open("a", encoding="utf-8") as audit_f, ThreadPoolExecutor(max(1, cfg.push_concurrency)) as ex:
+        futs = {ex.submit(_push_batch, cfg, batches[i], dims, meta_base): i for i in todo}
+        for fut in as_completed(futs):
+            i = futs[fut]
+            try:
+                records = fut.result()
+            except Exception as e:
+                failed.append((i, e))
+                continue
+            audit_f.writelines(json.dumps(r) + "\n" for r in records)
+            audit_f.flush()
+            done.add(i)
+            _save_checkpoint(ck_path, ck_key, len(batches), done)
+            pushed += len(records)
+
+    if failed:
+        i, e = min(failed, key=lambda t: t[0])
+        raise RuntimeError(
+            f"cloud push incomplete: {len(failed)} of {len(batches)} batches failed "
+            f"(first: batch {i}: {type(e).__name__}: {e}); re-run to resume"
+        ) from e
+
+    ck_path.unlink(missing_ok=True)
+    return pushed
 
-        con.commit()
 
-    return pushed
+def _load_pull_state(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
 
 
-def pull_curated(workspace: Path, cfg: CloudConfig, limit: int = 200) -> Path:
-    ws = workspace.resolve()
-    out_dir = ws / "memory" / "staging"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_file = out_dir / "MEMORY.cloud.md"
+def _save_pull_state(path: Path, state: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
 
-    with psycopg.connect(cfg.database_url) as con:
-        cur = con.execute(
-            """
-            SELECT content_sha, score, content
-            FROM hm_cloud_item
-            WHERE namespace=%s
-            ORDER BY created_at DESC
-            LIMIT %s;
-            """,
-            (cfg.namespace, int(limit)),
-        )
-        rows = cur.fetchall()
 
-    existing = set()
+def _sha_digest(sha: str) -> bytes:
+    try:
+        d = bytes.fromhex(sha)
+    except ValueError:
+        d = b""
+    return d if len(d) == 32 else hashlib.sha256(sha.encode("utf-8")).digest()
+
+
+def _load_sha_index(index_path: Path, out_file: Path) -> set[bytes]:
+    """Set of pulled sha256 digests (32 raw bytes each, append-only file).
+
+    Rebuilt from MEMORY.cloud.md when the index is missing or older than the
+    file (hand-edited), and reset when the file itself is gone.
+    """
+
+    if index_path.exists() and out_file.exists() and index_path.stat().st_mtime >= out_file.stat().st_mtime:
+        data = index_path.read_bytes()
+        n = len(data) - len(data) % 32
+        return {data[i : i + 32] for i in range(0, n, 32)}
+
+    seen: set[bytes] = set()
     if out_file.exists():
         for line in out_file.read_text(encoding="utf-8", errors="replace").splitlines():
             if line.startswith("- [sha="):
-                existing.add(line.split(" ", 1)[0])
+                seen.add(_sha_digest(line[len("- [sha=") :].split("]", 1)[0]))
+    index_path.write_bytes(b"".join(sorted(seen)))
+    return seen
 
-    with out_file.open("a", encoding="utf-8") as f:
-        for sha, score, content in rows:
-            key = f"- [sha={sha}]"
-            if key in existing:
-                continue
-            f.write(f"- [sha={sha}] [M{int(score)}] {content}\n")
+
+def pull_curated(workspace: Path, cfg: CloudConfig, page_size: int = 200) -> Path:
+    """Append cloud items not yet pulled to memory/staging/MEMORY.cloud.md.
+
+    Every new row is pulled; there is no cap. Pages (`page_size` rows each) in `(created_at, content_sha)` order from the
+    namespace's cursor in memory/staging/cloud-pull.state.json. The cursor is
+    re-read from `pull_overlap_s` seconds earlier so rows whose transaction
+    committed late aren't skipped; those repeats are dropped by the sha index
+    (memory/staging/MEMORY.cloud.sha). If MEMORY.cloud.md was deleted, the
+    cursors and index are reset and everything is pulled again.
+    """
+
+    ws = workspace.resolve()
+    out_dir = ws / "memory" / "staging"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_file = out_dir / "MEMORY.cloud.md"
+    index_path = out_dir / "MEMORY.cloud.sha"
+    state_path = out_dir / "cloud-pull.state.json"
+
+    if not out_file.exists():
+        state_path.unlink(missing_ok=True)
+    seen = _load_sha_index(index_path, out_file)
+    state = _load_pull_state(state_path)
+    cursor = state.get(cfg.namespace) or {}
+    after_ts = cursor.get("created_at")
+    after_sha = cursor.get("content_sha", "")
+    if after_ts:
+        after_ts = (datetime.fromisoformat(after_ts) - timedelta(seconds=cfg.pull_overlap_s)).isoformat()
+        after_sha = ""
+
+    page = max(1, int(page_size))
+    with pg_pool.connection(cfg.database_url) as con, out_file.open("a", encoding="utf-8") as f, index_path.open("ab") as idx:
+        while True:
+            if after_ts:
+                rows = con.execute(
+                    """
+                    SELECT content_sha, score, content, created_at
+                    FROM hm_cloud_item
+                    WHERE namespace=%s AND (created_at, content_sha) > (%s::timestamptz, %s)
+                    ORDER BY created_at, content_sha
+                    LIMIT %s;
+                    """,
+                    (cfg.namespace, after_ts, after_sha, page),
+                    prepare=True,
+                ).fetchall()
+            else:
+                rows = con.execute(
+                    """
+                    SELECT content_sha, score, content, created_at
+                    FROM hm_cloud_item
+                    WHERE namespace=%s
+                    ORDER BY created_at, content_sha
+                    LIMIT %s;
+                    """,
+                    (cfg.namespace, page),
+                    prepare=True,
+                ).fetchall()
+            if not rows:
+                break
+
+            for sha, score, content, _created in rows:
+                digest = _sha_digest(sha)
+                if digest in seen:
+                    continue
+                f.write(f"- [sha={sha}] [M{int(score)}] {content}\n")
+                idx.write(digest)
+                seen.add(digest)
+            f.flush()
+            idx.flush()
+
+            last_sha, last_ts = rows[-1][0], rows[-1][3]
+            after_ts, after_sha = last_ts.isoformat(), last_sha
+            prev = state.get(cfg.namespace) or {}
+            if not prev.get("created_at") or datetime.fromisoformat(prev["created_at"]) <= last_ts:
+                state[cfg.namespace] = {"created_at": after_ts, "content_sha": after_sha}
+                _save_pull_state(state_path, state)
+            if len(rows) < page:
+                break
 
     return out_file
 
 
-def search_curated(cfg: CloudConfig, query: str, limit: int = 8) -> list[str]:
-    qvec = embed_one(cfg.embed_url, "query: " + query)
-
-    with psycopg.connect(cfg.database_url) as con:
-        register_vector(con)
-        cur = con.execute(
-            """
-            SELECT e.content_sha, i.score, i.content,
-                   1 - (e.embedding <=> %s) AS sim
-            FROM hm_cloud_embedding e
-            JOIN hm_cloud_item i
-              ON i.namespace=e.namespace AND i.content_sha=e.content_sha
-            WHERE e.namespace=%s AND e.model_id=%s
-            ORDER BY e.embedding <=> %s
-            LIMIT %s;
-            """,
-            (qvec, cfg.namespace, cfg.model_id, qvec, int(limit)),
+def _search_hybrid(con, cfg: CloudConfig, codec: str, query: str, q, limit: int) -> list[tuple]:
+    """Vector kNN + full-text ranked lists fused with RRF, in one statement."""
+
+    qvec = Vector(q)
+    depth = max(20, int(limit) * _HYBRID_DEPTH)
+    dims = len(q)
+    if codec == "vector":
+        knn = f"""
+            SELECT content_sha, embedding <=> %s AS d
+            FROM hm_cloud_embedding
+            WHERE namespace=%s AND model_id=%s AND dims={int(dims)}
+            ORDER BY {pg_codec.coarse_expr(codec, "embedding", dims)} <=> {pg_codec.coarse_query(codec, dims)}
+            LIMIT %s
+        """
+        knn_params: tuple = (qvec, cfg.namespace, cfg.model_id, qvec, depth)
+        pg_codec.set_ef_search(con, depth)
+    else:
+        knn = f"""
+            SELECT content_sha, embedding <=> %s AS d
+            FROM (
+              SELECT content_sha, embedding
+              FROM hm_cloud_embedding
+              WHERE namespace=%s AND model_id=%s AND dims={int(dims)}
+              ORDER BY {pg_codec.coarse_expr(codec, "embedding", dims)} {pg_codec.coarse_op(codec)} {pg_codec.coarse_query(codec, dims)}
+              LIMIT %s
+            ) c
+            ORDER BY d
+            LIMIT %s
+        """
+        knn_params = (qvec, cfg.namespace, cfg.model_id, qvec, depth * pg_codec.rerank_factor(), depth)
+        pg_codec.set_ef_search(con, depth * pg_codec.rerank_factor())
+
+    cur = con.execute(
+        f"""
+        WITH knn AS ({knn}),
+        vec AS (
+          SELECT content_sha, row_number() OVER (ORDER BY d) AS r FROM knn
+        ),
+        fts AS (
+          SELECT content_sha, row_number() OVER (ORDER BY rank DESC, content_sha) AS r
+          FROM (
+            SELECT i.content_sha, ts_rank_cd({FTS_DOC}, q.tsq) AS rank
+            FROM hm_cloud_item i, (SELECT {FTS_QUERY} AS tsq) q
+            WHERE i.namespace=%s AND {FTS_DOC} @@ q.tsq
+            ORDER BY rank DESC
+            LIMIT %s
+          ) t
+        ),
+        fused AS (
+          SELECT content_sha, sum(1.0 / ({_RRF_K} + r)) AS rrf
+          FROM (SELECT * FROM vec UNION ALL SELECT * FROM fts) u
+          GROUP BY content_sha
         )
+        SELECT f.content_sha, i.score, i.content, f.rrf
+        FROM fused f
+        JOIN hm_cloud_item i
+          ON i.namespace=%s AND i.content_sha=f.content_sha
+        ORDER BY f.rrf DESC, f.content_sha
+        LIMIT %s;
+        """,
+        knn_params + (query, cfg.namespace, depth, cfg.namespace, int(limit)),
+        prepare=True,
+    )
+    return cur.fetchall()
+
+
+def search_curated(cfg: CloudConfig, query: str, limit: int = 8, mode: str | None = None) -> list[str]:
+    """Top `limit` cloud items for `query` as display lines.
+
+    mode (default `cfg.search_mode`):
+    - vector: cosine similarity (score = similarity)
+    - hybrid: vector kNN + Postgres full-text fused with RRF server-side (score = RRF)
+    """
+
+    mode = mode or cfg.search_mode
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"cloud search mode must be one of {SEARCH_MODES}")
+    q = _embed_client.embed_query(cfg.embed_url, cfg.model_id, "query: " + query)
+    qvec = Vector(q)
+
+    if mode == "hybrid":
+        with tracing.span("cloud.sql", mode=mode), pg_pool.connection(cfg.database_url) as con:
+            pg_pool.ensure_vector(con)
+            rows = _search_hybrid(con, cfg, pg_codec.effective(con, cfg.database_url, cfg.codec), query, q, limit)
+        return [f"[{float(rrf):.4f}] sha={sha} M{int(score)} {content}" for sha, score, content, rrf in rows]
+
+    with tracing.span("cloud.sql", mode=mode), pg_pool.connection(cfg.database_url) as con:
+        pg_pool.ensure_vector(con)
+        codec = pg_codec.effective(con, cfg.database_url, cfg.codec)
+        dims = len(q)
+        if codec == "vector":
+            pg_codec.set_ef_search(con, int(limit))
+            cur = con.execute(
+                f"""
+                SELECT e.content_sha, i.score, i.content,
+                       1 - (e.embedding <=> %s) AS sim
+                FROM hm_cloud_embedding e
+                JOIN hm_cloud_item i
+                  ON i.namespace=e.namespace AND i.content_sha=e.content_sha
+                WHERE e.namespace=%s AND e.model_id=%s AND e.dims={int(dims)}
+                ORDER BY {pg_codec.coarse_expr(codec, "e.embedding", dims)} <=> {pg_codec.coarse_query(codec, dims)}
+                LIMIT %s;
+                """,
+                (qvec, cfg.namespace, cfg.model_id, qvec, int(limit)),
+                prepare=True,
+            )
+        else:
+            # coarse kNN over the compressed index, exact rerank of the candidates
+            pg_codec.set_ef_search(con, int(limit) * pg_codec.rerank_factor())
+            cur = con.execute(
+                f"""
+                SELECT c.content_sha, i.score, i.content,
+                       1 - (c.embedding <=> %s) AS sim
+                FROM (
+                  SELECT namespace, content_sha, embedding
+                  FROM hm_cloud_embedding
+                  WHERE namespace=%s AND model_id=%s AND dims={int(dims)}
+                  ORDER BY {pg_codec.coarse_expr(codec, "embedding", dims)} {pg_codec.coarse_op(codec)} {pg_codec.coarse_query(codec, dims)}
+                  LIMIT %s
+                ) c
+                JOIN hm_cloud_item i
+                  ON i.namespace=c.namespace AND i.content_sha=c.content_sha
+                ORDER BY c.embedding <=> %s
+                LIMIT %s;
+                """,
+                (qvec, cfg.namespace, cfg.model_id, qvec, int(limit) * pg_codec.rerank_factor(), qvec, int(limit)),
+                prepare=True,
+            )
         rows = cur.fetchall()
 
     return [f"[{float(sim):.4f}] sha={sha} M{int(score)} {content}" for sha, score, content, sim in rows]
@@ -13,3 +13,17 @@ class Config:
     def from_env(workspace: str | None = None) -> "Config":
         ws = workspace or os.environ.get("OPENCLAW_WORKSPACE") or os.getcwd()
         return Config(workspace=Path(ws).resolve())
+
+
+VECTOR_BACKENDS = ("auto", "pgvector", "embedded")
+
+
+def resolve_vector_backend() -> str:
+    """Local semantic backend: HYPERMEMORY_VECTOR_BACKEND, `auto` picks pgvector iff DATABASE_URL is set."""
+
+    backend = os.environ.get("HYPERMEMORY_VECTOR_BACKEND", "auto")
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"HYPERMEMORY_VECTOR_BACKEND must be one of {VECTOR_BACKENDS}")
+    if backend == "auto":
+        return "pgvector" if os.environ.get("DATABASE_URL") else "embedded"
+    return backend
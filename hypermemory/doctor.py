@@ -25,6 +25,13 @@ def _exists(p: Path) -> bool:
         return False
 
 
+def _pooled(url: str):
+    from .pg_pool import connection
+
+    # fail fast on an unreachable host instead of libpq's default (no connect timeout)
+    return connection(url, timeout=5.0, connect_timeout=5.0)
+
+
 def run_doctor(workspace: Path) -> DoctorReport:
     ws = workspace.resolve()
     mem_dir = ws / "memory"
@@ -52,7 +59,7 @@ def run_doctor(workspace: Path) -> DoctorReport:
             checks["local_pgvector_error"] = "psycopg not installed"
         else:
             try:
-                with psycopg.connect(db_url) as con:
+                with _pooled(db_url) as con:
                     con.execute("select 1")
                 checks["local_pgvector_connect"] = True
             except Exception as e:
@@ -68,7 +75,7 @@ def run_doctor(workspace: Path) -> DoctorReport:
             checks["cloud_error"] = "psycopg not installed"
         else:
             try:
-                with psycopg.connect(cloud_url) as con:
+                with _pooled(cloud_url) as con:
                     con.execute("select 1")
                 checks["cloud_connect"] = True
             except Exception as e:
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+"""Query-embedding cache (LRU + TTL, optional on-disk tier).
+
+Agents repeat the same questions; re-embedding them costs an HTTP round-trip
+per query. This cache is shared process-wide by the local vector layer, the
+cloud layer and anything else that embeds *queries* (never passages).
+
+Key: (embeddings url, model identity, exact text). With the disk tier on, the
+model identity includes the model and backend the server reports in /health,
+so swapping the model behind the same URL never serves stale vectors from
+disk; without it no /health request is made and entries live only as long as
+the process. Texts are not normalized: the model sees the raw text, so only
+identical texts share a vector.
+
+Env:
+- HYPERMEMORY_QUERY_CACHE_SIZE  max in-memory entries (default 1024, 0 disables)
+- HYPERMEMORY_QUERY_CACHE_TTL   seconds (default 3600, 0 = no expiry)
+- HYPERMEMORY_QUERY_CACHE_PATH  optional SQLite file for a persistent tier
+
+Dependency-free (stdlib only).
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List
+
+
+def cache_key(embed_url: str, model_id: str, text: str) -> str:
+    raw = f"{embed_url.rstrip('/')}\x00{model_id}\x00{text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int = 1024, ttl_s: float = 3600.0, disk_path: Path | None = None):
+        self.max_entries = int(max_entries)
+        self.ttl_s = float(ttl_s)
+        self.disk_path = disk_path
+        self._mem: OrderedDict[str, tuple[float, List[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._con: sqlite3.Connection | None = None
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def from_env() -> "QueryEmbeddingCache":
+        p = os.environ.get("HYPERMEMORY_QUERY_CACHE_PATH")
+        return QueryEmbeddingCache(
+            max_entries=int(os.environ.get("HYPERMEMORY_QUERY_CACHE_SIZE", "1024")),
+            ttl_s=float(os.environ.get("HYPERMEMORY_QUERY_CACHE_TTL", "3600")),
+            disk_path=Path(p) if p else None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _fresh(self, stored_at: float) -> bool:
+        return self.ttl_s <= 0 or (time.time() - stored_at) < self.ttl_s
+
+    # --- disk tier ---
+
+    def _disk(self) -> sqlite3.Connection:
+        """Shared connection, opened once; callers hold `_disk_lock`."""
+
+        assert self.disk_path is not None
+        if self._con is None:
+            self.disk_path.parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(str(self.disk_path), timeout=5.0, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS hm_query_embedding (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, vec BLOB NOT NULL)"
+            )
+            self._con = con
+        return self._con
+
+    def _disk_get(self, key: str) -> tuple[float, List[float]] | None:
+        if self.disk_path is None:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._disk().execute("SELECT stored_at, vec FROM hm_query_embedding WHERE key=?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if not row:
+            return None
+        a = array("f")
+        a.frombytes(bytes(row[1]))
+        return float(row[0]), a.tolist()
+
+    def _disk_put(self, key: str, stored_at: float, vec: List[float]) -> None:
+        if self.disk_path is None:
+            return
+        try:
+            with self._disk_lock:
+                con = self._disk()
+                con.execute(
+                    "INSERT OR REPLACE INTO hm_query_embedding(key, stored_at, vec) VALUES (?,?,?)",
+                    (key, stored_at, array("f", vec).tobytes()),
+                )
+                if self.ttl_s > 0:
+                    con.execute("DELETE FROM hm_query_embedding WHERE stored_at < ?", (time.time() - self.ttl_s,))
+                con.commit()
+        except sqlite3.Error:
+            pass
+
+    # --- public ---
+
+    def get(self, key: str) -> List[float] | None:
+        with self._lock:
+            it = self._mem.get(key)
+            if it is not None:
+                if self._fresh(it[0]):
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return it[1]
+                del self._mem[key]
+
+        it = self._disk_get(key)
+        if it is not None and self._fresh(it[0]):
+            with self._lock:
+                self._remember(key, it)
+                self.hits += 1
+            return it[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, vec: List[float]) -> None:
+        it = (time.time(), list(vec))
+        with self._lock:
+            self._remember(key, it)
+        self._disk_put(key, it[0], it[1])
+
+    def _remember(self, key: str, it: tuple[float, List[float]]) -> None:
+        self._mem[key] = it
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries, including the disk tier."""
+
+        with self._lock:
+            self._mem.clear()
+        if self.disk_path is None:
+            return
+        try:
+            with self._disk_lock:
+                con = self._disk()
+                con.execute("DELETE FROM hm_query_embedding")
+                con.commit()
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._mem), "hits": self.hits, "misses": self.misses}
+
+
+_CACHE: QueryEmbeddingCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> QueryEmbeddingCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = QueryEmbeddingCache.from_env()
+        return _CACHE
+
+
+def cached_query_embedding(embed_url: str, model_id: str, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+    """Return the embedding of a query text, calling `compute(text)` on a miss."""
+
+    cache = get_cache()
+    if not cache.enabled:
+        return compute(text)
+
+    key = cache_key(embed_url, model_id, text)
+    vec = cache.get(key)
+    if vec is None:
+        vec = compute(text)
+        cache.put(key, vec)
+    return vec
@@ -0,0 +1,483 @@
+from __future__ import annotations
+
+"""Shared HTTP client for the embeddings server (mf-embeddings compatible).
+
+API used:
+- GET /health
+- POST /embed {"inputs": [..]}
+- POST /embed/stream (NDJSON strings in; vectors streamed back per server
+  micro-batch, as NDJSON arrays or f32 frames) — used by `embed_stream`,
+  which falls back to batched /embed on servers without it
+
+Wire format: /embed asks for `Accept: application/x-hypermemory-f32` and
+falls back to JSON float lists when the server doesn't speak it. The binary
+body is a 12-byte little-endian header (magic `HMF1`, uint32 count, uint32
+dims) followed by count*dims float32 values, row-major. It is decoded without
+parsing: into NumPy row views when NumPy is installed (pgvector adapts those
+directly), else via `array('f')`.
+
+Behaviour:
+- persistent HTTP/1.1 keep-alive connections, pooled per base URL
+- bounded concurrency (max in-flight requests per base URL)
+- timeouts + retries with jittered exponential backoff
+- oversize batches are split into several requests transparently; inputs are
+  sorted into length buckets and batched by an estimated token budget (padding
+  cost = longest member x batch size), then returned in the original order
+- per-client latency metrics (see `EmbedClient.stats`)
+
+Dependency-free (stdlib only; NumPy is used when available).
+"""
+
+import http.client
+import json
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+from array import array
+from dataclasses import asdict, dataclass
+from typing import Iterator, List, Tuple
+
+from . import metrics, tracing
+
+try:  # optional: faster decode of binary responses
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_REQUEST_SECONDS = metrics.histogram("hypermemory_embed_request_seconds", "Embeddings HTTP request latency (per attempt)", ("path",))
+_BATCH_SIZE = metrics.histogram(
+    "hypermemory_embed_batch_size", "Inputs per /embed request", buckets=metrics.SIZE_BUCKETS
+)
+_QUERY_CACHE = metrics.counter("hypermemory_query_cache_total", "Query-embedding cache lookups", ("result",))
+
+F32_MEDIA_TYPE = "application/x-hypermemory-f32"
+F32_MAGIC = b"HMF1"
+_F32_HEADER = struct.Struct("<4sII")
+
+WIRE_FORMATS = ("f32", "json")
+
+
+class EmbedError(RuntimeError):
+    pass
+
+
+_STREAM_ERRORS = (EmbedError, OSError, http.client.HTTPException, ValueError)
+
+
+@dataclass(frozen=True)
+class EmbedClientConfig:
+    timeout_s: float = 30.0
+    retries: int = 3
+    backoff_s: float = 0.2
+    max_batch: int = 128
+    max_connections: int = 4
+    token_budget: int = 8192
+    wire: str = "f32"
+
+    @staticmethod
+    def from_env() -> "EmbedClientConfig":
+        wire = os.environ.get("HYPERMEMORY_EMBED_WIRE", "f32")
+        if wire not in WIRE_FORMATS:
+            raise ValueError(f"HYPERMEMORY_EMBED_WIRE must be one of {WIRE_FORMATS}")
+        return EmbedClientConfig(
+            timeout_s=float(os.environ.get("HYPERMEMORY_EMBED_TIMEOUT", "30")),
+            retries=int(os.environ.get("HYPERMEMORY_EMBED_RETRIES", "3")),
+            backoff_s=float(os.environ.get("HYPERMEMORY_EMBED_BACKOFF", "0.2")),
+            max_batch=int(os.environ.get("HYPERMEMORY_EMBED_MAX_BATCH", "128")),
+            max_connections=int(os.environ.get("HYPERMEMORY_EMBED_CONCURRENCY", "4")),
+            token_budget=int(os.environ.get("HYPERMEMORY_EMBED_TOKEN_BUDGET", "8192")),
+            wire=wire,
+        )
+
+
+@dataclass
+class EmbedStats:
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0
+    texts: int = 0
+    binary: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        d["avg_ms"] = round(self.total_ms / self.requests, 3) if self.requests else 0.0
+        return d
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 chars per subword token for English-ish text, plus special tokens
+    return len(text) // 4 + 2
+
+
+def plan_batches(texts: List[str], max_batch: int, token_budget: int = 0) -> List[List[int]]:
+    """Group input indices into request batches.
+
+    With a token budget, inputs are sorted by estimated length so each batch
+    holds similar lengths, and a batch is closed once `longest * count` would
+    exceed the budget (what the server pays after padding). Without one,
+    batches are fixed-size slices in input order.
+    """
+
+    step = max(1, max_batch)
+    if token_budget <= 0:
+        return [list(range(i, min(i + step, len(texts)))) for i in range(0, len(texts), step)]
+
+    order = sorted(range(len(texts)), key=lambda i: estimate_tokens(texts[i]))
+    out: List[List[int]] = []
+    cur: List[int] = []
+    longest = 0
+    for i in order:
+        t = estimate_tokens(texts[i])
+        if cur and (len(cur) >= step or max(longest, t) * (len(cur) + 1) > token_budget):
+            out.append(cur)
+            cur, longest = [], 0
+        cur.append(i)
+        longest = max(longest, t)
+    if cur:
+        out.append(cur)
+    return out
+
+
+def decode_f32(data: bytes) -> list:
+    """Decode a binary /embed body into rows of Python floats."""
+
+    if len(data) < _F32_HEADER.size:
+        raise EmbedError("truncated f32 response")
+    magic, n, d = _F32_HEADER.unpack_from(data)
+    if magic != F32_MAGIC:
+        raise EmbedError(f"bad f32 response magic: {magic!r}")
+    if len(data) != _F32_HEADER.size + 4 * n * d:
+        raise EmbedError(f"f32 response size mismatch for {n}x{d}")
+    if np is not None:
+        m = np.frombuffer(data, dtype="<f4", count=n * d, offset=_F32_HEADER.size)
+        return m.reshape(n, d).tolist()
+    a = array("f")
+    a.frombytes(memoryview(data)[_F32_HEADER.size :])
+    if sys.byteorder != "little":
+        a.byteswap()
+    return [a[i * d : (i + 1) * d].tolist() for i in range(n)]
+
+
+class EmbedClient:
+    """Keep-alive client bound to one embeddings server base URL."""
+
+    def __init__(self, base_url: str, cfg: EmbedClientConfig | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.cfg = cfg or EmbedClientConfig.from_env()
+        u = urllib.parse.urlsplit(self.base_url)
+        if u.scheme not in ("http", "https"):
+            raise ValueError(f"unsupported embed url: {base_url}")
+        self._https = u.scheme == "https"
+        self._host = u.hostname or "127.0.0.1"
+        self._port = u.port
+        self._prefix = u.path.rstrip("/")
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, self.cfg.max_connections))
+        self.stats = EmbedStats()
+        self._identity: str | None = None
+
+    # --- connection pool ---
+
+    def _new_conn(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        return cls(self._host, self._port, timeout=self.cfg.timeout_s)
+
+    def _checkout(self) -> http.client.HTTPConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._new_conn()
+
+    def _checkin(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.append(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for c in idle:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+    # --- requests ---
+
+    def _once(self, method: str, path: str, body: bytes | None, headers: dict) -> tuple[int, str, bytes]:
+        conn = self._checkout()
+        try:
+            conn.request(method, self._prefix + path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(conn)
+        return resp.status, resp.getheader("Content-Type", ""), data
+
+    def request(self, method: str, path: str, payload: dict | None = None, accept: str = "application/json") -> tuple[str, bytes]:
+        """Send a JSON request; return (content type, raw body) of the 2xx response."""
+
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Accept": accept, "Connection": "keep-alive"}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+
+        attempt = 0
+        while True:
+            t0 = time.perf_counter()
+            err: str
+            with self._slots:
+                try:
+                    status, ctype, data = self._once(method, path, body, headers)
+                except (OSError, http.client.HTTPException, socket.timeout) as e:
+                    status, ctype, data, err = 0, "", b"", f"{type(e).__name__}: {e}"
+                else:
+                    err = f"HTTP {status}"
+            dt_ms = (time.perf_counter() - t0) * 1000.0
+            self._record(dt_ms)
+            _REQUEST_SECONDS.observe(dt_ms / 1000.0, path=path)
+
+            if 200 <= status < 300:
+                return ctype, data
+
+            retryable = status == 0 or status in _RETRY_STATUS
+            if not retryable or attempt >= self.cfg.retries:
+                with self._lock:
+                    self.stats.errors += 1
+                raise EmbedError(f"{method} {self.base_url}{path} failed: {err}")
+
+            attempt += 1
+            with self._lock:
+                self.stats.retries += 1
+            # full jitter: sleep U(0, backoff * 2^attempt)
+            time.sleep(random.uniform(0, self.cfg.backoff_s * (2 ** attempt)))
+
+    def request_json(self, method: str, path: str, payload: dict | None = None):
+        _ctype, data = self.request(method, path, payload)
+        return json.loads(data.decode("utf-8"))
+
+    def _record(self, dt_ms: float) -> None:
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.total_ms += dt_ms
+            if dt_ms > self.stats.max_ms:
+                self.stats.max_ms = dt_ms
+
+    def health(self) -> dict:
+        return self.request_json("GET", "/health")
+
+    def server_identity(self) -> str:
+        """What the server says it serves (model/backend from /health), cached per client.
+
+        Empty if /health is unreachable; the failure is cached too, so /health
+        is asked at most once per client. Callers should then not reuse
+        persisted vectors.
+        """
+
+        if self._identity is None:
+            try:
+                h = self.health()
+            except EmbedError:
+                self._identity = ""
+            else:
+                self._identity = "/".join(str(h.get(k, "")) for k in ("model", "backend"))
+        return self._identity
+
+    def _embed_request(self, texts: List[str]) -> list:
+        _BATCH_SIZE.observe(len(texts))
+        if self.cfg.wire == "json":
+            return self.request_json("POST", "/embed", {"inputs": texts})
+        ctype, data = self.request("POST", "/embed", {"inputs": texts}, accept=f"{F32_MEDIA_TYPE}, application/json;q=0.5")
+        if ctype.split(";")[0].strip() == F32_MEDIA_TYPE:
+            with self._lock:
+                self.stats.binary += 1
+            return decode_f32(data)
+        # older servers ignore Accept and answer with JSON
+        return json.loads(data.decode("utf-8"))
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed `texts` in input order."""
+
+        if not texts:
+            return []
+        out: List[List[float] | None] = [None] * len(texts)
+        for idxs in plan_batches(texts, self.cfg.max_batch, self.cfg.token_budget):
+            part = [texts[i] for i in idxs]
+            vecs = self._embed_request(part)
+            if len(vecs) != len(part):
+                raise EmbedError(f"embed returned {len(vecs)} vectors for {len(part)} inputs")
+            for i, v in zip(idxs, vecs):
+                out[i] = v
+        with self._lock:
+            self.stats.texts += len(texts)
+        return out  # type: ignore[return-value]
+
+    def _stream(self, texts: List[str]) -> Iterator[list]:
+        """POST /embed/stream and yield vectors in request order as they arrive."""
+
+        body = b"".join(json.dumps(t).encode("utf-8") + b"\n" for t in texts)
+        accept = f"{F32_MEDIA_TYPE}, application/x-ndjson;q=0.5" if self.cfg.wire == "f32" else "application/x-ndjson"
+        headers = {"Accept": accept, "Content-Type": "application/x-ndjson"}
+        t0 = time.perf_counter()
+        # dedicated connection: the response is consumed lazily by the caller
+        conn = self._new_conn()
+        try:
+            # the slot covers sending the request, not the lazy read: a caller
+            # holding the generator open must not starve embed() calls
+            with self._slots:
+                conn.request("POST", self._prefix + "/embed/stream", body=body, headers=headers)
+                resp = conn.getresponse()
+            if resp.status != 200:
+                resp.read()
+                raise EmbedError(f"POST {self.base_url}/embed/stream failed: HTTP {resp.status}")
+            ctype = (resp.getheader("Content-Type") or "").split(";")[0].strip()
+            got = 0
+            if ctype == F32_MEDIA_TYPE:
+                while True:
+                    head = resp.read(_F32_HEADER.size)
+                    if not head:
+                        break
+                    if len(head) != _F32_HEADER.size:
+                        raise EmbedError("truncated f32 frame header in embed stream")
+                    magic, n, d = _F32_HEADER.unpack(head)
+                    if magic != F32_MAGIC:
+                        raise EmbedError(f"bad f32 frame magic in embed stream: {magic!r}")
+                    rows = decode_f32(head + resp.read(4 * n * d))
+                    with self._lock:
+                        self.stats.binary += 1
+                    got += len(rows)
+                    yield from rows
+            else:
+                for line in resp:
+                    if line.strip():
+                        got += 1
+                        yield json.loads(line)
+            if got != len(texts):
+                raise EmbedError(f"embed stream returned {got} vectors for {len(texts)} inputs")
+        finally:
+            conn.close()
+            self._record((time.perf_counter() - t0) * 1000.0)
+
+    def embed_stream(self, texts: List[str]) -> Iterator[Tuple[int, list]]:
+        """Yield `(input index, vector)` as vectors become available.
+
+        Inputs are sent sorted by length (when a token budget is set) so the
+        server's micro-batches pad little; indices are therefore not in input
+        order. If the server lacks /embed/stream or the stream breaks, the
+        remaining inputs are embedded with batched /embed requests.
+        """
+
+        if not texts:
+            return
+        if self.cfg.token_budget > 0:
+            order = sorted(range(len(texts)), key=lambda i: estimate_tokens(texts[i]))
+        else:
+            order = list(range(len(texts)))
+        done = 0
+        try:
+            for vec in self._stream([texts[i] for i in order]):
+                yield order[done], vec
+                done += 1
+        except _STREAM_ERRORS:
+            with self._lock:
+                self.stats.errors += 1
+        if done:
+            with self._lock:
+                self.stats.texts += done
+        rest = order[done:]
+        step = max(1, self.cfg.max_batch)
+        for k in range(0, len(rest), step):
+            idxs = rest[k : k + step]
+            yield from zip(idxs, self.embed([texts[i] for i in idxs]))
+
+
+_CLIENTS: dict[str, EmbedClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(base_url: str) -> EmbedClient:
+    """Process-wide client per base URL (so connections are reused across calls)."""
+
+    key = base_url.rstrip("/")
+    with _CLIENTS_LOCK:
+        c = _CLIENTS.get(key)
+        if c is None:
+            c = EmbedClient(key)
+            _CLIENTS[key] = c
+        return c
+
+
+def embed_texts(base_url: str, texts: List[str]) -> List[List[float]]:
+    return get_client(base_url).embed(texts)
+
+
+def embed_stream(base_url: str, texts: List[str]) -> Iterator[Tuple[int, list]]:
+    return get_client(base_url).embed_stream(texts)
+
+
+def embed_one(base_url: str, text: str) -> List[float]:
+    return get_client(base_url).embed([text])[0]
+
+
+def embed_query(base_url: str, model_id: str, text: str) -> List[float]:
+    """Embed a query text through the shared query-embedding cache."""
+
+    from .embed_cache import cached_query_embedding, get_cache
+
+    with tracing.span("embed.query") as sp:
+        misses: list[str] = []
+
+        def fetch(t: str) -> List[float]:
+            misses.append(t)
+            with tracing.span("embed.http"):
+                return embed_one(base_url, t)
+
+        if get_cache().disk_path is None:
+            # in-memory only: entries die with the process, no /health round-trip
+            vec = cached_query_embedding(base_url, model_id, text, fetch)
+        else:
+            # persisted vectors are keyed on what the server actually serves,
+            # not only the local label
+            identity = get_client(base_url).server_identity()
+            if identity:
+                vec = cached_query_embedding(base_url, f"{model_id}|{identity}", text, fetch)
+            else:
+                vec = fetch(text)
+        _QUERY_CACHE.inc(result="miss" if misses else "hit")
+        if sp is not None:
+            sp.set(cached=not misses)
+        return vec
+
+
+def client_stats() -> dict[str, dict]:
+    with _CLIENTS_LOCK:
+        return {url: c.stats.as_dict() for url, c in _CLIENTS.items()}
+
+
+def _collect_client_stats():
+    stats = client_stats()
+    for field, help in (
+        ("requests", "Embeddings HTTP requests (attempts)"),
+        ("retries", "Embeddings request retries"),
+        ("errors", "Embeddings requests that failed after retries"),
+        ("texts", "Texts embedded"),
+    ):
+        name = f"hypermemory_embed_{field}_total"
+        yield (name, "counter", help, [(name, {"url": url}, float(st[field])) for url, st in stats.items()])
+
+
+metrics.REGISTRY.register_collector(_collect_client_stats)
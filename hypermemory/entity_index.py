@@ -16,12 +16,19 @@ This is a lightweight extractor + SQLite store.
 import json
 import re
 import sqlite3
+import time
 from dataclasses import dataclass
 from pathlib import Path
 
+from . import metrics
 from .chunks import iter_semantic_chunks
 from .journal import read_events
 
+_SEARCH_SECONDS = metrics.histogram("hypermemory_entity_search_seconds", "Entity index search latency")
+_BUILD_SECONDS = metrics.histogram("hypermemory_entity_build_seconds", "Entity index build latency")
+_ROWS = metrics.gauge("hypermemory_entity_rows", "Rows in the entity index after the last build")
+_LAST_BUILD = metrics.gauge("hypermemory_index_last_build_timestamp_seconds", "Unix time of the last index build in this process", ("index",))
+
 SERVICE_RE = re.compile(r"\b([a-zA-Z0-9][\w-]*\.service)\b")
 PORT_RE = re.compile(r":([0-9]{2,5})\b")
 ERROR_RE = re.compile(r"\b([A-Z]{3,}:?[A-Z0-9_]{3,})\b")
@@ -117,6 +124,7 @@ def extract_from_text(con: sqlite3.Connection, text: str, source: str, ts_ms: in
 
 
 def build_entity_index(workspace: Path, include_pending: bool = False) -> dict:
+    t0 = time.perf_counter()
     ws = workspace.resolve()
     dbp = db_path(ws)
 
@@ -138,6 +146,9 @@ def build_entity_index(workspace: Path, include_pending: bool = False) -> dict:
         con.commit()
 
         rows = con.execute("SELECT COUNT(*) FROM hm_entity").fetchone()[0]
+        _BUILD_SECONDS.observe(time.perf_counter() - t0)
+        _ROWS.set(rows)
+        _LAST_BUILD.set(time.time(), index="entity")
         return {"db": str(dbp), "rows": int(rows), "emitted": int(total)}
     finally:
         con.close()
@@ -161,6 +172,7 @@ def search_entities(workspace: Path, query: str, limit: int = 10) -> list[Entity
 
     like = f"%{q}%"
 
+    t0 = time.perf_counter()
     con = _connect(dbp)
     try:
         ensure_schema(con)
@@ -196,3 +208,4 @@ def search_entities(workspace: Path, query: str, limit: int = 10) -> list[Entity
         return out
     finally:
         con.close()
+        _SEARCH_SECONDS.observe(time.perf_counter() - t0)
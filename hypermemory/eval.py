@@ -1,7 +1,12 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 
 from .config import Config
@@ -16,6 +21,19 @@ class EvalCase:
     min_hits: int
 
 
+@dataclass
+class CaseResult:
+    query: str
+    category: str
+    passed: bool
+    via: str  # retrieve | file | ""
+    latency_ms: dict[str, float] = field(default_factory=dict)
+    # Expected-mode cases only: 1-based rank of the first hit containing
+    # `expected` (None = not in the top K), and binary-relevance nDCG@K.
+    rank: int | None = None
+    ndcg: float | None = None
+
+
 @dataclass
 class EvalResult:
     total: int
@@ -24,6 +42,18 @@ class EvalResult:
     recall_pct: int
     pass_retrieve: int
     pass_file: int
+    workers: int = 1
+    elapsed_s: float = 0.0
+    # layer -> {n, p50, p95, p99, max} in ms, over the cases that ran retrieve
+    latency: dict[str, dict[str, float]] = field(default_factory=dict)
+    # category (plus "all") -> {n, mrr, ndcg@K, recall@k...}, expected-mode cases only
+    quality: dict[str, dict[str, float]] = field(default_factory=dict)
+    cases: list[CaseResult] = field(default_factory=list)
+
+
+LAYERS = ("entity", "fts", "bm25", "vec", "cloud", "fuse", "total")
+TOP_K = 10
+RECALL_AT = (1, 3, 5, 10)
 
 
 def _iter_eval_cases(ws: Path) -> list[EvalCase]:
@@ -54,7 +84,12 @@ def _iter_eval_cases(ws: Path) -> list[EvalCase]:
     return out
 
 
-def _file_contains(ws: Path, needle: str) -> bool:
+# Below this many needles, one C-level `str.__contains__` per needle beats a
+# pure-Python automaton pass over the corpus.
+_AC_MIN_NEEDLES = 256
+
+
+def _corpus_files(ws: Path) -> list[Path]:
     targets = []
     mdir = ws / "memory"
     if mdir.exists():
@@ -62,58 +97,275 @@ def _file_contains(ws: Path, needle: str) -> bool:
     mem = ws / "MEMORY.md"
     if mem.exists():
         targets.append(mem)
+    return targets
+
 
-    for t in targets:
+def _load_corpus(ws: Path) -> str:
+    """All eval-visible files, read once, NUL-separated so a needle never spans two files."""
+
+    parts = []
+    for t in _corpus_files(ws):
         try:
-            if needle in t.read_text(encoding="utf-8", errors="replace"):
-                return True
+            parts.append(t.read_text(encoding="utf-8", errors="replace"))
         except Exception:
             continue
-    return False
+    return "\0".join(parts)
 
 
-def run_eval(cfg: Config, fast: bool = False, min_recall: int = 0) -> EvalResult:
-    ws = cfg.workspace
-    cases = _iter_eval_cases(ws)
+class _AhoCorasick:
+    """Multi-pattern substring matcher: one pass over the text for all needles."""
+
+    def __init__(self, needles: list[str]):
+        self.needles = needles
+        goto: list[dict[str, int]] = [{}]
+        out: list[list[int]] = [[]]
+        for i, n in enumerate(needles):
+            s = 0
+            for ch in n:
+                nx = goto[s].get(ch)
+                if nx is None:
+                    nx = len(goto)
+                    goto.append({})
+                    out.append([])
+                    goto[s][ch] = nx
+                s = nx
+            out[s].append(i)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for ch, nx in goto[s].items():
+                queue.append(nx)
+                f = fail[s]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nx] = goto[f].get(ch, 0)
+                out[nx] = out[nx] + out[fail[nx]]
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def search(self, text: str) -> set[str]:
+        goto, fail, out = self._goto, self._fail, self._out
+        remaining = len(self.needles)
+        hit = [False] * remaining
+        s = 0
+        for ch in text:
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            if out[s]:
+                for i in out[s]:
+                    if not hit[i]:
+                        hit[i] = True
+                        remaining -= 1
+                if not remaining:
+                    break
+        return {n for n, h in zip(self.needles, hit) if h}
 
-    total = 0
-    passed = 0
-    pass_retrieve = 0
-    pass_file = 0
 
+def _find_needles(corpus: str, needles: set[str]) -> set[str]:
+    needles = {n for n in needles if n}
+    if len(needles) < _AC_MIN_NEEDLES:
+        return {n for n in needles if n in corpus}
+    try:
+        import ahocorasick  # pyahocorasick (optional)
+    except Exception:
+        return _AhoCorasick(sorted(needles)).search(corpus)
+
+    auto = ahocorasick.Automaton()
+    for n in needles:
+        auto.add_word(n, n)
+    auto.make_automaton()
+    return {n for _, n in auto.iter(corpus)}
+
+
+def _case_needle(c: EvalCase) -> str:
+    return c.expected if c.expected else c.query[:80]
+
+
+def _percentile(sorted_vals: list[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    pos = (len(sorted_vals) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (pos - lo)
+
+
+def latency_summary(cases: list[CaseResult]) -> dict[str, dict[str, float]]:
+    out: dict[str, dict[str, float]] = {}
+    for layer in LAYERS:
+        vals = sorted(c.latency_ms[layer] for c in cases if layer in c.latency_ms)
+        if not vals:
+            continue
+        out[layer] = {
+            "n": len(vals),
+            "p50": round(_percentile(vals, 50), 3),
+            "p95": round(_percentile(vals, 95), 3),
+            "p99": round(_percentile(vals, 99), 3),
+            "max": round(vals[-1], 3),
+        }
+    return out
+
+
+def _rank_metrics(snippets: list[str], expected: str) -> tuple[int | None, float]:
+    needle = expected.lower()
+    rel = [needle in s.lower() for s in snippets[:TOP_K]]
+    rank = rel.index(True) + 1 if any(rel) else None
+    dcg = sum(1.0 / math.log2(i + 2) for i, r in enumerate(rel) if r)
+    idcg = sum(1.0 / math.log2(i + 2) for i in range(sum(rel)))
+    return rank, (dcg / idcg if idcg else 0.0)
+
+
+def quality_summary(cases: list[CaseResult]) -> dict[str, dict[str, float]]:
+    groups: dict[str, list[CaseResult]] = {}
     for c in cases:
-        total += 1
-
-        found_file = False
-        found_retrieve = False
-
-        if c.expected:
-            # expected mode
-            if _file_contains(ws, c.expected):
-                found_file = True
-
-            if not fast and not found_file:
-                hits = retrieve(ws, c.query, mode="auto", limit=10)
-                blob = "\n".join(h.snippet for h in hits).lower()
-                if c.expected.lower() in blob:
-                    found_retrieve = True
-        else:
-            # minHits mode
-            if _file_contains(ws, c.query[:80]):
-                found_file = True
-
-            if not fast:
-                hits = retrieve(ws, c.query, mode="auto", limit=10)
-                if len(hits) >= c.min_hits:
-                    found_retrieve = True
-
-        if found_retrieve:
-            passed += 1
-            pass_retrieve += 1
-        elif found_file:
-            passed += 1
-            pass_file += 1
+        if c.ndcg is None:
+            continue
+        groups.setdefault(c.category, []).append(c)
+        groups.setdefault("all", []).append(c)
+
+    out: dict[str, dict[str, float]] = {}
+    for cat in sorted(groups):
+        cs = groups[cat]
+        n = len(cs)
+        row: dict[str, float] = {
+            "n": n,
+            "mrr": round(sum(1.0 / c.rank for c in cs if c.rank) / n, 4),
+            f"ndcg@{TOP_K}": round(sum(c.ndcg or 0.0 for c in cs) / n, 4),
+        }
+        for k in RECALL_AT:
+            row[f"recall@{k}"] = round(sum(1 for c in cs if c.rank and c.rank <= k) / n, 4)
+        out[cat] = row
+    return out
+
+
+def _delta(a, b):
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return round(b - a, 4)
+    return None
+
+
+def compare_runs(base: dict, cur: dict) -> dict:
+    """Diff two `to_json` results (base -> cur): recall, rank metrics, latency, per-case ranks."""
+
+    out: dict = {
+        "recall_pct": {"base": base.get("recall_pct"), "cur": cur.get("recall_pct"), "delta": _delta(base.get("recall_pct"), cur.get("recall_pct"))},
+        "quality": {},
+        "latency": {},
+        "regressed": [],
+        "improved": [],
+    }
+
+    bq, cq = base.get("quality") or {}, cur.get("quality") or {}
+    for cat in sorted(set(bq) | set(cq)):
+        a, b = bq.get(cat, {}), cq.get(cat, {})
+        out["quality"][cat] = {m: {"base": a.get(m), "cur": b.get(m), "delta": _delta(a.get(m), b.get(m))} for m in dict.fromkeys([*a, *b]) if m != "n"}
+
+    bl, cl = base.get("latency") or {}, cur.get("latency") or {}
+    for layer in [x for x in LAYERS if x in bl or x in cl]:
+        a, b = bl.get(layer, {}), cl.get(layer, {})
+        out["latency"][layer] = {p: {"base": a.get(p), "cur": b.get(p), "delta": _delta(a.get(p), b.get(p))} for p in ("p50", "p95", "p99")}
+
+    # Per-case: rank None counts as TOP_K + 1 (fell out of the top K).
+    miss = TOP_K + 1
+    base_cases = {(c["query"], c["category"]): c for c in base.get("cases") or []}
+    for c in cur.get("cases") or []:
+        b = base_cases.get((c["query"], c["category"]))
+        if b is None or b.get("ndcg") is None or c.get("ndcg") is None:
+            continue
+        ra, rb = b.get("rank") or miss, c.get("rank") or miss
+        if ra == rb:
+            continue
+        row = {"query": c["query"], "category": c["category"], "base_rank": b.get("rank"), "cur_rank": c.get("rank")}
+        (out["regressed"] if rb > ra else out["improved"]).append(row)
+    return out
+
+
+def to_json(res: EvalResult) -> str:
+    return json.dumps(asdict(res), ensure_ascii=False, indent=2)
+
+
+def _run_case(ws: Path, c: EvalCase, in_files: set[str], fast: bool) -> CaseResult:
+    found_file = False
+    found_retrieve = False
+    timings: dict[str, float] = {}
+    rank: int | None = None
+    ndcg: float | None = None
+
+    if c.expected:
+        # expected mode
+        if c.expected in in_files:
+            found_file = True
+
+        if not fast and not found_file:
+            hits = retrieve(ws, c.query, mode="auto", limit=TOP_K, timings=timings)
+            rank, ndcg = _rank_metrics([h.snippet for h in hits], c.expected)
+            blob = "\n".join(h.snippet for h in hits).lower()
+            if c.expected.lower() in blob:
+                found_retrieve = True
+    else:
+        # minHits mode
+        if _case_needle(c) in in_files:
+            found_file = True
+
+        if not fast:
+            hits = retrieve(ws, c.query, mode="auto", limit=TOP_K, timings=timings)
+            if len(hits) >= c.min_hits:
+                found_retrieve = True
+
+    via = "retrieve" if found_retrieve else "file" if found_file else ""
+    return CaseResult(
+        query=c.query,
+        category=c.category,
+        passed=bool(via),
+        via=via,
+        latency_ms={k: round(v, 3) for k, v in timings.items()},
+        rank=rank,
+        ndcg=None if ndcg is None else round(ndcg, 4),
+    )
+
+
+def _runs_retrieve(c: EvalCase, in_files: set[str]) -> bool:
+    # Expected-mode file hits pass without retrieve.
+    return not (c.expected and c.expected in in_files)
+
+
+def _default_workers() -> int:
+    env = os.environ.get("HYPERMEMORY_EVAL_WORKERS", "")
+    if env:
+        return max(1, int(env))
+    return min(8, os.cpu_count() or 1)
+
+
+def run_eval(cfg: Config, fast: bool = False, min_recall: int = 0, workers: int | None = None) -> EvalResult:
+    ws = cfg.workspace.resolve()
+    cases = _iter_eval_cases(ws)
+    workers = max(1, workers or _default_workers())
+    t0 = time.perf_counter()
+    # Corpus read once; every case's file-level needle resolved in a single pass.
+    in_files = _find_needles(_load_corpus(ws), {_case_needle(c) for c in cases})
+
+    timed = [] if fast else [c for c in cases if _runs_retrieve(c, in_files)]
+    if len(timed) > 1:
+        # Warm shared state (imports, SQLite page cache, embed connection,
+        # query-embedding cache) so the first timed case isn't an outlier.
+        retrieve(ws, timed[0].query, mode="auto", limit=TOP_K)
+
+    if workers > 1 and not fast and len(cases) > 1:
+        # Threads: the layers are mostly SQLite/HTTP/Postgres I/O and share
+        # this process's pools and caches.
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hm-eval") as ex:
+            results = list(ex.map(lambda c: _run_case(ws, c, in_files, fast), cases))
+    else:
+        results = [_run_case(ws, c, in_files, fast) for c in cases]
 
+    total = len(results)
+    pass_retrieve = sum(1 for r in results if r.via == "retrieve")
+    pass_file = sum(1 for r in results if r.via == "file")
+    passed = pass_retrieve + pass_file
     failed = total - passed
     recall_pct = int((passed * 100) / total) if total else 0
 
@@ -127,4 +379,9 @@ def run_eval(cfg: Config, fast: bool = False, min_recall: int = 0) -> EvalResult
         recall_pct=recall_pct,
         pass_retrieve=pass_retrieve,
         pass_file=pass_file,
+        workers=workers,
+        elapsed_s=round(time.perf_counter() - t0, 3),
+        latency=latency_summary(results),
+        quality=quality_summary(results),
+        cases=results,
     )
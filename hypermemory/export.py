@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+"""Streaming export of the journal and memory corpus (optionally redacted).
+
+Sources, read line by line (constant memory):
+- MEMORY.md bullets                       kind=chunk
+- memory/YYYY-MM-DD.md daily files        kind=chunk
+- memory/journal.jsonl events             kind=event
+
+With `redact=True` (default), every text goes through `redaction.iter_redact`
+on a process pool and `validate_allowlist`. Records failing the allowlist are
+dropped (`strict=True`, default) or, with `strict=False`, kept and annotated
+(`allowlist`).
+
+Output: gzip-compressed JSONL parts `export-00000.jsonl.gz`, ... rotated by
+record count / uncompressed bytes, plus `summary.json` with per-rule
+redaction counts.
+"""
+
+import gzip
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from itertools import tee
+from pathlib import Path
+from typing import IO, Iterator
+
+from .redaction import iter_redact, validate_allowlist
+
+DAILY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}\.md$")
+SOURCES = ("memory", "daily", "journal")
+
+
+@dataclass
+class ExportStats:
+    out_dir: str
+    records: int = 0
+    events: int = 0
+    chunks: int = 0
+    dropped: int = 0
+    redactions: int = 0
+    rule_counts: dict[str, int] = field(default_factory=dict)
+    allowlist: dict[str, int] = field(default_factory=dict)
+    files: list[str] = field(default_factory=list)
+    elapsed_s: float = 0.0
+
+
+def _iter_text_lines(path: Path, rel: str) -> Iterator[dict]:
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for n, line in enumerate(f, 1):
+            text = line.rstrip("\n").strip()
+            if text:
+                yield {"kind": "chunk", "source": rel, "line": n, "text": text}
+
+
+def _iter_journal(path: Path, rel: str) -> Iterator[dict]:
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                continue
+            yield {
+                "kind": "event",
+                "source": rel,
+                "line": n,
+                "ts_ms": int(obj.get("ts_ms", 0)),
+                "channel": str(obj.get("channel", "unknown")),
+                "session_key": str(obj.get("session_key", "")),
+                "role": str(obj.get("role", "user")),
+                "text": str(obj.get("message", "")),
+            }
+
+
+def iter_records(workspace: Path, sources: tuple[str, ...] = SOURCES) -> Iterator[dict]:
+    ws = workspace.resolve()
+    mem = ws / "memory"
+    if "memory" in sources and (ws / "MEMORY.md").exists():
+        yield from _iter_text_lines(ws / "MEMORY.md", "MEMORY.md")
+    if "daily" in sources and mem.is_dir():
+        for p in sorted(mem.iterdir()):
+            if DAILY_RE.match(p.name):
+                yield from _iter_text_lines(p, f"memory/{p.name}")
+    if "journal" in sources and (mem / "journal.jsonl").exists():
+        yield from _iter_journal(mem / "journal.jsonl", "memory/journal.jsonl")
+
+
+class _RotatingWriter:
+    """gzip JSONL parts, rotated after `max_records` records or `max_bytes` uncompressed (UTF-8) bytes."""
+
+    def __init__(self, out_dir: Path, max_records: int, max_bytes: int):
+        self.out_dir = out_dir
+        self.max_records = max(1, max_records)
+        self.max_bytes = max(1, max_bytes)
+        self.files: list[str] = []
+        self._f: IO[bytes] | None = None
+        self._records = 0
+        self._bytes = 0
+
+    def write(self, rec: dict) -> None:
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._f is None or self._records >= self.max_records or self._bytes + len(line) > self.max_bytes and self._records:
+            self._rotate()
+        assert self._f is not None
+        self._f.write(line)
+        self._records += 1
+        self._bytes += len(line)
+
+    def _rotate(self) -> None:
+        self.close()
+        name = f"export-{len(self.files):05d}.jsonl.gz"
+        self._f = gzip.open(self.out_dir / name, "wb", compresslevel=6)
+        self.files.append(name)
+        self._records = 0
+        self._bytes = 0
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def export_corpus(
+    workspace: Path,
+    out_dir: Path | None = None,
+    redact: bool = True,
+    strict: bool = True,
+    workers: int | None = None,
+    max_records: int = 100_000,
+    max_bytes: int = 64 * 1024 * 1024,
+    sources: tuple[str, ...] = SOURCES,
+) -> ExportStats:
+    ws = workspace.resolve()
+    if out_dir is None:
+        out_dir = ws / "memory" / "export" / time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    stats = ExportStats(out_dir=str(out_dir))
+    t0 = time.perf_counter()
+    writer = _RotatingWriter(out_dir, max_records, max_bytes)
+
+    recs = iter_records(ws, sources)
+    if redact:
+        # tee only buffers the records whose texts are in flight on the pool
+        recs, texts = tee(recs)
+        results = iter_redact((r["text"] for r in texts), workers=workers, chunk_size=512)
+    else:
+        results = None
+
+    try:
+        for rec in recs:
+            if results is not None:
+                rr = next(results)
+                rec["text"] = rr.text
+                ok, reasons = validate_allowlist(rr.text)
+                for r in reasons:
+                    stats.allowlist[r] = stats.allowlist.get(r, 0) + 1
+                if not ok and strict:
+                    stats.dropped += 1
+                    continue
+                if rr.redaction_count:
+                    rec["redactions"] = rr.redaction_count
+                    stats.redactions += rr.redaction_count
+                    for name, n in rr.rule_counts.items():
+                        stats.rule_counts[name] = stats.rule_counts.get(name, 0) + n
+                if reasons:
+                    rec["allowlist"] = reasons
+            writer.write(rec)
+            stats.records += 1
+            if rec["kind"] == "event":
+                stats.events += 1
+            else:
+                stats.chunks += 1
+    finally:
+        writer.close()
+
+    stats.files = writer.files
+    stats.elapsed_s = round(time.perf_counter() - t0, 3)
+    summary = {**stats.__dict__, "redacted": redact, "strict": strict, "sources": list(sources)}
+    (out_dir / "summary.json").write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    return stats
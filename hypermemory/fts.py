@@ -19,9 +19,17 @@ Design goals:
 
 import re
 import sqlite3
+import time
 from dataclasses import dataclass
 from pathlib import Path
 
+from . import metrics, tracing
+
+_SEARCH_SECONDS = metrics.histogram("hypermemory_fts_search_seconds", "SQLite FTS search latency")
+_BUILD_SECONDS = metrics.histogram("hypermemory_fts_build_seconds", "FTS index build latency")
+_DOCS_INDEXED = metrics.counter("hypermemory_fts_docs_indexed_total", "Documents (re)indexed into FTS")
+_LAST_BUILD = metrics.gauge("hypermemory_index_last_build_timestamp_seconds", "Unix time of the last index build in this process", ("index",))
+
 DAILY_NAME_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.md$")
 BULLET_RE = re.compile(r"^\s*-\s*(.+?)\s*$")
 H2_RE = re.compile(r"^##\s+(.+?)\s*$")
@@ -143,30 +151,37 @@ def search(workspace: Path, query: str, limit: int = 20) -> list[FtsHit]:
     if not db.exists():
         return []
 
+    t0 = time.perf_counter()
     # FTS5 phrase query; escape quotes
     q_esc = query.replace('"', '""')
     match = f'"{q_esc}"'
 
-    con = sqlite3.connect(str(db))
+    with tracing.span("fts.open"):
+        con = sqlite3.connect(str(db))
     try:
-        cur = con.execute(
-            """
-            SELECT source, source_key, chunk_ix, substr(text,1,220)
-            FROM entry_fts
-            WHERE entry_fts MATCH ?
-            ORDER BY rank
-            LIMIT ?;
-            """,
-            (match, int(limit)),
-        )
-        rows = cur.fetchall()
+        with tracing.span("fts.query") as sp:
+            cur = con.execute(
+                """
+                SELECT source, source_key, chunk_ix, substr(text,1,220)
+                FROM entry_fts
+                WHERE entry_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?;
+                """,
+                (match, int(limit)),
+            )
+            rows = cur.fetchall()
+            if sp is not None:
+                sp.set(rows=len(rows))
     finally:
         con.close()
 
+    _SEARCH_SECONDS.observe(time.perf_counter() - t0)
     return [FtsHit(str(r[0]), str(r[1]), int(r[2]), str(r[3])) for r in rows]
 
 
 def build_index(workspace: Path, force: bool = False, full_rebuild: bool = False) -> BuildResult:
+    t0 = time.perf_counter()
     ws = workspace.resolve()
     db = ws / "memory" / "supermemory.sqlite"
     db.parent.mkdir(parents=True, exist_ok=True)
@@ -264,4 +279,7 @@ def build_index(workspace: Path, force: bool = False, full_rebuild: bool = False
     finally:
         con.close()
 
+    _BUILD_SECONDS.observe(time.perf_counter() - t0)
+    _DOCS_INDEXED.inc(docs_indexed)
+    _LAST_BUILD.set(time.time(), index="fts")
     return BuildResult(db_path=db, full_rebuild=full_rebuild, docs_indexed=docs_indexed)
@@ -19,6 +19,13 @@ import time
 from dataclasses import dataclass
 from pathlib import Path
 
+from . import metrics
+
+_APPEND_SECONDS = metrics.histogram("hypermemory_journal_append_seconds", "append_event() latency incl. lock and projections")
+_LOCK_WAIT_SECONDS = metrics.histogram("hypermemory_journal_lock_wait_seconds", "Time waiting for the journal lock")
+_FSYNC_SECONDS = metrics.histogram("hypermemory_journal_fsync_seconds", "fsync() latency per appended line", ("file",))
+_EVENTS_TOTAL = metrics.counter("hypermemory_journal_events_total", "Events appended to the journal")
+
 
 @dataclass(frozen=True)
 class JournalEvent:
@@ -59,7 +66,9 @@ def _append_line(path: Path, line: str) -> None:
         if not line.endswith("\n"):
             f.write("\n")
         f.flush()
+        t0 = time.perf_counter()
         os.fsync(f.fileno())
+        _FSYNC_SECONDS.observe(time.perf_counter() - t0, file="journal" if path.name == "journal.jsonl" else "daily")
 
 
 def read_events(workspace: Path) -> list[JournalEvent]:
@@ -155,6 +164,7 @@ def append_event(
     Projections are best-effort; journal append is durable.
     """
 
+    t_start = time.perf_counter()
     ws = workspace.resolve()
     mem = ws / "memory"
     mem.mkdir(parents=True, exist_ok=True)
@@ -170,9 +180,12 @@ def append_event(
     journal = mem / "journal.jsonl"
     lock_dir = mem / ".journal.lock"
 
+    t_lock = time.perf_counter()
     _mkdir_lock(lock_dir)
+    _LOCK_WAIT_SECONDS.observe(time.perf_counter() - t_lock)
     try:
         _append_line(journal, json.dumps(ev.__dict__, ensure_ascii=False))
+        _EVENTS_TOTAL.inc()
 
         # projection: last-messages.jsonl
         last = mem / "last-messages.jsonl"
@@ -195,4 +208,5 @@ def append_event(
     finally:
         _mkdir_unlock(lock_dir)
 
+    _APPEND_SECONDS.observe(time.perf_counter() - t_start)
     return ev
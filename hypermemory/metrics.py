@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+"""In-process metrics registry with Prometheus text exposition (stdlib only).
+
+Counters, gauges and histograms with label sets, plus pull-time collectors
+for values that are cheaper to read on scrape (client stats, index
+freshness). Instrumented modules create their metrics at import time through
+`counter()` / `gauge()` / `histogram()`; the hot path is one dict lookup and
+a lock per observation.
+
+Expose from a long-running process:
+
+    from hypermemory import metrics
+    metrics.start_server("127.0.0.1:9464")      # or "unix:/run/hm/metrics.sock"
+
+`HYPERMEMORY_METRICS_ADDR` is the default address. Values live in this
+process only: `hypermemory metrics serve` is a separate process and reports
+index freshness for the workspace, not the counters of other processes.
+"""
+
+import bisect
+import os
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Iterable
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_ADDR = "127.0.0.1:9464"
+
+# seconds; 0.5ms .. 10s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# (sample name, labels, value)
+Sample = tuple[str, dict[str, str], float]
+# (family name, type, help, samples)
+Family = tuple[str, str, str, list[Sample]]
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if len(labels) != len(self.labelnames) or not all(n in labels for n in self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labels(self, key: tuple[str, ...]) -> dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def collect(self) -> Family:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount  # type: ignore[operator]
+
+    def value(self, **labels: str) -> float:
+        return float(self._values.get(self._key(labels), 0.0))  # type: ignore[arg-type]
+
+    def collect(self) -> Family:
+        with self._lock:
+            items = list(self._values.items())
+        return (self.name, self.kind, self.help, [(self.name, self._labels(k), float(v)) for k, v in items])  # type: ignore[arg-type]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            st = self._values.get(key)
+            if st is None:
+                # per-bucket counts (+Inf last), sum, count
+                st = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = st
+            st[0][i] += 1  # type: ignore[index]
+            st[1] += value  # type: ignore[index]
+            st[2] += 1  # type: ignore[index]
+
+    def collect(self) -> Family:
+        with self._lock:
+            items = [(k, (list(st[0]), st[1], st[2])) for k, st in self._values.items()]  # type: ignore[index]
+        samples: list[Sample] = []
+        for key, (counts, total, n) in items:
+            labels = self._labels(key)
+            acc = 0
+            for b, c in zip((*self.buckets, float("inf")), counts):
+                acc += c
+                samples.append((f"{self.name}_bucket", {**labels, "le": _fmt_value(b)}, float(acc)))
+            samples.append((f"{self.name}_sum", labels, float(total)))
+            samples.append((f"{self.name}_count", labels, float(n)))
+        return (self.name, self.kind, self.help, samples)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], Iterable[Family]]] = []
+
+    def _get_or_create(self, cls, name: str, help: str, labelnames: tuple[str, ...], **kw) -> _Metric:
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = cls(name, help, labelnames, **kw)
+                self._metrics[name] = m
+            elif type(m) is not cls or m.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} already registered as {m.kind}{m.labelnames}")
+            return m
+
+    def register_collector(self, fn: Callable[[], Iterable[Family]]) -> None:
+        with self._lock:
+            self._collectors.append(fn)
+
+    def collect(self) -> list[Family]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        out = [m.collect() for m in metrics]
+        for fn in collectors:
+            try:
+                out.extend(fn())
+            except Exception:  # a broken collector must not break the scrape
+                continue
+        return out
+
+    def exposition(self) -> str:
+        lines: list[str] = []
+        for name, kind, help, samples in self.collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sname, labels, value in samples:
+                lines.append(f"{sname}{_fmt_labels(labels)} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    return REGISTRY._get_or_create(Counter, name, help, labelnames)  # type: ignore[return-value]
+
+
+def gauge(name: str, help: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+    return REGISTRY._get_or_create(Gauge, name, help, labelnames)  # type: ignore[return-value]
+
+
+def histogram(name: str, help: str, labelnames: tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY._get_or_create(Histogram, name, help, labelnames, buckets=buckets)  # type: ignore[return-value]
+
+
+def exposition() -> str:
+    return REGISTRY.exposition()
+
+
+def _mtime(p: Path) -> float:
+    try:
+        return p.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def freshness_collector(workspace: Path) -> Callable[[], Iterable[Family]]:
+    """Index age and lag (newest source mtime - index mtime) for the FTS and entity indexes."""
+
+    ws = workspace.resolve()
+
+    def collect() -> Iterable[Family]:
+        mem = ws / "memory"
+        curated = _mtime(ws / "MEMORY.md")
+        daily = max((_mtime(p) for p in mem.glob("????-??-??.md")), default=0.0) if mem.is_dir() else 0.0
+        journal = _mtime(mem / "journal.jsonl")
+        indexes = {
+            "fts": (mem / "supermemory.sqlite", max(curated, daily)),
+            "entity": (mem / "entity.sqlite", max(curated, journal)),
+        }
+        now = time.time()
+        lag: list[Sample] = []
+        age: list[Sample] = []
+        for name, (db, newest) in indexes.items():
+            built = _mtime(db)
+            if not built:
+                continue
+            lag.append(("hypermemory_index_lag_seconds", {"index": name}, max(0.0, newest - built)))
+            age.append(("hypermemory_index_age_seconds", {"index": name}, max(0.0, now - built)))
+        return [
+            ("hypermemory_index_lag_seconds", "gauge", "Newest source file mtime minus index mtime (0 = up to date)", lag),
+            ("hypermemory_index_age_seconds", "gauge", "Seconds since the index file was last written", age),
+        ]
+
+    return collect
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # quiet
+        return
+
+    def address_string(self) -> str:
+        return str(self.client_address[0]) if isinstance(self.client_address, tuple) else "unix"
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(addr: str | None = None, registry: Registry = REGISTRY) -> socketserver.BaseServer:
+    """`host:port` or `unix:/path/to.sock` (a stale socket file is replaced)."""
+
+    addr = addr or os.environ.get("HYPERMEMORY_METRICS_ADDR", "") or DEFAULT_ADDR
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    if addr.startswith("unix:"):
+        path = addr[len("unix:") :]
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)
+            else:
+                probe.close()
+                raise OSError(f"metrics socket already in use: {path}")
+        return _UnixHTTPServer(path, handler)
+    host, _, port = addr.rpartition(":")
+    srv = ThreadingHTTPServer((host or "127.0.0.1", int(port)), handler)
+    srv.daemon_threads = True
+    return srv
+
+
+def start_server(addr: str | None = None, registry: Registry = REGISTRY) -> socketserver.BaseServer:
+    """Serve /metrics from a daemon thread; returns the server (call .shutdown() to stop)."""
+
+    srv = make_server(addr, registry)
+    threading.Thread(target=srv.serve_forever, name="hm-metrics", daemon=True).start()
+    return srv
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+"""pgvector storage codecs for local and cloud embedding tables.
+
+Codecs:
+- vector  (default) full-precision HNSW expression index over `embedding::vector(dims)`
+- halfvec float16 HNSW expression index over `embedding::halfvec(dims)`
+- bit     binary-quantized HNSW expression index over `binary_quantize(embedding)::bit(dims)`
+
+Indexes are partial per dims (`WHERE dims = d`) because HNSW needs a fixed
+dimension and the `embedding` column is untyped; queries must filter on
+`dims` and order by the same expression to use them.
+
+Rows keep their full-precision `vector`; the codec only decides what the
+ANN index holds. `vector` searches the index directly. halfvec/bit do a
+coarse kNN pass over the compressed expression, then rerank `limit * rerank` candidates by exact cosine distance;
+`hnsw.ef_search` is raised for that transaction to cover the candidate count.
+
+halfvec/bit need pgvector >= 0.7; older servers fall back to `vector`.
+"""
+
+import os
+
+import psycopg
+
+CODECS = ("vector", "halfvec", "bit")
+
+_OPS = {"vector": "vector_cosine_ops", "halfvec": "halfvec_cosine_ops", "bit": "bit_hamming_ops"}
+
+
+def codec_from_env(var: str) -> str:
+    codec = os.environ.get(var, "vector")
+    if codec not in CODECS:
+        raise ValueError(f"{var} must be one of {CODECS}")
+    return codec
+
+
+def rerank_factor() -> int:
+    return max(1, int(os.environ.get("HYPERMEMORY_VECTOR_RERANK", "10")))
+
+
+def set_ef_search(con: psycopg.Connection, candidates: int) -> None:
+    """Let the HNSW scan return `candidates` rows (transaction-local).
+
+    hnsw.ef_search (default 40) caps what an index scan yields, so a coarse
+    `LIMIT limit * rerank` above it would silently return fewer candidates.
+    pgvector accepts at most 1000.
+    """
+
+    con.execute(f"SET LOCAL hnsw.ef_search = {min(1000, max(40, int(candidates)))}")
+
+
+_SUPPORTED: dict[str, bool] = {}
+
+
+def effective(con: psycopg.Connection, conninfo: str, codec: str) -> str:
+    """`codec` if the server's pgvector supports it, else `vector` (checked once per URL)."""
+
+    if codec == "vector":
+        return codec
+    ok = _SUPPORTED.get(conninfo)
+    if ok is None:
+        row = con.execute("SELECT extversion FROM pg_extension WHERE extname='vector'").fetchone()
+        parts = [int(p) for p in str(row[0]).split(".")[:2] if p.isdigit()] if row else []
+        ok = tuple(parts) >= (0, 7)
+        if row:
+            _SUPPORTED[conninfo] = ok
+    return codec if ok else "vector"
+
+
+def coarse_expr(codec: str, column: str, dims: int) -> str:
+    d = int(dims)
+    if codec == "halfvec":
+        return f"({column}::halfvec({d}))"
+    if codec == "bit":
+        return f"(binary_quantize({column})::bit({d}))"
+    return f"({column}::vector({d}))"
+
+
+def coarse_query(codec: str, dims: int) -> str:
+    """Placeholder expression for the query vector matching `coarse_expr`."""
+
+    d = int(dims)
+    if codec == "halfvec":
+        return f"%s::vector({d})::halfvec({d})"
+    if codec == "bit":
+        return f"binary_quantize(%s::vector({d}))::bit({d})"
+    return f"%s::vector({d})"
+
+
+def coarse_op(codec: str) -> str:
+    return "<~>" if codec == "bit" else "<=>"
+
+
+def ensure_index(con: psycopg.Connection, table: str, codec: str, dims: int, column: str = "embedding") -> None:
+    """Create the per-dims partial ANN index backing `codec` (idempotent).
+
+    Checks the catalog first: `CREATE INDEX IF NOT EXISTS` still takes a
+    SHARE lock on the table, which would block writers on every call.
+    """
+
+    d = int(dims)
+    name = f"{table}_{codec}_{d}_idx"
+    if con.execute("SELECT to_regclass(%s)", (name,)).fetchone()[0] is not None:
+        return
+    con.execute(
+        f"CREATE INDEX IF NOT EXISTS {name} ON {table} "
+        f"USING hnsw ({coarse_expr(codec, column, d)} {_OPS[codec]}) WHERE dims = {d}"
+    )
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+"""Pooled Postgres connections for local pgvector, cloud L3 and doctor.
+
+One pool per database URL, process-wide. This is a small in-package pool
+(no psycopg_pool dependency) so connection errors surface immediately and
+doctor can report them verbatim.
+
+Every physical connection registers the pgvector types once (when the
+extension exists), instead of a `register_vector` lookup per call.
+
+Env:
+- HYPERMEMORY_PG_POOL_MIN      connections opened up front on first use (default 1)
+- HYPERMEMORY_PG_POOL_MAX      max connections per URL (default 4)
+- HYPERMEMORY_PG_POOL_TIMEOUT  seconds to wait for a free connection (default 30)
+"""
+
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+import psycopg
+from pgvector.psycopg import register_vector
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    min_size: int = 1
+    max_size: int = 4
+    timeout_s: float = 30.0
+
+    @staticmethod
+    def from_env() -> "PoolConfig":
+        mx = max(1, int(os.environ.get("HYPERMEMORY_PG_POOL_MAX", "4")))
+        return PoolConfig(
+            min_size=min(mx, max(0, int(os.environ.get("HYPERMEMORY_PG_POOL_MIN", "1")))),
+            max_size=mx,
+            timeout_s=float(os.environ.get("HYPERMEMORY_PG_POOL_TIMEOUT", "30")),
+        )
+
+
+def ensure_vector(con: psycopg.Connection) -> bool:
+    """Register pgvector types on `con` once. Returns False if the extension is missing."""
+
+    if con.adapters.types.get("vector") is not None:
+        return True
+    try:
+        register_vector(con)
+    except psycopg.ProgrammingError:
+        # extension not installed yet (e.g. before init_schema)
+        if con.info.transaction_status == psycopg.pq.TransactionStatus.INERROR:
+            con.rollback()
+        return False
+    return True
+
+
+def _configure(con: psycopg.Connection) -> None:
+    ensure_vector(con)
+    if not con.autocommit:
+        con.commit()
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg connections for one conninfo."""
+
+    def __init__(self, conninfo: str, cfg: PoolConfig):
+        self.conninfo = conninfo
+        self.cfg = cfg
+        self._idle: list[psycopg.Connection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(cfg.max_size)
+        self._warmed = False
+
+    def _new(self, connect_timeout: float | None = None) -> psycopg.Connection:
+        kw = {} if connect_timeout is None else {"connect_timeout": max(2, int(connect_timeout))}
+        con = psycopg.connect(self.conninfo, **kw)
+        _configure(con)
+        return con
+
+    @staticmethod
+    def _healthy(con: psycopg.Connection) -> bool:
+        # idle connections are parked committed; anything else was left mid-transaction
+        # or lost its server (status UNKNOWN)
+        if con.closed or con.broken:
+            return False
+        return con.info.transaction_status == psycopg.pq.TransactionStatus.IDLE
+
+    @staticmethod
+    def _discard(con: psycopg.Connection) -> None:
+        try:
+            con.close()
+        except Exception:
+            pass
+
+    def _checkout(self) -> psycopg.Connection | None:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                con = self._idle.pop()
+            if self._healthy(con):
+                return con
+            self._discard(con)
+
+    @contextmanager
+    def connection(self, timeout: float | None = None, connect_timeout: float | None = None) -> Iterator[psycopg.Connection]:
+        """Borrow a connection; `timeout` waits for a free slot, `connect_timeout` bounds a new connect."""
+
+        wait = self.cfg.timeout_s if timeout is None else timeout
+        if not self._slots.acquire(timeout=wait):
+            raise TimeoutError(f"pool timeout after {wait}s")
+        con: psycopg.Connection | None = None
+        discard = False
+        try:
+            con = self._checkout()
+            if con is None:
+                con = self._new(connect_timeout)
+                self._warm()
+            try:
+                yield con
+            except BaseException:
+                if not (con.closed or con.broken):
+                    try:
+                        con.rollback()
+                    except Exception:
+                        discard = True
+                raise
+            else:
+                if not con.closed:
+                    try:
+                        con.commit()
+                    except BaseException:
+                        discard = True
+                        raise
+        finally:
+            if con is not None:
+                if discard or not self._healthy(con):
+                    self._discard(con)
+                else:
+                    with self._lock:
+                        self._idle.append(con)
+            self._slots.release()
+
+    def _warm(self) -> None:
+        # after the first successful connect, pre-open up to min_size - 1 idle connections
+        with self._lock:
+            if self._warmed:
+                return
+            self._warmed = True
+        for _ in range(self.cfg.min_size - 1):
+            try:
+                c = self._new()
+            except psycopg.Error:
+                return
+            with self._lock:
+                self._idle.append(c)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for c in idle:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+
+_POOLS: dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(conninfo: str) -> ConnectionPool:
+    with _POOLS_LOCK:
+        pool = _POOLS.get(conninfo)
+        if pool is None:
+            pool = ConnectionPool(conninfo, PoolConfig.from_env())
+            _POOLS[conninfo] = pool
+        return pool
+
+
+@contextmanager
+def connection(conninfo: str, timeout: float | None = None, connect_timeout: float | None = None) -> Iterator[psycopg.Connection]:
+    """Borrow a pooled connection (committed on success, rolled back on error)."""
+
+    with get_pool(conninfo).connection(timeout=timeout, connect_timeout=connect_timeout) as con:
+        yield con
+
+
+@atexit.register
+def close_all() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for p in pools:
+        try:
+            p.close()
+        except Exception:
+            pass
@@ -1,51 +1,56 @@
 from __future__ import annotations
 
-"""Local pgvector semantic index/search for curated+distilled chunks.
+"""Local semantic index/search for curated+distilled chunks.
 
-This uses an external embeddings server (mf-embeddings compatible):
+Backends (HYPERMEMORY_VECTOR_BACKEND):
+- pgvector: Postgres + pgvector (DATABASE_URL)
+- embedded: in-process store under memory/vectors/ (see `vector_store`)
+- auto (default): pgvector when DATABASE_URL is set, otherwise embedded
+
+This uses an external embeddings server (mf-embeddings compatible) via
+`hypermemory.embed_client`:
 - GET /health
 - POST /embed {"inputs": [..]}
+- POST /embed/stream (indexing; falls back to /embed)
 
-Dependencies: psycopg + pgvector (kept in base package).
+Dependencies: psycopg + pgvector (kept in base package); numpy for embedded.
 """
 
 import argparse
 import hashlib
+import itertools
 import json
 import os
-import urllib.request
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable, List
 
 import psycopg
-from pgvector.psycopg import register_vector
 from pgvector import Vector
 
+from . import embed_client as _embed_client
+from . import metrics, pg_codec, pg_pool, tracing
+from . import vector_store
 from .chunks import Chunk, iter_semantic_chunks
+from .config import resolve_vector_backend
 
 
-def sha256(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+_SEARCH_SECONDS = metrics.histogram("hypermemory_vector_search_seconds", "Local vector search latency (embed + search)", ("backend",))
+_INDEXED = metrics.counter("hypermemory_vector_indexed_total", "Chunks embedded and written to the local vector index", ("backend",))
+_LAST_BUILD = metrics.gauge("hypermemory_index_last_build_timestamp_seconds", "Unix time of the last index build in this process", ("index",))
 
 
-def http_json(url: str, payload: dict | None = None, timeout: float = 30.0):
-    if payload is None:
-        req = urllib.request.Request(url, method="GET")
-    else:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method="POST")
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
 def embed_texts(embed_base_url: str, texts: List[str]) -> List[List[float]]:
-    return http_json(f"{embed_base_url.rstrip('/')}/embed", {"inputs": texts})
+    return _embed_client.embed_texts(embed_base_url, texts)
 
 
 def embed_one(embed_base_url: str, text: str) -> Vector:
-    v = http_json(f"{embed_base_url.rstrip('/')}/embed", {"inputs": [text]})
-    return Vector(v[0])
+    return Vector(_embed_client.embed_one(embed_base_url, text))
 
 
 @dataclass
@@ -53,16 +58,21 @@ class LocalVectorConfig:
     database_url: str
     embed_url: str
     model_id: str
+    backend: str = "pgvector"
+    codec: str = "vector"
 
     @staticmethod
     def from_env() -> "LocalVectorConfig":
-        db = os.environ.get("DATABASE_URL")
-        if not db:
+        backend = resolve_vector_backend()
+        db = os.environ.get("DATABASE_URL", "")
+        if backend == "pgvector" and not db:
             raise ValueError("DATABASE_URL missing")
         return LocalVectorConfig(
             database_url=db,
             embed_url=os.environ.get("MF_EMBED_URL", "http://127.0.0.1:8080"),
             model_id=os.environ.get("HYPERMEMORY_LOCAL_MODEL_ID", "local"),
+            backend=backend,
+            codec=pg_codec.codec_from_env("HYPERMEMORY_PGVECTOR_CODEC"),
         )
 
 
@@ -90,57 +100,116 @@ def ensure_schema(con: psycopg.Connection, dims: int) -> None:
 
 def index_workspace(workspace: Path, cfg: LocalVectorConfig, include_pending: bool = False, batch: int = 64) -> int:
     chunks = iter_semantic_chunks(workspace, include_pending=include_pending)
-    if not chunks:
+    if not chunks and cfg.backend != "embedded":
         return 0
 
-    # determine dims
-    dims = len(embed_texts(cfg.embed_url, ["dim-probe"])[0])
+    if cfg.backend == "embedded":
+        # always sync, so chunks that disappeared are dropped from the store
+        store = vector_store.EmbeddedVectorStore(workspace, cfg.model_id)
+        store.upsert(
+            chunks,
+            [sha256(c.text) for c in chunks],
+            lambda b: embed_texts(cfg.embed_url, ["passage: " + c.text for c in b]),
+        )
+        _INDEXED.inc(len(chunks), backend="embedded")
+        _LAST_BUILD.set(time.time(), index="vector")
+        return len(chunks)
+
+    # vectors are streamed from /embed/stream (length-sorted, so they arrive
+    # out of input order) and written as they arrive; `batch` only controls
+    # the DB commit size
+    stream = _embed_client.embed_stream(cfg.embed_url, ["passage: " + c.text for c in chunks])
+    first = next(stream, None)
+    if first is None:
+        return 0
+    dims = len(first[1])
 
-    with psycopg.connect(cfg.database_url) as con:
-        register_vector(con)
+    with pg_pool.connection(cfg.database_url) as con:
         ensure_schema(con, dims)
+        pg_pool.ensure_vector(con)
+        pg_codec.ensure_index(con, "hm_local_embedding", pg_codec.effective(con, cfg.database_url, cfg.codec), dims)
 
         pushed = 0
-        for i in range(0, len(chunks), batch):
-            b = chunks[i : i + batch]
-            vecs = embed_texts(cfg.embed_url, ["passage: " + c.text for c in b])
-            for c, v in zip(b, vecs):
-                con.execute(
-                    """
-                    INSERT INTO hm_local_embedding(doc_id, source, source_key, chunk_ix, content, content_sha, model_id, dims, embedding)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    ON CONFLICT (doc_id, source_key, chunk_ix, model_id)
-                    DO UPDATE SET
-                      content=excluded.content,
-                      content_sha=excluded.content_sha,
-                      dims=excluded.dims,
-                      embedding=excluded.embedding,
-                      updated_at=now()
-                    WHERE hm_local_embedding.content_sha <> excluded.content_sha;
-                    """,
-                    (c.doc_id, c.source, c.source_key, c.chunk_ix, c.text, sha256(c.text), cfg.model_id, dims, v),
-                )
-                pushed += 1
-            con.commit()
-
+        for i, v in itertools.chain([first], stream):
+            c = chunks[i]
+            con.execute(
+                """
+                INSERT INTO hm_local_embedding(doc_id, source, source_key, chunk_ix, content, content_sha, model_id, dims, embedding)
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+                ON CONFLICT (doc_id, source_key, chunk_ix, model_id)
+                DO UPDATE SET
+                  content=excluded.content,
+                  content_sha=excluded.content_sha,
+                  dims=excluded.dims,
+                  embedding=excluded.embedding,
+                  updated_at=now()
+                WHERE hm_local_embedding.content_sha <> excluded.content_sha;
+                """,
+                (c.doc_id, c.source, c.source_key, c.chunk_ix, c.text, sha256(c.text), cfg.model_id, dims, v),
+            )
+            pushed += 1
+            if pushed % batch == 0:
+                con.commit()
+        con.commit()
+
+    _INDEXED.inc(pushed, backend="pgvector")
+    _LAST_BUILD.set(time.time(), index="vector")
     return pushed
 
 
-def search_workspace(cfg: LocalVectorConfig, query: str, limit: int = 8) -> list[str]:
-    qvec = embed_one(cfg.embed_url, "query: " + query)
-
-    with psycopg.connect(cfg.database_url) as con:
-        register_vector(con)
-        cur = con.execute(
-            """
-            SELECT doc_id, source_key, chunk_ix, content, 1 - (embedding <=> %s) AS sim
-            FROM hm_local_embedding
-            WHERE model_id=%s
-            ORDER BY embedding <=> %s
-            LIMIT %s;
-            """,
-            (qvec, cfg.model_id, qvec, int(limit)),
-        )
+def search_workspace(cfg: LocalVectorConfig, query: str, limit: int = 8, workspace: Path | None = None) -> list[str]:
+    t0 = time.perf_counter()
+    if cfg.backend == "embedded":
+        if workspace is None:
+            raise ValueError("embedded vector backend needs a workspace")
+        q = _embed_client.embed_query(cfg.embed_url, cfg.model_id, "query: " + query)
+        with tracing.span("vec.search", backend="embedded"):
+            hits = vector_store.EmbeddedVectorStore(workspace, cfg.model_id).search(q, limit=limit)
+        _SEARCH_SECONDS.observe(time.perf_counter() - t0, backend="embedded")
+        return [f"[{h.sim:.4f}] {h.doc_id}:{h.source_key}#{h.chunk_ix} {h.content}" for h in hits]
+
+    q = _embed_client.embed_query(cfg.embed_url, cfg.model_id, "query: " + query)
+    qvec = Vector(q)
+
+    with tracing.span("vec.sql", backend="pgvector") as sp, pg_pool.connection(cfg.database_url) as con:
+        pg_pool.ensure_vector(con)
+        codec = pg_codec.effective(con, cfg.database_url, cfg.codec)
+        if sp is not None:
+            sp.set(codec=codec)
+        dims = len(q)
+        if codec == "vector":
+            pg_codec.set_ef_search(con, int(limit))
+            cur = con.execute(
+                f"""
+                SELECT doc_id, source_key, chunk_ix, content, 1 - (embedding <=> %s) AS sim
+                FROM hm_local_embedding
+                WHERE model_id=%s AND dims={int(dims)}
+                ORDER BY {pg_codec.coarse_expr(codec, "embedding", dims)} <=> {pg_codec.coarse_query(codec, dims)}
+                LIMIT %s;
+                """,
+                (qvec, cfg.model_id, qvec, int(limit)),
+                prepare=True,
+            )
+        else:
+            # coarse kNN over the compressed index, exact rerank of the candidates
+            pg_codec.set_ef_search(con, int(limit) * pg_codec.rerank_factor())
+            cur = con.execute(
+                f"""
+                SELECT doc_id, source_key, chunk_ix, content, 1 - (embedding <=> %s) AS sim
+                FROM (
+                  SELECT doc_id, source_key, chunk_ix, content, embedding
+                  FROM hm_local_embedding
+                  WHERE model_id=%s AND dims={int(dims)}
+                  ORDER BY {pg_codec.coarse_expr(codec, "embedding", dims)} {pg_codec.coarse_op(codec)} {pg_codec.coarse_query(codec, dims)}
+                  LIMIT %s
+                ) c
+                ORDER BY embedding <=> %s
+                LIMIT %s;
+                """,
+                (qvec, cfg.model_id, qvec, int(limit) * pg_codec.rerank_factor(), qvec, int(limit)),
+                prepare=True,
+            )
         rows = cur.fetchall()
 
+    _SEARCH_SECONDS.observe(time.perf_counter() - t0, backend="pgvector")
     return [f"[{float(sim):.4f}] {r[0]}:{r[1]}#{r[2]} {r[3]}" for r in rows]
@@ -3,11 +3,24 @@ from __future__ import annotations
 """Outbound redaction & allowlist validation.
 
 Used for cloud sync safety.
+
+All patterns are compiled once at import. `redact` lowercases the text once
+and checks each rule's literal triggers (substrings every match of the rule
+must contain); clean text, the common case, returns without running a regex.
+Rules whose triggers are present run in order, exactly as before (later
+rules see earlier replacements). Skipping the others is exact: replacements
+only delete text and insert `[REDACTED]`, which cannot form a trigger.
+
+`iter_redact` / `redact_many` spread large inputs over a process pool.
 """
 
+import os
 import re
-from dataclasses import dataclass
-from typing import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import islice
+from typing import Iterable, Iterator
 
 
 @dataclass
@@ -15,6 +28,7 @@ class RedactionResult:
     text: str
     redaction_count: int
     matched_rules: list[str]
+    rule_counts: dict[str, int] = field(default_factory=dict)
 
 
 _RULES: list[tuple[str, re.Pattern[str]]] = [
@@ -27,6 +41,41 @@ _RULES: list[tuple[str, re.Pattern[str]]] = [
     ("jwt", re.compile(r"\beyJ[A-Za-z0-9_\-]+\.[A-Za-z0-9_\-]+\.[A-Za-z0-9_\-]+\b")),
 ]
 
+_URL_QUERY = re.compile(r"(https?://[^\s\?]+)\?([^\s]+)")
+
+
+# rule -> any-of groups of all-of lowercase literals; a rule can only match if
+# one group is fully contained in text.lower(). Keep in sync with _RULES.
+_TRIGGERS: dict[str, tuple[tuple[str, ...], ...]] = {
+    "openai_api_key": (("sk-",),),
+    "bearer": (("bearer",),),
+    "aws_access_key": (("akia",),),
+    "aws_secret_key": (("aws", "secret"),),
+    "generic_api_key": (("api",), ("secret",), ("password",), ("token",)),
+    "private_key_block": (("private key",),),
+    "jwt": (("eyj",),),
+    "url_query": (("://", "?"),),
+}
+
+
+# the only non-ASCII characters that (?i) matches against an ASCII letter but
+# whose str.lower() isn't that letter (found by scanning all code points)
+_FOLD = str.maketrans({"\u0131": "i", "\u017f": "s"})
+
+_TRIGGER_SETS = {name: tuple(frozenset(g) for g in groups) for name, groups in _TRIGGERS.items()}
+_LITERALS = tuple(sorted({lit for groups in _TRIGGERS.values() for g in groups for lit in g}))
+
+
+def _present(low: str) -> frozenset[str]:
+    return frozenset(lit for lit in _LITERALS if lit in low)
+
+
+def _triggered(name: str, present: frozenset[str]) -> bool:
+    return any(g <= present for g in _TRIGGER_SETS[name])
+
+_HIGH_ENTROPY = re.compile(r"[A-Za-z0-9+/=]{40,}")
+_SECRET_ASSIGNMENT = re.compile(r"(?i)\b(secret|password|token|api[_-]?key)\b\s*=")
+
 
 def validate_allowlist(text: str) -> tuple[bool, list[str]]:
     reasons: list[str] = []
@@ -34,33 +83,91 @@ def validate_allowlist(text: str) -> tuple[bool, list[str]]:
     if len(text) > 500:
         reasons.append("too_long")
 
-    if re.search(r"[A-Za-z0-9+/=]{40,}", text):
+    if _HIGH_ENTROPY.search(text):
         reasons.append("high_entropy_token")
 
     if "PRIVATE KEY" in text:
         reasons.append("private_key_block")
 
-    if re.search(r"(?i)\b(secret|password|token|api[_-]?key)\b\s*=", text):
+    if _SECRET_ASSIGNMENT.search(text):
         reasons.append("secret_assignment")
 
     return (len(reasons) == 0, reasons)
 
 
 def redact(text: str, extra_rules: Iterable[tuple[str, re.Pattern[str]]] = ()) -> RedactionResult:
+    extra = list(extra_rules)
+    present = _present(text.lower().translate(_FOLD))
+    if not present and not extra:
+        return RedactionResult(text=text, redaction_count=0, matched_rules=[])
+    active = [(name, rx) for name, rx in _RULES if _triggered(name, present)]
+    url = _triggered("url_query", present)
+
     out = text
-    matched: list[str] = []
+    counts: dict[str, int] = {}
     count = 0
 
-    for name, rx in [*_RULES, *list(extra_rules)]:
-        if rx.search(out):
-            matched.append(name)
-            out, n = rx.subn("[REDACTED]", out)
+    for name, rx in [*active, *extra]:
+        out, n = rx.subn("[REDACTED]", out)
+        if n:
+            counts[name] = counts.get(name, 0) + n
             count += n
 
-    url_q = re.compile(r"(https?://[^\s\?]+)\?([^\s]+)")
-    if url_q.search(out):
-        matched.append("url_query")
-        out, n = url_q.subn(r"\1?[REDACTED_QUERY]", out)
-        count += n
+    if url or (extra and _triggered("url_query", _present(out.lower().translate(_FOLD)))):
+        out, n = _URL_QUERY.subn(r"\1?[REDACTED_QUERY]", out)
+        if n:
+            counts["url_query"] = counts.get("url_query", 0) + n
+            count += n
 
-    return RedactionResult(text=out, redaction_count=count, matched_rules=sorted(set(matched)))
+    return RedactionResult(text=out, redaction_count=count, matched_rules=sorted(counts), rule_counts=counts)
+
+
+def _redact_chunk(texts: list[str], extra_rules: list[tuple[str, re.Pattern[str]]]) -> list[RedactionResult]:
+    return [redact(t, extra_rules) for t in texts]
+
+
+def iter_redact(
+    texts: Iterable[str],
+    extra_rules: Iterable[tuple[str, re.Pattern[str]]] = (),
+    workers: int | None = None,
+    chunk_size: int = 256,
+) -> Iterator[RedactionResult]:
+    """Redact a (possibly huge) stream of texts, yielding results in input order.
+
+    Texts are redacted in chunks of `chunk_size` on a process pool of
+    `workers` (default: CPU count); at most 2 chunks per worker are in flight,
+    so memory stays bounded for any input length. `workers=1`, or input that
+    fits in one chunk, runs in-process.
+    """
+
+    extra = list(extra_rules)
+    n_workers = workers or os.cpu_count() or 1
+    it = iter(texts)
+    first = list(islice(it, chunk_size))
+    nxt = list(islice(it, chunk_size))
+    if n_workers <= 1 or not nxt:
+        for chunk in (first, nxt):
+            yield from _redact_chunk(chunk, extra)
+        for t in it:
+            yield redact(t, extra)
+        return
+
+    fn = partial(_redact_chunk, extra_rules=extra)
+    with ProcessPoolExecutor(n_workers) as ex:
+        pending = [ex.submit(fn, first), ex.submit(fn, nxt)]
+        while pending:
+            while len(pending) < 2 * n_workers:
+                chunk = list(islice(it, chunk_size))
+                if not chunk:
+                    break
+                pending.append(ex.submit(fn, chunk))
+            yield from pending.pop(0).result()
+
+
+def redact_many(
+    texts: Iterable[str],
+    extra_rules: Iterable[tuple[str, re.Pattern[str]]] = (),
+    workers: int | None = None,
+    chunk_size: int = 256,
+) -> list[RedactionResult]:
+    return list(iter_redact(texts, extra_rules, workers=workers, chunk_size=chunk_size))
@@ -2,9 +2,11 @@ from __future__ import annotations
 
 import os
 import re
+import time
 from dataclasses import dataclass
 from pathlib import Path
 
+from . import metrics, tracing
 from .bm25 import search as bm25_search
 from .fts import FtsHit, search as fts_search
 
@@ -17,6 +19,13 @@ class RetrievalHit:
     why: str
 
 
+_RETRIEVE_TOTAL = metrics.counter("hypermemory_retrieve_total", "retrieve() calls", ("mode",))
+_RETRIEVE_SECONDS = metrics.histogram("hypermemory_retrieve_seconds", "retrieve() latency", ("mode",))
+_LAYER_SECONDS = metrics.histogram("hypermemory_retrieve_layer_seconds", "Per-layer latency inside retrieve()", ("layer",))
+_LAYER_HITS = metrics.histogram(
+    "hypermemory_retrieve_layer_hits", "Candidates returned per layer", ("layer",), buckets=metrics.SIZE_BUCKETS
+)
+
 _TARGETED_RX = re.compile(r"(?i)\b(gid|id\s+for|what\s+is\s+the|where\s+is|port|:([0-9]{2,5})|config|token|key|password|path)\b")
 
 
@@ -42,20 +51,35 @@ def fts_layer(workspace: Path, query: str, limit: int = 20) -> list[tuple[str, s
     return out
 
 
-def vec_layer(query: str, limit: int = 8) -> list[tuple[str, str]]:
-    """Local pgvector semantic layer.
+def vec_layer(workspace: Path, query: str, limit: int = 8) -> list[tuple[str, str]]:
+    """Local semantic layer (pgvector or embedded store).
 
-    Only indexes curated+distilled chunks (hm_local_embedding).
-    Enabled when DATABASE_URL is set.
+    Only indexes curated+distilled chunks.
+    Enabled when DATABASE_URL is set (pgvector), or when the embedded store
+    has been built (`hypermemory vector index` without Postgres).
     """
 
-    if not os.environ.get("DATABASE_URL"):
+    from .config import resolve_vector_backend
+    from .vector_store import exists as embedded_exists
+
+    backend = resolve_vector_backend()
+    if backend == "pgvector" and not os.environ.get("DATABASE_URL"):
+        return []
+    if backend == "embedded" and not embedded_exists(workspace, os.environ.get("HYPERMEMORY_LOCAL_MODEL_ID", "local")):
         return []
 
     from .pgvector_local import LocalVectorConfig, search_workspace
 
     cfg = LocalVectorConfig.from_env()
-    lines = search_workspace(cfg, query, limit=limit)
+    try:
+        lines = search_workspace(cfg, query, limit=limit, workspace=workspace)
+    except RuntimeError as e:
+        # embedded store present, but numpy is not installed in this environment
+        from .embed_client import EmbedError
+
+        if backend != "embedded" or isinstance(e, EmbedError):
+            raise
+        return []
     out: list[tuple[str, str]] = []
     for i, line in enumerate(lines, 1):
         out.append((f"vec:{i}", line))
@@ -101,46 +125,107 @@ def entity_layer(workspace: Path, query: str, limit: int = 8) -> list[tuple[str,
     return out
 
 
-def retrieve(workspace: Path, query: str, mode: str = "auto", limit: int = 10) -> list[RetrievalHit]:
+def _timed(timings: dict[str, float] | None, name: str, fn, *args, **kwargs):
+    with tracing.span(name) as sp:
+        t0 = time.perf_counter()
+        try:
+            out = fn(*args, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            _LAYER_SECONDS.observe(dt, layer=name)
+            if timings is not None:
+                timings[name] = dt * 1000.0
+        _LAYER_HITS.observe(len(out), layer=name)
+        if sp is not None:
+            sp.set(hits=len(out))
+        return out
+
+
+def retrieve(
+    workspace: Path,
+    query: str,
+    mode: str = "auto",
+    limit: int = 10,
+    timings: dict[str, float] | None = None,
+    trace: dict | None = None,
+) -> list[RetrievalHit]:
+    """Fuse all layers with RRF.
+
+    If `timings` is given it is filled with wall-clock milliseconds per layer
+    (entity/fts/bm25/vec/cloud), `fuse`, and `total`.
+
+    If `trace` is given it is filled with the nested span tree
+    (`tracing.Span.to_dict`). With HYPERMEMORY_SLOW_QUERY_MS set, every call
+    is traced and slow ones are appended to the slow-query log.
+    """
+
     ws = workspace.resolve()
+    tcfg = tracing.TraceConfig.from_env()
+    if trace is None and tcfg.slow_ms <= 0:
+        return _retrieve(ws, query, mode, limit, timings)
+
+    with tracing.trace("retrieve", query=query[:200], mode=mode, limit=limit) as root:
+        hits = _retrieve(ws, query, mode, limit, timings)
+        root.set(hits=len(hits))
+    if trace is not None:
+        trace.update(root.to_dict())
+    tracing.log_slow(tcfg, ws, root)
+    return hits
+
+
+def _retrieve(ws: Path, query: str, mode: str, limit: int, timings: dict[str, float] | None) -> list[RetrievalHit]:
+    t_start = time.perf_counter()
     if mode == "auto":
         mode = detect_mode(query)
+        sp = tracing.current()
+        if sp is not None:
+            sp.set(mode=mode)
 
     # Local-first layers
-    ent = entity_layer(ws, query, limit=8) if mode == "targeted" else []
-    fts = fts_layer(ws, query, limit=20)
-    bm25 = bm25_layer(ws, query, limit=10)
-    vec = vec_layer(query, limit=8)
-    cloud = cloud_layer(query, limit=8)
-
-    items: dict[str, dict] = {}
-
-    def add(layer: str, rank: int, key: str, snippet: str):
-        it = items.get(key)
-        if not it:
-            it = {"snippet": snippet, "ranks": {}}
-            items[key] = it
-        it["ranks"][layer] = min(rank, it["ranks"].get(layer, 10**9))
-        if snippet and (not it["snippet"] or len(snippet) > len(it["snippet"])):
-            it["snippet"] = snippet
-
-    for r, (key, snip) in enumerate(ent, 1):
-        add("entity", r, key, snip)
-    for r, (key, snip) in enumerate(fts, 1):
-        add("fts", r, key, snip)
-    for r, (key, snip) in enumerate(bm25, 1):
-        add("bm25", r, key, snip)
-    for r, (key, snip) in enumerate(vec, 1):
-        add("vec", r, key, snip)
-    for r, (key, snip) in enumerate(cloud, 1):
-        add("cloud", r, key, snip)
-
-    scored: list[RetrievalHit] = []
-    for key, it in items.items():
-        ranks = it["ranks"]
-        score = rrf_score(ranks)
-        why = " ".join(f"{k}:{v}" for k, v in sorted(ranks.items()))
-        scored.append(RetrievalHit(layer=key, score=score, snippet=str(it["snippet"]), why=why))
-
-    scored.sort(key=lambda h: h.score, reverse=True)
+    ent = _timed(timings, "entity", entity_layer, ws, query, limit=8) if mode == "targeted" else []
+    fts = _timed(timings, "fts", fts_layer, ws, query, limit=20)
+    bm25 = _timed(timings, "bm25", bm25_layer, ws, query, limit=10)
+    vec = _timed(timings, "vec", vec_layer, ws, query, limit=8)
+    cloud = _timed(timings, "cloud", cloud_layer, query, limit=8)
+    t_fuse = time.perf_counter()
+
+    with tracing.span("fuse"):
+        items: dict[str, dict] = {}
+
+        def add(layer: str, rank: int, key: str, snippet: str):
+            it = items.get(key)
+            if not it:
+                it = {"snippet": snippet, "ranks": {}}
+                items[key] = it
+            it["ranks"][layer] = min(rank, it["ranks"].get(layer, 10**9))
+            if snippet and (not it["snippet"] or len(snippet) > len(it["snippet"])):
+                it["snippet"] = snippet
+
+        for r, (key, snip) in enumerate(ent, 1):
+            add("entity", r, key, snip)
+        for r, (key, snip) in enumerate(fts, 1):
+            add("fts", r, key, snip)
+        for r, (key, snip) in enumerate(bm25, 1):
+            add("bm25", r, key, snip)
+        for r, (key, snip) in enumerate(vec, 1):
+            add("vec", r, key, snip)
+        for r, (key, snip) in enumerate(cloud, 1):
+            add("cloud", r, key, snip)
+
+        scored: list[RetrievalHit] = []
+        for key, it in items.items():
+            ranks = it["ranks"]
+            score = rrf_score(ranks)
+            why = " ".join(f"{k}:{v}" for k, v in sorted(ranks.items()))
+            scored.append(RetrievalHit(layer=key, score=score, snippet=str(it["snippet"]), why=why))
+
+        scored.sort(key=lambda h: h.score, reverse=True)
+
+    end = time.perf_counter()
+    _LAYER_SECONDS.observe(end - t_fuse, layer="fuse")
+    _RETRIEVE_SECONDS.observe(end - t_start, mode=mode)
+    _RETRIEVE_TOTAL.inc(mode=mode)
+    if timings is not None:
+        timings["fuse"] = (end - t_fuse) * 1000.0
+        timings["total"] = (end - t_start) * 1000.0
     return scored[:limit]
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+"""Lightweight nested timing spans for the retrieval pipeline.
+
+Usage:
+
+    with tracing.trace("retrieve", query=q) as root:
+        with tracing.span("fts.query"):
+            ...
+    root.to_dict()  # {"name", "start_ms", "ms", "attrs", "children": [...]}
+
+`span()` is a no-op (one ContextVar lookup) unless a trace is active in the
+current context, so instrumented code pays nothing when tracing is off.
+Timings use `time.perf_counter_ns` (monotonic). Spans do not follow work
+handed to other threads.
+
+Config:
+- HYPERMEMORY_TRACE=1               trace every retrieve (CLI prints the tree)
+- HYPERMEMORY_SLOW_QUERY_MS=N       trace every retrieve; append those taking
+                                    >= N ms to the slow-query log (0 = off)
+- HYPERMEMORY_SLOW_QUERY_LOG=path   default: <workspace>/memory/slow-queries.jsonl
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+_CURRENT: ContextVar["Span | None"] = ContextVar("hypermemory_span", default=None)
+_NOOP = nullcontext()
+_LOG_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class TraceConfig:
+    enabled: bool
+    slow_ms: float
+    slow_log: str
+
+    @staticmethod
+    def from_env() -> "TraceConfig":
+        return TraceConfig(
+            enabled=os.environ.get("HYPERMEMORY_TRACE", "0").strip().lower() in ("1", "true", "yes", "on"),
+            slow_ms=float(os.environ.get("HYPERMEMORY_SLOW_QUERY_MS", "0") or 0),
+            slow_log=os.environ.get("HYPERMEMORY_SLOW_QUERY_LOG", ""),
+        )
+
+    @property
+    def active(self) -> bool:
+        return self.enabled or self.slow_ms > 0
+
+    def slow_log_path(self, workspace: Path) -> Path:
+        return Path(self.slow_log).expanduser() if self.slow_log else workspace / "memory" / "slow-queries.jsonl"
+
+
+class Span:
+    __slots__ = ("name", "attrs", "children", "_root_ns", "_t0", "_t1")
+
+    def __init__(self, name: str, attrs: dict[str, Any], root_ns: int | None = None):
+        self.name = name
+        self.attrs = attrs
+        self.children: list[Span] = []
+        self._t0 = time.perf_counter_ns()
+        self._root_ns = self._t0 if root_ns is None else root_ns
+        self._t1: int | None = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    @property
+    def ms(self) -> float:
+        end = self._t1 if self._t1 is not None else time.perf_counter_ns()
+        return (end - self._t0) / 1e6
+
+    def to_dict(self) -> dict:
+        d: dict[str, Any] = {"name": self.name, "start_ms": round((self._t0 - self._root_ns) / 1e6, 3), "ms": round(self.ms, 3)}
+        if self.attrs:
+            d["attrs"] = self.attrs
+        if self.children:
+            d["children"] = [c.to_dict() for c in self.children]
+        return d
+
+
+class _SpanCtx:
+    __slots__ = ("_span", "_parent", "_token")
+
+    def __init__(self, parent: Span | None, name: str, attrs: dict[str, Any]):
+        self._parent = parent
+        self._span = Span(name, attrs, None if parent is None else parent._root_ns)
+        self._token = None
+
+    def __enter__(self) -> Span:
+        if self._parent is not None:
+            self._parent.children.append(self._span)
+        self._token = _CURRENT.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._span._t1 = time.perf_counter_ns()
+        if exc_type is not None:
+            self._span.attrs["error"] = exc_type.__name__
+        _CURRENT.reset(self._token)
+
+
+def span(name: str, **attrs: Any):
+    """Child span of the active trace; no-op context (yields None) if none is active."""
+
+    parent = _CURRENT.get()
+    if parent is None:
+        return _NOOP
+    return _SpanCtx(parent, name, attrs)
+
+
+def trace(name: str, **attrs: Any) -> _SpanCtx:
+    """Start a root span (nested inside an active trace, it becomes a child)."""
+
+    return _SpanCtx(_CURRENT.get(), name, attrs)
+
+
+def current() -> Span | None:
+    return _CURRENT.get()
+
+
+def log_slow(cfg: TraceConfig, workspace: Path, root: Span) -> bool:
+    """Append `root` to the slow-query log if it crossed the threshold."""
+
+    if cfg.slow_ms <= 0 or root.ms < cfg.slow_ms:
+        return False
+    rec = {"ts_ms": int(time.time() * 1000), "ms": round(root.ms, 3), "threshold_ms": cfg.slow_ms, "trace": root.to_dict()}
+    path = cfg.slow_log_path(workspace)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with _LOG_LOCK, path.open("a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError:
+        return False
+    return True
+
+
+def format_tree(d: dict, indent: int = 0) -> str:
+    attrs = " ".join(f"{k}={v}" for k, v in (d.get("attrs") or {}).items())
+    lines = [f"{'  ' * indent}{d['name']:<{max(1, 24 - 2 * indent)}} {d['ms']:>9.3f}ms  +{d['start_ms']:.3f}  {attrs}".rstrip()]
+    for c in d.get("children") or []:
+        lines.append(format_tree(c, indent + 1))
+    return "\n".join(lines)
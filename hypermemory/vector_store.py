@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+"""Embedded (in-process) vector store for curated+distilled chunks.
+
+Alternative backend to local pgvector for nodes without Postgres.
+
+Layout (derived, rebuildable):
+- <workspace>/memory/vectors/meta.sqlite      chunk metadata (row -> chunk)
+- <workspace>/memory/vectors/<model>.vec      row-major matrix (rows x dims), memory-mapped
+- <workspace>/memory/vectors/<model>.i8|.bin  optional compressed codes (int8 / packed sign bits)
+- <workspace>/memory/vectors/<model>.hnsw     optional HNSW graph (hnswlib) for large corpora
+
+Vectors are L2-normalized on write, so cosine similarity is a dot product.
+Search is a NumPy brute-force scan; when hnswlib is installed and the corpus
+has at least `hnsw_min_rows` rows, an HNSW graph is used instead.
+
+With a codec (int8 / binary) the scan runs over the compressed codes and only
+the best `limit * rerank` candidates are re-scored against the full-precision
+matrix, so the hot data is 4x (int8) or 32x (binary) smaller than float32.
+
+Dependencies: numpy (optional extra `vectors`), hnswlib (optional extra `hnsw`).
+"""
+
+import os
+import re
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Sequence
+
+from .chunks import Chunk
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None  # type: ignore
+
+try:
+    import hnswlib  # type: ignore
+except Exception:  # pragma: no cover
+    hnswlib = None  # type: ignore
+
+DTYPES = ("float32", "float16")
+CODECS = ("none", "int8", "binary")
+_SCAN_BLOCK = 65536
+
+
+@dataclass(frozen=True)
+class VectorHit:
+    sim: float
+    doc_id: str
+    source_key: str
+    chunk_ix: int
+    content: str
+
+
+@dataclass(frozen=True)
+class StoreConfig:
+    dtype: str = "float32"
+    hnsw: str = "auto"
+    hnsw_min_rows: int = 20000
+    codec: str = "none"
+    rerank: int = 10
+
+    @staticmethod
+    def from_env() -> "StoreConfig":
+        dtype = os.environ.get("HYPERMEMORY_VECTOR_DTYPE", "float32")
+        if dtype not in DTYPES:
+            raise ValueError(f"HYPERMEMORY_VECTOR_DTYPE must be one of {DTYPES}")
+        codec = os.environ.get("HYPERMEMORY_VECTOR_CODEC", "none")
+        if codec not in CODECS:
+            raise ValueError(f"HYPERMEMORY_VECTOR_CODEC must be one of {CODECS}")
+        return StoreConfig(
+            dtype=dtype,
+            codec=codec,
+            rerank=max(1, int(os.environ.get("HYPERMEMORY_VECTOR_RERANK", "10"))),
+            hnsw=os.environ.get("HYPERMEMORY_VECTOR_HNSW", "auto"),
+            hnsw_min_rows=int(os.environ.get("HYPERMEMORY_VECTOR_HNSW_MIN_ROWS", "20000")),
+        )
+
+
+def store_dir(workspace: Path) -> Path:
+    return workspace.resolve() / "memory" / "vectors"
+
+
+def exists(workspace: Path, model_id: str | None = None) -> bool:
+    """True if the store has been built (for `model_id`, when given)."""
+
+    d = store_dir(workspace)
+    if not (d / "meta.sqlite").exists():
+        return False
+    if model_id is None:
+        return any(d.glob("*.vec"))
+    return (d / f"{_safe_name(model_id)}.vec").exists()
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("embedded vector backend requires numpy (pip install 'hypermemory[vectors]')")
+
+
+def _safe_name(model_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id) or "model"
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(path))
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+
+def ensure_schema(con: sqlite3.Connection) -> None:
+    con.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS hm_vec_model (
+          model_id TEXT PRIMARY KEY,
+          dims     INTEGER NOT NULL,
+          dtype    TEXT NOT NULL,
+          rows     INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS hm_vec_item (
+          model_id    TEXT NOT NULL,
+          row         INTEGER NOT NULL,
+          doc_id      TEXT NOT NULL,
+          source      TEXT NOT NULL,
+          source_key  TEXT NOT NULL,
+          chunk_ix    INTEGER NOT NULL,
+          content     TEXT NOT NULL,
+          content_sha TEXT NOT NULL,
+          PRIMARY KEY(model_id, row),
+          UNIQUE(model_id, doc_id, source_key, chunk_ix)
+        );
+        """
+    )
+
+
+def _top_k(scores, k: int):
+    """Indices of the k highest scores, best first."""
+
+    n = int(scores.shape[0])
+    part = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8) if np is not None else None
+
+
+class EmbeddedVectorStore:
+    def __init__(self, workspace: Path, model_id: str, cfg: StoreConfig | None = None):
+        self.dir = store_dir(workspace)
+        self.model_id = model_id
+        self.cfg = cfg or StoreConfig.from_env()
+        name = _safe_name(model_id)
+        self.meta_path = self.dir / "meta.sqlite"
+        self.matrix_path = self.dir / f"{name}.vec"
+        self.hnsw_path = self.dir / f"{name}.hnsw"
+        self.codes_paths = {"int8": self.dir / f"{name}.i8", "binary": self.dir / f"{name}.bin"}
+
+    # --- matrix file ---
+
+    def _load_matrix(self, rows: int, dims: int, dtype: str):
+        if rows == 0 or not self.matrix_path.exists():
+            return np.zeros((0, dims), dtype=np.float32)
+        mm = np.memmap(self.matrix_path, dtype=dtype, mode="r", shape=(rows, dims))
+        return mm
+
+    def _write_matrix(self, mat) -> None:
+        tmp = self.matrix_path.with_suffix(".vec.tmp")
+        np.ascontiguousarray(mat, dtype=self.cfg.dtype).tofile(tmp)
+        os.replace(tmp, self.matrix_path)
+
+    # --- indexing ---
+
+    def upsert(self, chunks: Sequence[Chunk], shas: Sequence[str], embed: Callable[[List[Chunk]], List[List[float]]]) -> int:
+        """Sync the store to `chunks`; only new or changed chunks are embedded.
+
+        `chunks` is the full current set: rows for chunks that are no longer
+        present are deleted and the matrix is compacted.
+        `embed` receives every chunk that needs a vector in one call (the
+        embedding client does the request batching).
+        Returns the number of chunks (re-)embedded.
+        """
+
+        _require_numpy()
+        con = _connect(self.meta_path)
+        try:
+            ensure_schema(con)
+            m = con.execute("SELECT dims, dtype, rows FROM hm_vec_model WHERE model_id=?", (self.model_id,)).fetchone()
+            existing: dict[tuple[str, str, int], tuple[int, str]] = {}
+            for row, doc_id, source_key, chunk_ix, sha in con.execute(
+                "SELECT row, doc_id, source_key, chunk_ix, content_sha FROM hm_vec_item WHERE model_id=?",
+                (self.model_id,),
+            ):
+                existing[(str(doc_id), str(source_key), int(chunk_ix))] = (int(row), str(sha))
+
+            if m and str(m[1]) != self.cfg.dtype:
+                # storage dtype changed: rebuild this model from scratch
+                m, existing = None, {}
+
+            present = {(c.doc_id, c.source_key, c.chunk_ix) for c in chunks}
+            stale = [k for k in existing if k not in present]
+            todo = [(c, s) for c, s in zip(chunks, shas) if existing.get((c.doc_id, c.source_key, c.chunk_ix), (-1, ""))[1] != s]
+            if not todo and not stale:
+                return 0
+
+            if todo:
+                new = self._embed(todo, embed)
+                dims = int(new.shape[1])
+            else:
+                new, dims = np.zeros((0, int(m[0])), dtype=np.float32), int(m[0])
+            if m and int(m[0]) != dims:
+                # model dims changed: every chunk needs a new vector
+                m, existing = None, {}
+                done = {(c.doc_id, c.source_key, c.chunk_ix) for c, _s in todo}
+                rest = [(c, s) for c, s in zip(chunks, shas) if (c.doc_id, c.source_key, c.chunk_ix) not in done]
+                if rest:
+                    new = np.vstack([new, self._embed(rest, embed)])
+                todo = todo + rest
+            if m is None:
+                con.execute("DELETE FROM hm_vec_item WHERE model_id=?", (self.model_id,))
+
+            rows = int(m[2]) if m else 0
+            mat = np.array(self._load_matrix(rows, dims, self.cfg.dtype), dtype=np.float32)
+            stale = [k for k in stale if k in existing]
+            if stale:
+                mat, existing = self._compact(con, mat, existing, stale)
+                rows = int(mat.shape[0])
+            appended: list = []
+            for (c, sha), v in zip(todo, new):
+                key = (c.doc_id, c.source_key, c.chunk_ix)
+                if key in existing:
+                    row = existing[key][0]
+                    mat[row] = v
+                else:
+                    row = rows + len(appended)
+                    appended.append(v)
+                con.execute(
+                    """
+                    INSERT INTO hm_vec_item(model_id, row, doc_id, source, source_key, chunk_ix, content, content_sha)
+                    VALUES (?,?,?,?,?,?,?,?)
+                    ON CONFLICT(model_id, row) DO UPDATE SET
+                      doc_id=excluded.doc_id, source=excluded.source, source_key=excluded.source_key,
+                      chunk_ix=excluded.chunk_ix, content=excluded.content, content_sha=excluded.content_sha
+                    """,
+                    (self.model_id, row, c.doc_id, c.source, c.source_key, c.chunk_ix, c.text, sha),
+                )
+            if appended:
+                mat = np.vstack([mat, np.asarray(appended, dtype=np.float32)])
+
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._write_matrix(mat)
+            con.execute(
+                """
+                INSERT INTO hm_vec_model(model_id, dims, dtype, rows) VALUES (?,?,?,?)
+                ON CONFLICT(model_id) DO UPDATE SET dims=excluded.dims, dtype=excluded.dtype, rows=excluded.rows
+                """,
+                (self.model_id, dims, self.cfg.dtype, int(mat.shape[0])),
+            )
+            con.commit()
+            self._write_codes(mat)
+            self._build_hnsw(mat)
+            return len(todo)
+        finally:
+            con.close()
+
+    def _compact(self, con: sqlite3.Connection, mat, existing: dict, stale: list):
+        """Drop the rows of `stale` chunks and renumber the rest densely (order preserved)."""
+
+        gone = {existing.pop(k)[0] for k in stale}
+        keep = [r for r in range(int(mat.shape[0])) if r not in gone]
+        remap = {old: new for new, old in enumerate(keep)}
+        con.executemany("DELETE FROM hm_vec_item WHERE model_id=? AND row=?", [(self.model_id, r) for r in sorted(gone)])
+        # ascending, so a row only ever moves into a slot that is already free
+        con.executemany(
+            "UPDATE hm_vec_item SET row=? WHERE model_id=? AND row=?",
+            [(new, self.model_id, old) for old, new in remap.items() if old != new],
+        )
+        return mat[keep], {k: (remap[r], sha) for k, (r, sha) in existing.items()}
+
+    @staticmethod
+    def _embed(items: list[tuple[Chunk, str]], embed: Callable[[List[Chunk]], List[List[float]]]):
+        mat = np.asarray(embed([c for c, _s in items]), dtype=np.float32)
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        return mat / np.where(norms == 0, 1.0, norms)
+
+    # --- compressed codes (optional) ---
+
+    @staticmethod
+    def _code_width(codec: str, dims: int) -> int:
+        return dims if codec == "int8" else (dims + 7) // 8
+
+    def _write_codes(self, mat) -> None:
+        for codec, p in self.codes_paths.items():
+            if codec != self.cfg.codec and p.exists():
+                p.unlink()
+        if self.cfg.codec == "none":
+            return
+        if self.cfg.codec == "int8":
+            codes = np.clip(np.rint(mat * 127.0), -127, 127).astype(np.int8)
+        else:
+            codes = np.packbits(mat > 0, axis=1)
+        p = self.codes_paths[self.cfg.codec]
+        tmp = p.with_suffix(p.suffix + ".tmp")
+        np.ascontiguousarray(codes).tofile(tmp)
+        os.replace(tmp, p)
+
+    def _load_codes(self, rows: int, dims: int):
+        if self.cfg.codec == "none":
+            return None
+        p = self.codes_paths[self.cfg.codec]
+        width = self._code_width(self.cfg.codec, dims)
+        # stale/missing codes (e.g. codec switched without reindex): fall back to a full scan
+        if not p.exists() or p.stat().st_size != rows * width:
+            return None
+        dtype = np.int8 if self.cfg.codec == "int8" else np.uint8
+        return np.memmap(p, dtype=dtype, mode="r", shape=(rows, width))
+
+    def _coarse_scores(self, codes, q):
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        if self.cfg.codec == "int8":
+            qf = q.astype(np.float32)
+            for i in range(0, codes.shape[0], _SCAN_BLOCK):
+                out[i : i + _SCAN_BLOCK] = codes[i : i + _SCAN_BLOCK].astype(np.float32) @ qf
+            return out
+        qbits = np.packbits(q > 0)
+        for i in range(0, codes.shape[0], _SCAN_BLOCK):
+            x = np.bitwise_xor(codes[i : i + _SCAN_BLOCK], qbits)
+            out[i : i + _SCAN_BLOCK] = -_POPCOUNT[x].sum(axis=1, dtype=np.int32)
+        return out
+
+    # --- HNSW (optional) ---
+
+    def _use_hnsw(self, rows: int) -> bool:
+        if hnswlib is None or self.cfg.hnsw == "0":
+            return False
+        if self.cfg.hnsw == "1":
+            return True
+        return rows >= self.cfg.hnsw_min_rows
+
+    def _build_hnsw(self, mat) -> None:
+        rows, dims = int(mat.shape[0]), int(mat.shape[1])
+        if rows == 0 or not self._use_hnsw(rows):
+            if self.hnsw_path.exists():
+                self.hnsw_path.unlink()
+            return
+        idx = hnswlib.Index(space="ip", dim=dims)
+        idx.init_index(max_elements=rows, ef_construction=200, M=16)
+        idx.add_items(np.asarray(mat, dtype=np.float32), np.arange(rows))
+        tmp = self.hnsw_path.with_suffix(".hnsw.tmp")
+        idx.save_index(str(tmp))
+        os.replace(tmp, self.hnsw_path)
+
+    # --- search ---
+
+    def _rows_for(self, con: sqlite3.Connection, rows: Sequence[int]) -> dict[int, tuple[str, str, int, str]]:
+        out: dict[int, tuple[str, str, int, str]] = {}
+        if not rows:
+            return out
+        marks = ",".join("?" for _ in rows)
+        for row, doc_id, source_key, chunk_ix, content in con.execute(
+            f"SELECT row, doc_id, source_key, chunk_ix, content FROM hm_vec_item WHERE model_id=? AND row IN ({marks})",
+            (self.model_id, *[int(r) for r in rows]),
+        ):
+            out[int(row)] = (str(doc_id), str(source_key), int(chunk_ix), str(content))
+        return out
+
+    def search(self, qvec: Sequence[float], limit: int = 8) -> list[VectorHit]:
+        _require_numpy()
+        if not self.meta_path.exists():
+            return []
+        con = _connect(self.meta_path)
+        try:
+            ensure_schema(con)
+            m = con.execute("SELECT dims, dtype, rows FROM hm_vec_model WHERE model_id=?", (self.model_id,)).fetchone()
+            if not m or int(m[2]) == 0:
+                return []
+            dims, dtype, rows = int(m[0]), str(m[1]), int(m[2])
+
+            q = np.asarray(qvec, dtype=np.float32)
+            if q.shape[0] != dims:
+                raise ValueError(f"query dims {q.shape[0]} != index dims {dims} for model {self.model_id}")
+            n = float(np.linalg.norm(q))
+            if n:
+                q = q / n
+
+            k = min(int(limit), rows)
+            if self._use_hnsw(rows) and self.hnsw_path.exists():
+                idx = hnswlib.Index(space="ip", dim=dims)
+                idx.load_index(str(self.hnsw_path), max_elements=rows)
+                idx.set_ef(max(64, k * 4))
+                labels, dists = idx.knn_query(q, k=k)
+                top = [int(x) for x in labels[0]]
+                sims = [1.0 - float(d) for d in dists[0]]
+            else:
+                mat = self._load_matrix(rows, dims, dtype)
+                codes = self._load_codes(rows, dims)
+                if codes is not None:
+                    # coarse pass over compressed codes, exact rerank of the candidates
+                    cand = _top_k(self._coarse_scores(codes, q), min(rows, k * self.cfg.rerank))
+                    cand.sort()
+                    exact = np.asarray(mat[cand] @ q.astype(mat.dtype), dtype=np.float32)
+                    order = _top_k(exact, k)
+                    top = [int(cand[x]) for x in order]
+                    sims = [float(exact[x]) for x in order]
+                else:
+                    scores = np.asarray(mat @ q.astype(mat.dtype), dtype=np.float32)
+                    order = _top_k(scores, k)
+                    top = [int(x) for x in order]
+                    sims = [float(scores[x]) for x in order]
+
+            meta = self._rows_for(con, top)
+        finally:
+            con.close()
+
+        out: list[VectorHit] = []
+        for row, sim in zip(top, sims):
+            r = meta.get(row)
+            if r is None:
+                continue
+            out.append(VectorHit(sim=sim, doc_id=r[0], source_key=r[1], chunk_ix=r[2], content=r[3]))
+        return out
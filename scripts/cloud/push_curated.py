@@ -21,13 +21,17 @@ import json
 import os
 import re
 import sys
-import urllib.request
 from pathlib import Path
 from typing import List
 
 import psycopg
 from pgvector.psycopg import register_vector
 
+# run as `python scripts/cloud/...` without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from hypermemory.embed_client import get_client  # noqa: E402
+
 M_SCORE_RE = re.compile(r"^\s*-\s*\[M([1-5])\]\s+(.*)$")
 
 
@@ -35,20 +39,8 @@ def sha256(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
-def http_json(url: str, payload: dict | None = None, timeout: float = 30.0):
-    if payload is None:
-        req = urllib.request.Request(url, method="GET")
-    else:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(
-            url, data=data, headers={"Content-Type": "application/json"}, method="POST"
-        )
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-
 def embed_texts(embed_base_url: str, texts: List[str]) -> List[List[float]]:
-    return http_json(f"{embed_base_url.rstrip('/')}/embed", {"inputs": texts})
+    return get_client(embed_base_url).embed(texts)
 
 
 from scripts.cloud.redaction import redact as _redact, validate_allowlist
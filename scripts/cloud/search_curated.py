@@ -14,29 +14,17 @@ Outputs lines:
 from __future__ import annotations
 
 import argparse
-import json
 import os
 import sys
-import urllib.request
 
 import psycopg
 from pgvector.psycopg import register_vector
 from pgvector import Vector
 
+# run as `python scripts/cloud/...` without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-def http_json(url: str, payload: dict | None = None, timeout: float = 30.0):
-    if payload is None:
-        req = urllib.request.Request(url, method="GET")
-    else:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method="POST")
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-
-def embed_one(embed_base_url: str, text: str) -> Vector:
-    v = http_json(f"{embed_base_url.rstrip('/')}/embed", {"inputs": [text]})
-    return Vector(v[0])
+from hypermemory.embed_client import embed_query  # noqa: E402
 
 
 def main() -> int:
@@ -54,7 +42,7 @@ def main() -> int:
     embed_url = os.environ.get("HYPERMEMORY_CLOUD_EMBED_URL", "http://127.0.0.1:8080")
     model_id = os.environ.get("HYPERMEMORY_CLOUD_MODEL_ID", "local")
 
-    qvec = embed_one(embed_url, "query: " + args.query)
+    qvec = Vector(embed_query(embed_url, model_id, "query: " + args.query))
 
     with psycopg.connect(db_url) as con:
         register_vector(con)
@@ -0,0 +1,142 @@
+"""ONNX Runtime backend for the embeddings server (CPU, optional int8).
+
+On first use the sentence-transformers model is exported to ONNX (transformer
+body only; pooling + L2 normalization are done here in NumPy) and, unless
+disabled, dynamically quantized to int8 weights. The export directory holds:
+
+- model.onnx        fp32 export
+- model.int8.onnx   dynamic int8 quantization of model.onnx
+- tokenizer files   (AutoTokenizer.save_pretrained)
+- hm_onnx.json      pooling mode + max sequence length
+
+Requires: onnxruntime, onnx (see requirements-onnx.txt). torch and
+sentence-transformers are only needed for the one-time export.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+META_FILE = "hm_onnx.json"
+
+
+def default_path(model_id: str) -> Path:
+    base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return base / "hypermemory" / "onnx" / model_id.replace("/", "__")
+
+
+def resolve_path(model_id: str, path: str = "") -> Path:
+    return Path(path).expanduser() if path else default_path(model_id)
+
+
+def _pooling_mode(st) -> str:
+    for mod in st:
+        cfg = getattr(mod, "get_config_dict", None)
+        if cfg is None:
+            continue
+        c = cfg()
+        if c.get("pooling_mode_cls_token"):
+            return "cls"
+        if c.get("pooling_mode_mean_tokens"):
+            return "mean"
+    return "mean"
+
+
+def export(model_id: str, out_dir: Path, quantize: bool = True) -> Path:
+    """Export `model_id` to `out_dir` (idempotent per file)."""
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fp32 = out_dir / "model.onnx"
+    if not fp32.exists():
+        st = SentenceTransformer(model_id, device="cpu")
+        hf = st[0].auto_model.eval()
+        tok = st.tokenizer
+        tok.save_pretrained(str(out_dir))
+
+        sample = tok(["hello world"], return_tensors="pt")
+        names = [k for k in ("input_ids", "attention_mask", "token_type_ids") if k in sample]
+        axes = {k: {0: "batch", 1: "seq"} for k in names}
+        axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+        class _Body(torch.nn.Module):
+            def __init__(self, m):
+                super().__init__()
+                self.m = m
+
+            def forward(self, *args):
+                return self.m(**dict(zip(names, args))).last_hidden_state
+
+        tmp = fp32.with_suffix(".onnx.tmp")
+        with torch.no_grad():
+            torch.onnx.export(
+                _Body(hf),
+                tuple(sample[k] for k in names),
+                str(tmp),
+                input_names=names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=axes,
+                opset_version=17,
+            )
+        tmp.replace(fp32)
+        meta = {"model_id": model_id, "pooling": _pooling_mode(st), "max_seq_length": int(st.max_seq_length)}
+        (out_dir / META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    int8 = out_dir / "model.int8.onnx"
+    if quantize and not int8.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp = out_dir / "model.int8.onnx.tmp"
+        quantize_dynamic(str(fp32), str(tmp), weight_type=QuantType.QInt8)
+        tmp.replace(int8)
+    return int8 if quantize else fp32
+
+
+class OnnxEncoder:
+    """`encode(texts) -> (n, dims) float32`, L2-normalized, like SentenceTransformer.encode."""
+
+    def __init__(self, model_dir: Path, quantized: bool = True, threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        meta = json.loads((model_dir / META_FILE).read_text(encoding="utf-8"))
+        self.pooling = meta.get("pooling", "mean")
+        self.max_len = int(meta.get("max_seq_length") or 512)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            so.intra_op_num_threads = threads
+        so.inter_op_num_threads = 1
+        path = model_dir / ("model.int8.onnx" if quantized else "model.onnx")
+        self.session = ort.InferenceSession(str(path), so, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.quantized = quantized
+        self.threads = threads
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_len, return_tensors="np")
+        feeds = {k: enc[k].astype(np.int64) for k in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        if self.pooling == "cls":
+            emb = hidden[:, 0]
+        else:
+            mask = feeds["attention_mask"][..., None].astype(np.float32)
+            emb = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        emb = emb.astype(np.float32)
+        emb /= np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+        return emb
+
+
+def load(model_id: str, path: str = "", quantize: bool = True, threads: int = 0) -> OnnxEncoder:
+    model_dir = resolve_path(model_id, path)
+    export(model_id, model_dir, quantize=quantize)
+    return OnnxEncoder(model_dir, quantized=quantize, threads=threads)
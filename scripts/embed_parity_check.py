@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Parity check: ONNX Runtime backend vs the PyTorch (sentence-transformers) backend.
+
+Embeds the same texts with both backends and reports per-text cosine
+similarity. Exits non-zero if any text falls below --threshold.
+
+Usage:
+  python3 scripts/embed_parity_check.py [--model intfloat/e5-small-v2] \
+      [--texts-file texts.txt] [--workspace ~/clawd] [--threshold 0.99] [--no-quantize]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import embed_onnx  # noqa: E402
+
+SAMPLE = [
+    "query: how do I restart the embeddings server?",
+    "query: what did we decide about the cloud namespace?",
+    "passage: Postgres runs in docker compose on port 5432 with the pgvector extension.",
+    "passage: The retrieval pipeline tries BM25 first, then the local vector layer, then cloud L3.",
+    "passage: Never commit secrets; redaction runs before anything is pushed to the cloud.",
+    "passage: 2026-02-09 — switched the default model to intfloat/e5-small-v2 for CPU hosts.",
+    "passage: ok",
+    "passage: " + "long context " * 200,
+]
+
+
+def _texts(args) -> list[str]:
+    out: list[str] = []
+    if args.texts_file:
+        out += [ln.strip() for ln in Path(args.texts_file).read_text(encoding="utf-8").splitlines() if ln.strip()]
+    if args.workspace:
+        from hypermemory.chunks import iter_semantic_chunks
+
+        for c in iter_semantic_chunks(Path(args.workspace).expanduser().resolve()):
+            out.append("passage: " + c.text)
+            if len(out) >= args.max_texts:
+                break
+    return out[: args.max_texts] or SAMPLE
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--model", default=os.environ.get("EMBED_MODEL_ID", "intfloat/e5-small-v2"))
+    ap.add_argument("--onnx-path", default=os.environ.get("EMBED_ONNX_PATH", ""))
+    ap.add_argument("--texts-file", default="")
+    ap.add_argument("--workspace", default="")
+    ap.add_argument("--max-texts", type=int, default=512)
+    ap.add_argument("--threshold", type=float, default=0.99)
+    ap.add_argument("--no-quantize", action="store_true")
+    ap.add_argument("--threads", type=int, default=int(os.environ.get("EMBED_ONNX_THREADS", "0")))
+    args = ap.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    texts = _texts(args)
+    ref = SentenceTransformer(args.model, device="cpu").encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    enc = embed_onnx.load(args.model, args.onnx_path, quantize=not args.no_quantize, threads=args.threads)
+    got = enc.encode(texts)
+
+    cos = (ref * got).sum(axis=1)
+    worst = int(np.argmin(cos))
+    report = {
+        "model": args.model,
+        "quantized": not args.no_quantize,
+        "texts": len(texts),
+        "cosine_min": round(float(cos.min()), 6),
+        "cosine_mean": round(float(cos.mean()), 6),
+        "cosine_p05": round(float(np.percentile(cos, 5)), 6),
+        "threshold": args.threshold,
+        "worst_text": texts[worst][:120],
+        "ok": bool(cos.min() >= args.threshold),
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
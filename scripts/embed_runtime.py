@@ -0,0 +1,293 @@
+"""Runtime of the embeddings server around the model: micro-batching of
+concurrent encode calls, the result cache and the forked worker pool.
+
+Kept apart from `server.py` so it imports without torch, FastAPI or a model;
+the server wires these to its encoder at startup.
+"""
+
+from __future__ import annotations
+
+import gc
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List
+
+import numpy as np
+
+
+class Histogram:
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.n = 0
+        self._lock = threading.Lock()
+
+    def observe(self, v: float) -> None:
+        i = 0
+        while i < len(self.bounds) and v > self.bounds[i]:
+            i += 1
+        with self._lock:
+            self.counts[i] += 1
+            self.total += v
+            self.n += 1
+
+    def as_dict(self) -> dict:
+        # cumulative buckets (Prometheus-style `le`)
+        with self._lock:
+            le: dict = {}
+            acc = 0
+            for b, c in zip(self.bounds, self.counts):
+                acc += c
+                le[f"le_{b:g}"] = acc
+            le["le_inf"] = self.n
+            return {"count": self.n, "sum": round(self.total, 3), "buckets": le}
+
+
+class _Pending:
+    __slots__ = ("texts", "enqueued", "done", "result", "error")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result: np.ndarray | None = None
+        self.error: BaseException | None = None
+
+
+class MicroBatcher:
+    """Coalesce concurrent encode requests into batched forward passes."""
+
+    def __init__(self, encode, max_batch: int, max_wait_ms: float, threads: int = 1):
+        self.encode = encode
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self.q: "queue.Queue[_Pending]" = queue.Queue()
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_wait_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000])
+        # one collector per worker so that many batches can be in flight at once
+        self.threads = max(1, threads)
+        self._threads = [
+            threading.Thread(target=self._run, name=f"embed-batcher-{i}", daemon=True) for i in range(self.threads)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, texts: List[str]) -> np.ndarray:
+        p = _Pending(texts)
+        self.q.put(p)
+        p.done.wait()
+        if p.error is not None:
+            raise p.error
+        assert p.result is not None
+        return p.result
+
+    def _collect(self) -> List[_Pending]:
+        first = self.q.get()
+        batch = [first]
+        n = len(first.texts)
+        deadline = time.perf_counter() + self.max_wait_s
+        while n < self.max_batch:
+            left = deadline - time.perf_counter()
+            try:
+                p = self.q.get(timeout=left) if left > 0 else self.q.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(p)
+            n += len(p.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            texts: List[str] = []
+            for p in batch:
+                self.queue_wait_ms.observe((start - p.enqueued) * 1000.0)
+                texts.extend(p.texts)
+            self.batch_size.observe(len(texts))
+            try:
+                emb = self.encode(texts)
+                off = 0
+                for p in batch:
+                    p.result = emb[off : off + len(p.texts)]
+                    off += len(p.texts)
+            except BaseException as e:  # propagate to every waiter
+                for p in batch:
+                    p.error = e
+            for p in batch:
+                p.done.set()
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+            "threads": self.threads,
+            "queued": self.q.qsize(),
+            "batch_size": self.batch_size.as_dict(),
+            "queue_wait_ms": self.queue_wait_ms.as_dict(),
+        }
+
+
+class ResultCache:
+    """LRU of embedding rows keyed by (model, input text), bounded by bytes.
+
+    With `ttl_s` > 0 an entry older than that is dropped on lookup (a miss).
+    """
+
+    # rough per-entry overhead: key tuple, str header, ndarray header, dict slot
+    _OVERHEAD = 200
+
+    def __init__(self, max_bytes: int, ttl_s: float = 0.0):
+        self.max_bytes = max(0, max_bytes)
+        self.ttl_s = max(0.0, ttl_s)
+        # key -> (row, stored_at)
+        self._d: "OrderedDict[tuple[str, str], tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def _cost(self, key: tuple[str, str], row: np.ndarray) -> int:
+        return len(key[1]) + row.nbytes + self._OVERHEAD
+
+    def get(self, key: tuple[str, str]) -> np.ndarray | None:
+        with self._lock:
+            it = self._d.get(key)
+            if it is not None and self.ttl_s and time.monotonic() - it[1] >= self.ttl_s:
+                del self._d[key]
+                self.bytes -= self._cost(key, it[0])
+                self.expired += 1
+                it = None
+            if it is None:
+                self.misses += 1
+                return None
+            self._d.move_to_end(key)
+            self.hits += 1
+            return it[0]
+
+    def put(self, key: tuple[str, str], row: np.ndarray) -> None:
+        if self.max_bytes <= 0:
+            return
+        row = np.array(row, dtype=np.float32)  # own copy, don't pin the batch array
+        cost = self._cost(key, row)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            old = self._d.pop(key, None)
+            if old is not None:
+                self.bytes -= self._cost(key, old[0])
+            self._d[key] = (row, time.monotonic())
+            self.bytes += cost
+            while self.bytes > self.max_bytes:
+                k, (r, _) = self._d.popitem(last=False)
+                self.bytes -= self._cost(k, r)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._d),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+
+def _worker_pid(_i: int) -> int:
+    return os.getpid()
+
+
+def _worker_start(init, threads: int) -> None:
+    # forked children inherit the server's signal handlers (uvicorn's would
+    # only flag a server object that does not run here); die on SIGTERM/SIGINT
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    init(threads)
+
+
+class WorkerPool:
+    """Forked encode workers, restarted if one dies.
+
+    The first pool is forked at startup, before any request thread exists, so
+    children share the loaded model. A restart happens while request threads
+    run, and forking a threaded process can copy held locks. So replacement
+    pools use `forkserver`, whose workers load their own model copy.
+
+    `init(threads)` runs once in every worker and `encode(texts)` per batch;
+    both must be module-level functions (forkserver workers import them).
+    """
+
+    def __init__(self, workers: int, threads: int, init, encode):
+        self.workers = workers
+        self.threads = threads
+        self.init = init
+        self.encode_fn = encode
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._pool = self._start("fork")
+
+    def _start(self, method: str) -> ProcessPoolExecutor:
+        if method == "fork":
+            # keep the parent's (model) objects out of GC passes so children
+            # don't dirty their pages by touching GC headers
+            gc.collect()
+            gc.freeze()
+        pool = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context(method),
+            initializer=_worker_start,
+            initargs=(self.init, self.threads),
+        )
+        # start every worker now (at startup: before request threads exist)
+        list(pool.map(_worker_pid, range(self.workers)))
+        return pool
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        pool = self._pool
+        try:
+            return pool.submit(self.encode_fn, texts).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    self.restarts += 1
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = self._start("forkserver")
+            return self._pool.submit(self.encode_fn, texts).result()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "threads_per_worker": self.threads, "restarts": self.restarts}
+
+
+def cached_encode(cache: ResultCache, model: str, texts: List[str], encode) -> np.ndarray:
+    """Serve repeated inputs from `cache`; `encode` only the misses (once each)."""
+
+    if cache.max_bytes <= 0:
+        return encode(texts)
+    rows: List[np.ndarray | None] = [cache.get((model, t)) for t in texts]
+    todo = list(dict.fromkeys(t for t, r in zip(texts, rows) if r is None))
+    if todo:
+        emb = encode(todo)
+        fresh = dict(zip(todo, emb))
+        for t, r in fresh.items():
+            cache.put((model, t), r)
+        rows = [fresh[t] if r is None else r for t, r in zip(texts, rows)]
+    return np.stack(rows)  # type: ignore[arg-type]
@@ -14,11 +14,9 @@ from __future__ import annotations
 
 import argparse
 import hashlib
-import json
 import os
 import re
 import sys
-import urllib.request
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable, List
@@ -26,6 +24,11 @@ from typing import Iterable, List
 import psycopg
 from pgvector.psycopg import register_vector
 
+# run as `python scripts/...` without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hypermemory.embed_client import get_client  # noqa: E402
+
 DAILY_NAME_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.md$")
 BULLET_RE = re.compile(r"^\s*-\s*(.+?)\s*$")
 H2_RE = re.compile(r"^##\s+(.+?)\s*$")
@@ -43,18 +46,8 @@ def sha(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
-def http_json(url: str, payload: dict | None = None, timeout: float = 30.0):
-    if payload is None:
-        req = urllib.request.Request(url, method="GET")
-    else:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method="POST")
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-
 def embed_texts(embed_base_url: str, texts: List[str]) -> List[List[float]]:
-    return http_json(f"{embed_base_url.rstrip('/')}/embed", {"inputs": texts})
+    return get_client(embed_base_url).embed(texts)
 
 
 def infer_dims(embed_base_url: str) -> int:
@@ -150,7 +143,7 @@ def main() -> int:
         return 2
 
     dims = infer_dims(args.embed_url)
-    health = http_json(f"{args.embed_url.rstrip('/')}/health")
+    health = get_client(args.embed_url).health()
     print(f"mf-embeddings: model={health.get('model')} device={health.get('device')} cuda={health.get('cuda')} dims={dims}")
 
     chunks = chunks_from_memory_md(repo) + chunks_from_daily(repo, days=args.daily_days)
@@ -10,29 +10,21 @@ This legacy script may be removed in a future release.
 from __future__ import annotations
 
 import argparse
-import json
 import os
 import sys
-import urllib.request
 
 import psycopg
 from pgvector.psycopg import register_vector
 from pgvector import Vector
 
+# run as `python scripts/...` without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def http_json(url: str, payload: dict | None = None, timeout: float = 30.0):
-    if payload is None:
-        req = urllib.request.Request(url, method="GET")
-    else:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method="POST")
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+from hypermemory.embed_client import get_client  # noqa: E402
 
 
 def embed_one(embed_base_url: str, text: str) -> Vector:
-    v = http_json(f"{embed_base_url.rstrip('/')}/embed", {"inputs": [text]})
-    return Vector(v[0])
+    return Vector(get_client(embed_base_url).embed([text])[0])
 
 
 def main() -> int:
@@ -4,6 +4,9 @@
 Implements the mf-embeddings API:
 - GET /health
 - POST /embed {"inputs": [..]}
+  (JSON float lists, or the binary float32 format when the client sends
+  `Accept: application/x-hypermemory-f32`)
+- POST /embed/stream (NDJSON strings in, NDJSON vectors or f32 frames out)
 
 Returns deterministic unit-normalized vectors with small dims (default 16)
 so pgvector indexing/search can be exercised without downloading models.
@@ -12,16 +15,22 @@ so pgvector indexing/search can be exercised without downloading models.
 from __future__ import annotations
 
 import hashlib
+import json
 import os
+import struct
 from typing import List, Union
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 DIMS = int(os.environ.get("FAKE_EMBED_DIMS", "16"))
 HOST = os.environ.get("EMBED_HOST", "127.0.0.1")
 PORT = int(os.environ.get("EMBED_PORT", "8080"))
 
+F32_MEDIA_TYPE = "application/x-hypermemory-f32"
+STREAM_CHUNK = 32
+
 app = FastAPI(title="fake-embeddings", version="0.1")
 
 
@@ -44,9 +53,34 @@ def health():
 
 
 @app.post("/embed")
-def embed(req: EmbedRequest):
+def embed(req: EmbedRequest, request: Request):
     texts = req.inputs if isinstance(req.inputs, list) else [req.inputs]
-    return [embed_one(t) for t in texts]
+    vecs = [embed_one(t) for t in texts]
+    if F32_MEDIA_TYPE in request.headers.get("accept", ""):
+        return Response(content=f32_frame(vecs), media_type=F32_MEDIA_TYPE)
+    return vecs
+
+
+def f32_frame(vecs: List[List[float]]) -> bytes:
+    n, d = len(vecs), (DIMS if vecs else 0)
+    flat = [v for row in vecs for v in row]
+    return struct.pack("<4sII", b"HMF1", n, d) + struct.pack(f"<{len(flat)}f", *flat)
+
+
+@app.post("/embed/stream")
+async def embed_stream(request: Request):
+    binary = F32_MEDIA_TYPE in request.headers.get("accept", "")
+    texts = [json.loads(ln) for ln in (await request.body()).splitlines() if ln.strip()]
+
+    def gen():
+        for i in range(0, len(texts), STREAM_CHUNK):
+            vecs = [embed_one(t) for t in texts[i : i + STREAM_CHUNK]]
+            if binary:
+                yield f32_frame(vecs)
+            else:
+                yield "".join(json.dumps(v) + "\n" for v in vecs).encode("utf-8")
+
+    return StreamingResponse(gen(), media_type=F32_MEDIA_TYPE if binary else "application/x-ndjson")
 
 
 if __name__ == "__main__":
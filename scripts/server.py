@@ -1,11 +1,36 @@
+import asyncio
+import json
 import os
+import struct
+import sys
+import time
+from collections import deque
 
+import numpy as np
 import torch
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from sentence_transformers import SentenceTransformer
 from typing import List, Union
 
+from embed_runtime import Histogram, MicroBatcher, ResultCache, WorkerPool, cached_encode
+
+# stdlib-only metrics registry shared with the hypermemory package: installed,
+# or from the checkout this script lives in. Without it the server still runs
+# and /metrics answers 503.
+try:
+    from hypermemory import metrics as hm_metrics
+except ImportError:
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if os.path.isfile(os.path.join(_REPO_ROOT, "hypermemory", "metrics.py")):
+        sys.path.append(_REPO_ROOT)
+    try:
+        from hypermemory import metrics as hm_metrics
+    except ImportError:
+        hm_metrics = None
+
 MODEL_ID = os.environ.get("EMBED_MODEL_ID", "intfloat/e5-small-v2")
 def _detect_device() -> str:
     if torch.cuda.is_available():
@@ -15,35 +40,279 @@ def _detect_device() -> str:
         return "mps"
     return "cpu"
 
-DEVICE = os.environ.get("EMBED_DEVICE", _detect_device())
+# torch: sentence-transformers on EMBED_DEVICE; onnx: ONNX Runtime on CPU
+# (int8 dynamic quantization unless EMBED_ONNX_QUANTIZE=0), see embed_onnx.py
+BACKEND = os.environ.get("EMBED_BACKEND", "torch")
+ONNX_PATH = os.environ.get("EMBED_ONNX_PATH", "")
+ONNX_THREADS = int(os.environ.get("EMBED_ONNX_THREADS", "0"))
+ONNX_QUANTIZE = os.environ.get("EMBED_ONNX_QUANTIZE", "1") != "0"
+
+DEVICE = os.environ.get("EMBED_DEVICE", "cpu" if BACKEND == "onnx" else _detect_device())
 HOST = os.environ.get("EMBED_HOST", "127.0.0.1")
 PORT = int(os.environ.get("EMBED_PORT", "8080"))
 
+# Dynamic micro-batching: concurrent /embed requests are coalesced into one
+# encode() call of up to BATCH_MAX texts, waiting at most BATCH_WAIT_MS.
+BATCH_MAX = int(os.environ.get("EMBED_BATCH_MAX", "64"))
+BATCH_WAIT_MS = float(os.environ.get("EMBED_BATCH_WAIT_MS", "5"))
+
+# Multi-worker mode (CPU only): the model is loaded once in this process and
+# EMBED_WORKERS forked children share its weights copy-on-write; batches are
+# handed out through the executor's shared call queue.
+WORKERS = max(1, int(os.environ.get("EMBED_WORKERS", "1")))
+WORKER_THREADS = int(os.environ.get("EMBED_WORKER_THREADS", "0")) or max(1, (os.cpu_count() or 1) // WORKERS)
+
+# Result cache: (model, exact input) -> embedding, LRU within CACHE_MB,
+# entries expire after CACHE_TTL seconds (0 = never).
+CACHE_MB = float(os.environ.get("EMBED_CACHE_MB", "256"))
+CACHE_TTL = float(os.environ.get("EMBED_CACHE_TTL", "0"))
+
+# Binary wire format, negotiated via `Accept`: 12-byte little-endian header
+# (magic, uint32 count, uint32 dims) + count*dims float32, row-major.
+F32_MEDIA_TYPE = "application/x-hypermemory-f32"
+F32_HEADER = struct.Struct("<4sII")
+
 app = FastAPI(title="mf-embeddings", version="0.1")
+
+class _NoMetric:
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        pass
+
+    def observe(self, value: float, **labels: str) -> None:
+        pass
+
+
+if hm_metrics is not None:
+    REQUESTS = hm_metrics.counter("hypermemory_embed_server_requests_total", "Embedding requests", ("endpoint",))
+    REQUEST_SECONDS = hm_metrics.histogram("hypermemory_embed_server_request_seconds", "Embedding request latency", ("endpoint",))
+    INPUTS = hm_metrics.counter("hypermemory_embed_server_inputs_total", "Texts received", ("endpoint",))
+else:
+    REQUESTS = REQUEST_SECONDS = INPUTS = _NoMetric()
 model: SentenceTransformer | None = None
+onnx_encoder = None
 
 
 class EmbedRequest(BaseModel):
     inputs: Union[str, List[str]]
 
 
+def _worker_init(threads: int) -> None:
+    global model, onnx_encoder
+    torch.set_num_threads(threads)
+    if BACKEND == "onnx":
+        import embed_onnx
+
+        onnx_encoder = embed_onnx.load(MODEL_ID, ONNX_PATH, quantize=ONNX_QUANTIZE, threads=ONNX_THREADS or threads)
+    elif model is None:
+        # forkserver restart: nothing is inherited from the parent
+        model = SentenceTransformer(MODEL_ID, device=DEVICE)
+
+
+def _worker_encode(texts: List[str]) -> np.ndarray:
+    return _encode(texts)
+
+
+batcher: MicroBatcher | None = None
+workers: WorkerPool | None = None
+cache = ResultCache(int(CACHE_MB * 1024 * 1024), ttl_s=CACHE_TTL)
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    if onnx_encoder is not None:
+        return onnx_encoder.encode(texts)
+    assert model is not None
+    return model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+
+
+def _cache_model() -> str:
+    # vectors differ per backend (int8 ONNX vs fp32 torch), so key on both
+    return f"{MODEL_ID}@{BACKEND}"
+
+
+def _embed_cached(texts: List[str]) -> np.ndarray:
+    """Serve repeated inputs from the result cache; encode only the misses (once each)."""
+
+    assert batcher is not None
+    return cached_encode(cache, _cache_model(), texts, batcher.submit)
+
+
+def _f32_frame(emb: np.ndarray) -> bytes:
+    emb = np.ascontiguousarray(emb, dtype="<f4")
+    n, d = emb.shape if emb.ndim == 2 else (0, 0)
+    return F32_HEADER.pack(b"HMF1", n, d) + emb.tobytes()
+
+
+def _f32_response(emb: np.ndarray) -> Response:
+    return Response(content=_f32_frame(emb), media_type=F32_MEDIA_TYPE)
+
+
+def _ndjson_lines(emb: np.ndarray) -> bytes:
+    return b"".join(json.dumps(row).encode("utf-8") + b"\n" for row in emb.tolist())
+
+
 @app.on_event("startup")
 def _load_model():
-    global model
-    model = SentenceTransformer(MODEL_ID, device=DEVICE)
+    global model, onnx_encoder, batcher, workers
+    if WORKERS > 1 and DEVICE != "cpu":
+        raise RuntimeError("EMBED_WORKERS > 1 requires EMBED_DEVICE=cpu (CUDA/MPS state does not survive fork)")
+    if BACKEND == "onnx":
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import embed_onnx
+
+        if WORKERS > 1:
+            # export once here; each worker opens its own session (ORT thread
+            # pools are not fork-safe)
+            embed_onnx.export(MODEL_ID, embed_onnx.resolve_path(MODEL_ID, ONNX_PATH), quantize=ONNX_QUANTIZE)
+        else:
+            onnx_encoder = embed_onnx.load(MODEL_ID, ONNX_PATH, quantize=ONNX_QUANTIZE, threads=ONNX_THREADS)
+    elif BACKEND == "torch":
+        model = SentenceTransformer(MODEL_ID, device=DEVICE)
+    else:
+        raise RuntimeError(f"EMBED_BACKEND must be torch|onnx, got {BACKEND!r}")
+    if WORKERS > 1:
+        workers = WorkerPool(WORKERS, WORKER_THREADS, _worker_init, _worker_encode)
+        batcher = MicroBatcher(workers.encode, BATCH_MAX, BATCH_WAIT_MS, threads=WORKERS)
+    else:
+        batcher = MicroBatcher(_encode, BATCH_MAX, BATCH_WAIT_MS)
+
+
+@app.on_event("shutdown")
+def _stop_workers():
+    if workers is not None:
+        workers.close()
 
 
 @app.get("/health")
 def health():
-    return {"ok": True, "model": MODEL_ID, "device": DEVICE, "cuda": torch.cuda.is_available()}
+    out = {"ok": True, "model": MODEL_ID, "device": DEVICE, "cuda": torch.cuda.is_available(), "backend": BACKEND}
+    if onnx_encoder is not None:
+        out["onnx"] = {"quantized": onnx_encoder.quantized, "threads": onnx_encoder.threads}
+    if batcher is not None:
+        out["batching"] = batcher.stats()
+    if workers is not None:
+        out["workers"] = workers.stats()
+    out["cache"] = cache.stats()
+    return out
+
+
+def _hist_family(name: str, help: str, h: Histogram, scale: float = 1.0):
+    """Render one of the batcher's Histograms as a Prometheus histogram family."""
+
+    with h._lock:
+        counts, total, n = list(h.counts), h.total, h.n
+    samples = []
+    acc = 0
+    for b, c in zip([*h.bounds, float("inf")], counts):
+        acc += c
+        le = "+Inf" if b == float("inf") else f"{b * scale:g}"
+        samples.append((f"{name}_bucket", {"le": le}, float(acc)))
+    samples.append((f"{name}_sum", {}, total * scale))
+    samples.append((f"{name}_count", {}, float(n)))
+    return (name, "histogram", help, samples)
+
+
+def _collect_server():
+    out = []
+    if batcher is not None:
+        out.append(_hist_family("hypermemory_embed_server_batch_size", "Texts per encode() call", batcher.batch_size))
+        out.append(
+            _hist_family(
+                "hypermemory_embed_server_queue_wait_seconds", "Time a request waited for its batch", batcher.queue_wait_ms, 0.001
+            )
+        )
+        name = "hypermemory_embed_server_queued"
+        out.append((name, "gauge", "Requests waiting for a batch", [(name, {}, float(batcher.q.qsize()))]))
+    st = cache.stats()
+    for key, kind, help in (
+        ("hits", "counter", "Result cache hits"),
+        ("misses", "counter", "Result cache misses"),
+        ("evictions", "counter", "Result cache evictions"),
+        ("expired", "counter", "Result cache entries dropped after EMBED_CACHE_TTL"),
+        ("entries", "gauge", "Result cache entries"),
+        ("bytes", "gauge", "Result cache bytes"),
+    ):
+        name = f"hypermemory_embed_server_cache_{key}" + ("_total" if kind == "counter" else "")
+        out.append((name, kind, help, [(name, {}, float(st[key]))]))
+    if workers is not None:
+        name = "hypermemory_embed_server_worker_restarts_total"
+        out.append((name, "counter", "Worker pool restarts", [(name, {}, float(workers.restarts))]))
+    return out
+
+
+if hm_metrics is not None:
+    hm_metrics.REGISTRY.register_collector(_collect_server)
+
+
+@app.get("/metrics")
+def metrics():
+    if hm_metrics is None:
+        return JSONResponse({"error": "metrics unavailable: hypermemory package not importable"}, status_code=503)
+    return Response(content=hm_metrics.exposition(), media_type=hm_metrics.CONTENT_TYPE)
 
 
 @app.post("/embed")
-def embed(req: EmbedRequest):
-    assert model is not None
+def embed(req: EmbedRequest, request: Request):
+    assert batcher is not None
+    t0 = time.perf_counter()
     texts = req.inputs if isinstance(req.inputs, list) else [req.inputs]
-    emb = model.encode(texts, normalize_embeddings=True).tolist()
-    return emb
+    binary = F32_MEDIA_TYPE in request.headers.get("accept", "")
+    REQUESTS.inc(endpoint="embed")
+    INPUTS.inc(len(texts), endpoint="embed")
+    if not texts:
+        return _f32_response(np.zeros((0, 0), dtype=np.float32)) if binary else []
+    emb = _embed_cached(texts)
+    out = _f32_response(emb) if binary else emb.tolist()
+    REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint="embed")
+    return out
+
+
+def _ndjson_texts(lines: List[bytes]) -> List[str]:
+    out = []
+    for ln in lines:
+        if ln.strip():
+            t = json.loads(ln)
+            if not isinstance(t, str):
+                raise ValueError("each line must be a JSON string")
+            out.append(t)
+    return out
+
+
+@app.post("/embed/stream")
+async def embed_stream(request: Request):
+    """NDJSON in (one JSON string per line), vectors out in input order as each micro-batch finishes.
+
+    Response is NDJSON (one float array per line) or, with the binary Accept
+    type, a sequence of f32 frames (same header + rows as /embed).
+    """
+
+    assert batcher is not None
+    t0 = time.perf_counter()
+    binary = F32_MEDIA_TYPE in request.headers.get("accept", "")
+    texts: List[str] = []
+    tail = b""
+    try:
+        async for chunk in request.stream():
+            *lines, tail = (tail + chunk).split(b"\n")
+            texts.extend(_ndjson_texts(lines))
+        texts.extend(_ndjson_texts([tail]))
+    except ValueError as e:  # JSONDecodeError / UnicodeDecodeError
+        return JSONResponse({"detail": f"bad NDJSON input: {e}"}, status_code=400)
+    REQUESTS.inc(endpoint="stream")
+    INPUTS.inc(len(texts), endpoint="stream")
+    fmt = _f32_frame if binary else _ndjson_lines
+    inflight = max(2, batcher.threads + 1)
+
+    async def gen():
+        pending: deque = deque()
+        for i in range(0, len(texts), BATCH_MAX):
+            pending.append(asyncio.ensure_future(run_in_threadpool(_embed_cached, texts[i : i + BATCH_MAX])))
+            while len(pending) >= inflight:
+                yield fmt(await pending.popleft())
+        while pending:
+            yield fmt(await pending.popleft())
+        REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint="stream")
+
+    return StreamingResponse(gen(), media_type=F32_MEDIA_TYPE if binary else "application/x-ndjson")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import os
+from dataclasses import replace
+
+from hypermemory import benchmark
+from hypermemory.benchmark import WorkspaceSpec, generate_workspace
+
+SMALL = WorkspaceSpec(days=3, bullets_per_day=10, journal_events=50, curated_items=30, vocab=200, seed=5)
+
+
+def _files(root) -> dict[str, bytes]:
+    return {str(p.relative_to(root)): p.read_bytes() for p in sorted(root.rglob("*")) if p.is_file()}
+
+
+def test_generate_workspace_is_byte_identical_for_same_spec(tmp_path):
+    a = generate_workspace(tmp_path / "a", SMALL)
+    b = generate_workspace(tmp_path / "b", SMALL)
+    assert a == b
+    files = _files(tmp_path / "a")
+    assert files == _files(tmp_path / "b")
+    assert len(files) == a["files"] and sum(map(len, files.values())) == a["bytes"]
+
+    generate_workspace(tmp_path / "c", replace(SMALL, seed=6))
+    assert _files(tmp_path / "c") != files
+
+
+def test_retrieve_runs_with_pinned_env(tmp_path, monkeypatch):
+    generate_workspace(tmp_path, SMALL)
+    monkeypatch.setenv("DATABASE_URL", "postgresql://caller/db")
+    monkeypatch.setenv("HYPERMEMORY_CLOUD_FALLBACK", "1")
+    monkeypatch.delenv("HYPERMEMORY_VECTOR_BACKEND", raising=False)
+    seen: list[dict] = []
+
+    def retrieve(ws, q, mode="auto", limit=10, timings=None):
+        seen.append({k: os.environ.get(k) for k in benchmark._PINNED_ENV})
+        timings["total"] = 1.0
+        return []
+
+    monkeypatch.setattr(benchmark, "retrieve", retrieve)
+    out = benchmark.run_benchmark(tmp_path, ["deploy", "restart"], appends=2)
+    assert seen == [benchmark._PINNED_ENV] * 2
+    assert out["retrieve_ms"]["total"]["n"] == 2
+    # caller's environment is restored
+    assert os.environ["DATABASE_URL"] == "postgresql://caller/db"
+    assert os.environ["HYPERMEMORY_CLOUD_FALLBACK"] == "1"
+    assert "HYPERMEMORY_VECTOR_BACKEND" not in os.environ
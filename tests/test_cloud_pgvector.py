@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("psycopg")
+pytest.importorskip("pgvector")
+
+import psycopg  # noqa: E402
+
+from hypermemory import cloud_pgvector  # noqa: E402
+from hypermemory.cloud_pgvector import CloudConfig, _load_sha_index  # noqa: E402
+
+SHA_A = hashlib.sha256(b"a").hexdigest()
+SHA_B = hashlib.sha256(b"b").hexdigest()
+
+
+def _touch(p, t):
+    os.utime(p, (t, t))
+
+
+def test_index_is_built_from_pulled_file(tmp_path):
+    md, idx = tmp_path / "MEMORY.cloud.md", tmp_path / "MEMORY.cloud.sha"
+    md.write_text(f"- [sha={SHA_A}] [M3] a\n- [sha={SHA_B}] [M1] b\n", encoding="utf-8")
+    assert _load_sha_index(idx, md) == {bytes.fromhex(SHA_A), bytes.fromhex(SHA_B)}
+    assert idx.stat().st_size == 64
+
+
+def test_index_is_reused_when_current(tmp_path):
+    md, idx = tmp_path / "MEMORY.cloud.md", tmp_path / "MEMORY.cloud.sha"
+    md.write_text("", encoding="utf-8")
+    idx.write_bytes(bytes.fromhex(SHA_A))
+    _touch(md, 1000)
+    _touch(idx, 2000)
+    assert _load_sha_index(idx, md) == {bytes.fromhex(SHA_A)}
+
+
+def test_index_is_rebuilt_when_file_is_newer_or_missing(tmp_path):
+    md, idx = tmp_path / "MEMORY.cloud.md", tmp_path / "MEMORY.cloud.sha"
+    idx.write_bytes(bytes.fromhex(SHA_A) + bytes.fromhex(SHA_B))
+    md.write_text(f"- [sha={SHA_B}] [M1] b\n", encoding="utf-8")  # hand-edited: a removed
+    _touch(idx, 1000)
+    _touch(md, 2000)
+    assert _load_sha_index(idx, md) == {bytes.fromhex(SHA_B)}
+
+    md.unlink()
+    assert _load_sha_index(idx, md) == set()
+    assert idx.read_bytes() == b""
+
+
+class _MissingTableCon:
+    def execute(self, *a, **k):
+        raise psycopg.errors.UndefinedTable('relation "hm_cloud_embedding" does not exist')
+
+
+def test_push_dedup_on_uninitialized_db_is_silent(tmp_path, monkeypatch, capsys):
+    @contextmanager
+    def connection(url, timeout=None, connect_timeout=None):
+        yield _MissingTableCon()
+
+    monkeypatch.setattr(cloud_pgvector.pg_pool, "connection", connection)
+    monkeypatch.setattr(cloud_pgvector, "embed_texts", lambda url, texts: [[0.0, 1.0] for _ in texts])
+    cfg = CloudConfig(database_url="postgresql://test")
+    assert cloud_pgvector.existing_shas(cfg, [SHA_A]) == set()
+
+    staging = tmp_path / "memory" / "staging"
+    staging.mkdir(parents=True)
+    (staging / "MEMORY.pending.md").write_text("- [M4] deploy runs from the release branch\n", encoding="utf-8")
+    assert cloud_pgvector.prepare_payload(tmp_path, cfg).exists()
+    assert "dedup check failed" not in capsys.readouterr().err
+
+
+class _CatalogCon:
+    """Answers the catalog queries of schema_ready from a dict of relations."""
+
+    def __init__(self, relations: dict[str, str]):
+        self.relations = relations  # name -> "r" (plain), "l"/"h" (partitioned) or "i" (index)
+        self.sql: list[str] = []
+
+    def execute(self, query, params=None):
+        self.sql.append(query)
+        name = params[0]
+        kind = self.relations.get(name)
+        if "pg_partitioned_table" in query:
+            row = None if kind is None else (("p", kind) if kind in ("l", "h") else ("r", None))
+        else:
+            row = (name if kind else None,)
+        return type("Cur", (), {"fetchone": lambda _self: row})()
+
+
+_INDEXES = {n: "i" for n in cloud_pgvector._SCHEMA_INDEXES}
+
+
+@pytest.mark.parametrize(
+    "partition,relations,ready",
+    [
+        ("none", {}, False),
+        ("none", {"hm_cloud_item": "r", "hm_cloud_embedding": "r"}, False),  # indexes missing
+        ("none", {"hm_cloud_item": "r", "hm_cloud_embedding": "r", **_INDEXES}, True),
+        ("list", {"hm_cloud_item": "r", "hm_cloud_embedding": "r", **_INDEXES}, False),  # not migrated
+        ("list", {"hm_cloud_item": "l", "hm_cloud_embedding": "l", **_INDEXES}, False),  # no partition for ns
+        (
+            "list",
+            {
+                "hm_cloud_item": "l",
+                "hm_cloud_embedding": "l",
+                **_INDEXES,
+                cloud_pgvector._partition_name("hm_cloud_item", "default"): "r",
+                cloud_pgvector._partition_name("hm_cloud_embedding", "default"): "r",
+            },
+            True,
+        ),
+        ("hash:4", {"hm_cloud_item": "h", "hm_cloud_embedding": "h", **_INDEXES}, True),
+    ],
+)
+def test_schema_ready_reads_catalog_only(partition, relations, ready):
+    con = _CatalogCon(relations)
+    assert cloud_pgvector.schema_ready(con, CloudConfig(database_url="postgresql://test", partition=partition)) is ready
+    assert all(q.lstrip().upper().startswith("SELECT") for q in con.sql)
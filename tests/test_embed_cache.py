@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from hypermemory.embed_cache import QueryEmbeddingCache, cache_key
+
+
+def test_key_is_exact_text_and_model_identity():
+    base = cache_key("http://h:8080/", "m|fake/st/384", "Deploy failed?")
+    assert base == cache_key("http://h:8080", "m|fake/st/384", "Deploy failed?")
+    assert base != cache_key("http://h:8080", "m|fake/st/384", "deploy failed?")
+    assert base != cache_key("http://h:8080", "m|fake/st/384", "Deploy  failed?")
+    assert base != cache_key("http://h:8080", "m|other/st/768", "Deploy failed?")
+
+
+def test_disk_tier_survives_restart_and_clear_empties_it(tmp_path):
+    path = tmp_path / "qcache.sqlite"
+    c = QueryEmbeddingCache(max_entries=8, ttl_s=0, disk_path=path)
+    c.put("k", [0.5, -1.0, 2.0])
+    con = c._con
+    assert c.get("k") == [0.5, -1.0, 2.0]
+    c.put("k2", [1.0])
+    assert c._con is con  # one connection for the cache's lifetime
+
+    fresh = QueryEmbeddingCache(max_entries=8, ttl_s=0, disk_path=path)
+    assert fresh.get("k") == [0.5, -1.0, 2.0]
+
+    c.clear()
+    assert QueryEmbeddingCache(max_entries=8, ttl_s=0, disk_path=path).get("k") is None
+
+
+def test_lru_eviction_and_stats():
+    c = QueryEmbeddingCache(max_entries=2, ttl_s=0)
+    c.put("a", [1.0])
+    c.put("b", [2.0])
+    assert c.get("a") == [1.0]
+    c.put("c", [3.0])  # evicts b (least recently used)
+    assert c.get("b") is None
+    assert c.stats() == {"entries": 2, "hits": 1, "misses": 1}
+
+
+def _setup_query(monkeypatch, cache: QueryEmbeddingCache, health):
+    from hypermemory import embed_cache, embed_client
+
+    monkeypatch.setattr(embed_cache, "_CACHE", cache)
+    monkeypatch.setattr(embed_client, "_CLIENTS", {})
+    calls = {"health": 0, "embed": 0}
+
+    def fake_health(self):
+        calls["health"] += 1
+        return health()
+
+    def fake_embed_one(base_url, text):
+        calls["embed"] += 1
+        return [float(len(text))]
+
+    monkeypatch.setattr(embed_client.EmbedClient, "health", fake_health)
+    monkeypatch.setattr(embed_client, "embed_one", fake_embed_one)
+    return embed_client.embed_query, calls
+
+
+def test_memory_only_cache_skips_health(monkeypatch):
+    embed_query, calls = _setup_query(monkeypatch, QueryEmbeddingCache(max_entries=8, ttl_s=0), lambda: {"model": "m"})
+    for _ in range(3):
+        assert embed_query("http://h:1", "local", "deploy?") == [7.0]
+    assert calls == {"health": 0, "embed": 1}
+
+
+def test_disk_tier_keys_on_identity_and_caches_health_failure(tmp_path, monkeypatch):
+    from hypermemory.embed_client import EmbedError
+
+    def down():
+        raise EmbedError("unreachable")
+
+    disk = QueryEmbeddingCache(max_entries=8, ttl_s=0, disk_path=tmp_path / "q.sqlite")
+    embed_query, calls = _setup_query(monkeypatch, disk, down)
+    for _ in range(3):
+        embed_query("http://h:1", "local", "deploy?")
+    # /health asked once; without an identity nothing is cached
+    assert calls == {"health": 1, "embed": 3}
+
+    disk = QueryEmbeddingCache(max_entries=8, ttl_s=0, disk_path=tmp_path / "q2.sqlite")
+    embed_query, calls = _setup_query(monkeypatch, disk, lambda: {"model": "e5", "backend": "onnx"})
+    for _ in range(3):
+        embed_query("http://h:1", "local", "deploy?")
+    assert calls == {"health": 1, "embed": 1}
+    assert disk.get(cache_key("http://h:1", "local|e5/onnx", "deploy?")) == [7.0]
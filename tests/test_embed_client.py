@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+import random
+import struct
+from dataclasses import replace
+
+import pytest
+
+from hypermemory import embed_client
+from hypermemory.embed_client import EmbedError, decode_f32
+
+
+def _frame(rows: list[list[float]], magic: bytes = b"HMF1") -> bytes:
+    n, d = len(rows), len(rows[0]) if rows else 0
+    return struct.pack("<4sII", magic, n, d) + struct.pack(f"<{n * d}f", *[x for r in rows for x in r])
+
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_decode_f32_returns_float_lists(monkeypatch, with_numpy):
+    if with_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(embed_client, "np", None)
+    rows = decode_f32(_frame([[1.0, -2.5, 0.0], [0.25, 3.0, -1.0]]))
+    assert rows == [[1.0, -2.5, 0.0], [0.25, 3.0, -1.0]]
+    assert all(type(r) is list and all(type(x) is float for x in r) for r in rows)
+    assert decode_f32(_frame([])) == []
+
+
+@pytest.mark.parametrize(
+    "data,msg",
+    [
+        (b"HMF1", "truncated"),
+        (_frame([[1.0]], magic=b"XXXX"), "magic"),
+        (_frame([[1.0, 2.0]])[:-4], "size mismatch"),
+        (_frame([[1.0, 2.0]]) + b"\0" * 4, "size mismatch"),
+    ],
+)
+def test_decode_f32_rejects_malformed(data, msg):
+    with pytest.raises(EmbedError, match=msg):
+        decode_f32(data)
+
+
+@pytest.mark.parametrize(
+    "texts,max_batch,budget,expected",
+    [
+        ([], 4, 0, []),
+        (["a", "b", "c", "d", "e"], 2, 0, [[0, 1], [2, 3], [4]]),
+        (["a", "b"], 0, 0, [[0], [1]]),
+        # budgeted: shortest first (len//4 + 2 tokens), stable on ties
+        (["x" * 40, "", "x" * 4], 8, 1000, [[1, 2, 0]]),
+        (["", "", "", "", ""], 2, 1000, [[0, 1], [2, 3], [4]]),
+        # longest * count would pass the budget: the long input goes alone
+        (["x" * 400, "", "", ""], 8, 10, [[1, 2, 3], [0]]),
+        (["x" * 20, "x" * 20, "x" * 20], 8, 14, [[0, 1], [2]]),
+    ],
+)
+def test_plan_batches(texts, max_batch, budget, expected):
+    assert embed_client.plan_batches(texts, max_batch, budget) == expected
+
+
+@pytest.mark.parametrize("budget", [0, 16, 64, 512])
+def test_plan_batches_invariants(budget):
+    rng = random.Random(budget)
+    texts = ["x" * rng.randint(0, 300) for _ in range(200)]
+    batches = embed_client.plan_batches(texts, 16, budget)
+    assert sorted(i for b in batches for i in b) == list(range(len(texts)))
+    for b in batches:
+        assert 1 <= len(b) <= 16
+        if budget and len(b) > 1:
+            assert max(embed_client.estimate_tokens(texts[i]) for i in b) * len(b) <= budget
+
+
+class _Server:
+    """Canned /embed and /embed/stream responses on a local port."""
+
+    def __init__(self, stream_body: bytes):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):  # noqa: N802
+                n = int(self.headers.get("Content-Length", 0))
+                payload = self.rfile.read(n)
+                if self.path == "/embed/stream":
+                    body, ctype = outer.stream_body, embed_client.F32_MEDIA_TYPE
+                else:
+                    texts = json.loads(payload)["inputs"]
+                    body, ctype = _frame([[float(len(t))] * 2 for t in texts]), embed_client.F32_MEDIA_TYPE
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *a):
+                pass
+
+        self.stream_body = stream_body
+        self.srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.srv.daemon_threads = True
+        threading.Thread(target=self.srv.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.srv.server_address[1]}"
+
+    def close(self):
+        self.srv.shutdown()
+        self.srv.server_close()
+
+
+def _client(url: str, **kw):
+    return embed_client.EmbedClient(url, replace(embed_client.EmbedClientConfig(), retries=0, **kw))
+
+
+@pytest.mark.parametrize("tail", [b"HM", b"XXXX\x01\x00\x00\x00\x02\x00\x00\x00"])
+def test_stream_rejects_truncated_or_bad_frame_header(tail):
+    srv = _Server(_frame([[1.0, 2.0]]) + tail)
+    try:
+        c = _client(srv.url)
+        with pytest.raises(EmbedError):
+            list(c._stream(["a", "b"]))
+        # embed_stream falls back to /embed for what the stream did not deliver
+        assert sorted(c.embed_stream(["a", "bb"]), key=lambda p: p[0])[1] == (1, [2.0, 2.0])
+    finally:
+        srv.close()
+
+
+def test_open_stream_does_not_hold_a_connection_slot():
+    srv = _Server(_frame([[1.0, 2.0]]) + _frame([[3.0, 4.0]]))
+    try:
+        c = _client(srv.url, max_connections=1)
+        it = c._stream(["a", "b"])
+        assert next(it) == [1.0, 2.0]
+        assert c._slots.acquire(timeout=2)  # the only slot is free while the stream is open
+        c._slots.release()
+        assert c.embed(["xyz"]) == [[3.0, 3.0]]
+        assert next(it) == [3.0, 4.0]
+    finally:
+        srv.close()
+
+
+def test_budgeted_embed_returns_input_order():
+    srv = _Server(b"")
+    try:
+        texts = ["x" * n for n in (300, 0, 41, 7, 120, 7, 2)]
+        c = _client(srv.url, max_batch=3, token_budget=64)
+        assert c.embed(texts) == [[float(len(t))] * 2 for t in texts]
+    finally:
+        srv.close()
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import gc
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from types import SimpleNamespace  # noqa: E402
+
+from scripts import embed_runtime  # noqa: E402
+from scripts.embed_runtime import Histogram, MicroBatcher, ResultCache, cached_encode  # noqa: E402
+
+
+def _rows(texts):
+    return np.array([[float(len(t)), float(ord(t[0]))] for t in texts], dtype=np.float32)
+
+
+class Encoder:
+    """Records every encode() call; the first one blocks until `release()`."""
+
+    def __init__(self, fail: bool = False):
+        self.calls: list[list[str]] = []
+        self.gate = threading.Event()
+        self.fail = fail
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        if len(self.calls) == 1:
+            self.gate.wait(5)
+        if self.fail and len(self.calls) > 1:
+            raise ValueError("encode failed")
+        return _rows(texts)
+
+
+def _submit_all(b: MicroBatcher, jobs: list[list[str]]) -> list:
+    out: list = [None] * len(jobs)
+
+    def run(i):
+        try:
+            out[i] = b.submit(jobs[i])
+        except BaseException as e:  # noqa: BLE001
+            out[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(jobs))]
+    for t in threads:
+        t.start()
+    return out, threads
+
+
+def _wait_queued(b: MicroBatcher, n: int) -> None:
+    deadline = time.time() + 5
+    while b.q.qsize() < n and time.time() < deadline:
+        time.sleep(0.001)
+
+
+def test_concurrent_requests_are_coalesced_and_fanned_out():
+    enc = Encoder()
+    b = MicroBatcher(enc, max_batch=64, max_wait_ms=0)
+    first, t0 = _submit_all(b, [["warm"]])
+    while not enc.calls:
+        time.sleep(0.001)
+    # these queue up while the first batch is encoding
+    jobs = [["a", "bb"], ["ccc"], ["dddd", "e", "ff"]]
+    out, threads = _submit_all(b, jobs)
+    _wait_queued(b, len(jobs))
+    enc.gate.set()
+    for t in [*t0, *threads]:
+        t.join(5)
+
+    assert len(enc.calls) == 2 and sorted(enc.calls[1]) == sorted(t for j in jobs for t in j)
+    for job, res in zip(jobs, out):
+        np.testing.assert_array_equal(res, _rows(job))
+    np.testing.assert_array_equal(first[0], _rows(["warm"]))
+    assert b.stats()["batch_size"]["count"] == 2
+
+
+def test_batch_is_closed_at_max_batch():
+    enc = Encoder()
+    b = MicroBatcher(enc, max_batch=3, max_wait_ms=0)
+    _, t0 = _submit_all(b, [["warm"]])
+    while not enc.calls:
+        time.sleep(0.001)
+    jobs = [["a", "b"], ["c", "d"], ["e"]]
+    out, threads = _submit_all(b, jobs)
+    _wait_queued(b, 3)
+    enc.gate.set()
+    for t in [*t0, *threads]:
+        t.join(5)
+    # a request is never split: the batch closes once it holds >= max_batch texts
+    assert [len(c) for c in enc.calls[1:]] in ([4, 1], [3, 2])
+    for job, res in zip(jobs, out):
+        np.testing.assert_array_equal(res, _rows(job))
+
+
+def test_encode_error_reaches_every_waiter_in_the_batch():
+    enc = Encoder(fail=True)
+    b = MicroBatcher(enc, max_batch=64, max_wait_ms=0)
+    _, t0 = _submit_all(b, [["warm"]])
+    while not enc.calls:
+        time.sleep(0.001)
+    out, threads = _submit_all(b, [["a"], ["b"]])
+    _wait_queued(b, 2)
+    enc.gate.set()
+    for t in [*t0, *threads]:
+        t.join(5)
+    assert all(isinstance(r, ValueError) for r in out)
+
+
+def test_wait_window_coalesces_staggered_requests():
+    enc = Encoder()
+    enc.gate.set()
+    b = MicroBatcher(enc, max_batch=64, max_wait_ms=200)
+    out, threads = _submit_all(b, [["a"]])
+    time.sleep(0.02)
+    out2, threads2 = _submit_all(b, [["b"]])
+    for t in [*threads, *threads2]:
+        t.join(5)
+    assert enc.calls == [["a", "b"]]
+
+
+@pytest.mark.parametrize(
+    "values,buckets",
+    [
+        ([], {"le_1": 0, "le_4": 0, "le_inf": 0}),
+        ([1, 1, 2, 4, 5], {"le_1": 2, "le_4": 4, "le_inf": 5}),
+        ([0.5, 100], {"le_1": 1, "le_4": 1, "le_inf": 2}),
+    ],
+)
+def test_histogram_cumulative_buckets(values, buckets):
+    h = Histogram([1, 4])
+    for v in values:
+        h.observe(v)
+    assert h.as_dict() == {"count": len(values), "sum": round(float(sum(values)), 3), "buckets": buckets}
+
+
+ENTRY = 1 + 2 * 4 + ResultCache._OVERHEAD  # one-char key, two float32
+
+
+def _row(x: float):
+    return np.array([x, x], dtype=np.float32)
+
+
+def test_result_cache_evicts_least_recently_used_by_bytes():
+    c = ResultCache(3 * ENTRY)
+    for t in "abc":
+        c.put(("m", t), _row(ord(t)))
+    assert c.get(("m", "a")) is not None  # a is now most recent
+    c.put(("m", "d"), _row(4))
+    assert c.get(("m", "b")) is None
+    assert [t for t in "acd" if c.get(("m", t)) is not None] == ["a", "c", "d"]
+    st = c.stats()
+    assert (st["entries"], st["bytes"], st["evictions"]) == (3, 3 * ENTRY, 1)
+
+    # replacing a key keeps the byte count exact
+    c.put(("m", "a"), _row(9))
+    assert c.stats()["bytes"] == 3 * ENTRY and c.get(("m", "a"))[0] == 9
+
+
+def test_result_cache_skips_oversized_and_disabled():
+    c = ResultCache(ENTRY)
+    c.put(("m", "long text"), _row(1))
+    assert c.get(("m", "long text")) is None and c.stats()["bytes"] == 0
+    off = ResultCache(0)
+    off.put(("m", "a"), _row(1))
+    assert off.get(("m", "a")) is None
+
+
+def test_result_cache_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(embed_runtime, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    c = ResultCache(10 * ENTRY, ttl_s=60)
+    c.put(("m", "a"), _row(1))
+    now[0] += 59
+    assert c.get(("m", "a")) is not None
+    now[0] += 1
+    assert c.get(("m", "a")) is None
+    st = c.stats()
+    assert (st["entries"], st["bytes"], st["expired"], st["hits"], st["misses"]) == (0, 0, 1, 1, 1)
+
+    forever = ResultCache(10 * ENTRY)
+    forever.put(("m", "a"), _row(1))
+    now[0] += 10**6
+    assert forever.get(("m", "a")) is not None
+
+
+def test_cached_encode_encodes_each_miss_once():
+    calls: list[list[str]] = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return _rows(texts)
+
+    c = ResultCache(100 * ENTRY)
+    texts = ["a", "bb", "a", "ccc"]
+    np.testing.assert_array_equal(cached_encode(c, "m@torch", texts, encode), _rows(texts))
+    np.testing.assert_array_equal(cached_encode(c, "m@torch", ["ccc", "dd", "a"], encode), _rows(["ccc", "dd", "a"]))
+    assert calls == [["a", "bb", "ccc"], ["dd"]]
+    # another model/backend never shares rows
+    cached_encode(c, "m@onnx", ["a"], encode)
+    assert calls[-1] == ["a"]
+
+
+_WORKER_THREADS = 0
+
+
+def _pool_init(threads: int) -> None:
+    global _WORKER_THREADS
+    _WORKER_THREADS = threads
+
+
+def _pool_encode(texts):
+    # "die:<path>" kills the worker once (the marker file is consumed)
+    for t in texts:
+        if t.startswith("die:") and os.path.exists(t[4:]):
+            os.remove(t[4:])
+            os._exit(1)
+    return np.array([[float(len(t)), float(_WORKER_THREADS), float(os.getpid())] for t in texts])
+
+
+@pytest.fixture
+def pool():
+    p = embed_runtime.WorkerPool(2, 3, _pool_init, _pool_encode)
+    yield p
+    p.close()
+    gc.unfreeze()
+
+
+def test_worker_pool_encodes_in_initialized_children(pool):
+    out = pool.encode(["ab", "c"])
+    assert out[:, 0].tolist() == [2.0, 1.0] and out[:, 1].tolist() == [3.0, 3.0]
+    assert int(out[0, 2]) != os.getpid()
+    assert pool.stats() == {"workers": 2, "threads_per_worker": 3, "restarts": 0}
+
+
+def test_worker_pool_restarts_with_forkserver_after_a_worker_dies(pool, tmp_path):
+    marker = tmp_path / "die"
+    marker.touch()
+    out = pool.encode([f"die:{marker}", "xyz"])
+    # the batch is retried on the replacement pool and succeeds
+    assert out[:, 0].tolist() == [float(len(f"die:{marker}")), 3.0] and out[0, 1] == 3.0
+    assert pool.restarts == 1 and pool._pool._mp_context.get_start_method() == "forkserver"
+    assert pool.encode(["ok"])[0, 0] == 2.0 and pool.restarts == 1
+
+
+def test_worker_pool_children_die_on_sigterm():
+    # a server-style handler in the parent must not be inherited by workers
+    prev = signal.signal(signal.SIGTERM, lambda *a: None)
+    try:
+        pool = embed_runtime.WorkerPool(2, 1, _pool_init, _pool_encode)
+    finally:
+        signal.signal(signal.SIGTERM, prev)
+        gc.unfreeze()
+    procs = list(pool._pool._processes.values())
+    for p in procs:
+        os.kill(p.pid, signal.SIGTERM)
+    for p in procs:
+        p.join(5)
+    assert [p.exitcode for p in procs] == [-signal.SIGTERM] * 2
+    pool.close()
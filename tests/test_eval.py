@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import math
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from hypermemory import eval as hm_eval
+from hypermemory.config import Config
+from hypermemory.eval import _AhoCorasick, _find_needles
+
+
+def _naive(text: str, needles: list[str]) -> set[str]:
+    return {n for n in needles if n in text}
+
+
+@pytest.mark.parametrize(
+    "text,needles",
+    [
+        ("ushers", ["he", "she", "his", "hers"]),
+        ("abababc", ["abc", "bab", "aba", "c", "abcd"]),
+        ("aaaa", ["a", "aa", "aaa", "aaaaa"]),
+        ("deploy\0failed", ["deploy failed", "y\0f", "failed"]),
+        ("Großes Ärgernis", ["ßes", "ärger", "Ärger"]),
+        ("", ["x"]),
+        ("abc", []),
+    ],
+)
+def test_aho_corasick_matches_naive(text, needles):
+    assert _AhoCorasick(needles).search(text) == _naive(text, needles)
+
+
+def test_aho_corasick_matches_naive_fuzz():
+    rng = random.Random(3)
+    for _ in range(300):
+        text = "".join(rng.choice("abc") for _ in range(rng.randint(0, 60)))
+        needles = list({"".join(rng.choice("abc") for _ in range(rng.randint(1, 6))) for _ in range(rng.randint(1, 20))})
+        assert _AhoCorasick(needles).search(text) == _naive(text, needles), (text, needles)
+
+
+def test_find_needles_uses_automaton_above_threshold(monkeypatch):
+    monkeypatch.setattr(hm_eval, "_AC_MIN_NEEDLES", 2)
+    corpus = "MEMORY: rotate the deploy key\0notes: postgres upgrade"
+    needles = {"deploy key", "postgres", "key notes", "missing", ""}
+    assert _find_needles(corpus, needles) == {"deploy key", "postgres"}
+
+
+def _workspace(tmp_path, cases: list[str]):
+    (tmp_path / "memory").mkdir()
+    (tmp_path / "MEMORY.md").write_text("rotate the deploy key every quarter\n", encoding="utf-8")
+    (tmp_path / "memory" / "eval-queries.jsonl").write_text("\n".join(cases) + "\n", encoding="utf-8")
+    return Config(workspace=tmp_path)
+
+
+def _fake_retrieve(calls: list[str], snippets: list[str]):
+    def retrieve(ws, q, mode="auto", limit=10, timings=None):
+        calls.append(q)
+        if timings is not None:
+            timings["total"] = 1.0
+        return [SimpleNamespace(snippet=s) for s in snippets]
+
+    return retrieve
+
+
+def test_expected_file_hit_skips_retrieve_and_warmup(tmp_path, monkeypatch):
+    cfg = _workspace(tmp_path, ['{"query": "when to rotate?", "expected": "deploy key"}', '{"query": "db?", "expected": "postgres"}'])
+    calls: list[str] = []
+    monkeypatch.setattr(hm_eval, "retrieve", _fake_retrieve(calls, ["upgrade postgres on sunday"]))
+    res = hm_eval.run_eval(cfg, workers=1)
+    # one retrieving case: no warm-up, and the file hit never calls retrieve
+    assert calls == ["db?"]
+    assert [(c.via, c.rank) for c in res.cases] == [("file", None), ("retrieve", 1)]
+    assert res.latency["total"]["n"] == 1
+
+
+def test_warmup_runs_once_before_timed_cases(tmp_path, monkeypatch):
+    cfg = _workspace(tmp_path, ['{"query": "a", "minHits": 1}', '{"query": "b", "minHits": 1}', '{"query": "c", "expected": "deploy key"}'])
+    calls: list[str] = []
+    monkeypatch.setattr(hm_eval, "retrieve", _fake_retrieve(calls, ["x"]))
+    res = hm_eval.run_eval(cfg, workers=1)
+    assert calls == ["a", "a", "b"] and res.pass_retrieve == 2 and res.pass_file == 1
+
+    calls.clear()
+    hm_eval.run_eval(cfg, fast=True)
+    assert calls == []
+
+
+def _log_gain(rank: int) -> float:
+    return 1.0 / math.log2(rank + 1)
+
+
+@pytest.mark.parametrize(
+    "snippets,expected,rank,ndcg",
+    [
+        (["deploy key rotated"], "deploy key", 1, 1.0),
+        (["a", "b", "DEPLOY KEY"], "deploy key", 3, _log_gain(3)),
+        (["a", "deploy key", "b", "the deploy key"], "deploy key", 2, (_log_gain(2) + _log_gain(4)) / (_log_gain(1) + _log_gain(2))),
+        (["a", "b"], "deploy key", None, 0.0),
+        ([], "deploy key", None, 0.0),
+        (["x"] * 10 + ["deploy key"], "deploy key", None, 0.0),  # outside the top K
+    ],
+)
+def test_rank_metrics(snippets, expected, rank, ndcg):
+    got_rank, got_ndcg = hm_eval._rank_metrics(snippets, expected)
+    assert got_rank == rank and got_ndcg == pytest.approx(ndcg)
+
+
+def _case(category: str, rank: int | None, ndcg: float | None, query: str = "q") -> hm_eval.CaseResult:
+    return hm_eval.CaseResult(query=query, category=category, passed=rank is not None, via="retrieve", rank=rank, ndcg=ndcg)
+
+
+def test_quality_summary_mrr_ndcg_recall():
+    cases = [
+        _case("a", 1, 1.0),
+        _case("a", 4, 0.5),
+        _case("b", None, 0.0),
+        _case("b", 2, None),  # no rank metrics (file hit / minHits): excluded
+    ]
+    q = hm_eval.quality_summary(cases)
+    assert list(q) == ["a", "all", "b"]
+    assert q["a"] == {"n": 2, "mrr": 0.625, "ndcg@10": 0.75, "recall@1": 0.5, "recall@3": 0.5, "recall@5": 1.0, "recall@10": 1.0}
+    assert q["b"] == {"n": 1, "mrr": 0.0, "ndcg@10": 0.0, "recall@1": 0.0, "recall@3": 0.0, "recall@5": 0.0, "recall@10": 0.0}
+    assert q["all"]["n"] == 3 and q["all"]["mrr"] == 0.4167 and q["all"]["recall@5"] == 0.6667
+    assert hm_eval.quality_summary([_case("a", 1, None)]) == {}
+
+
+def _run(recall_pct, cases, mrr=None, p95=None) -> dict:
+    return {
+        "recall_pct": recall_pct,
+        "quality": {} if mrr is None else {"all": {"n": len(cases), "mrr": mrr}},
+        "latency": {} if p95 is None else {"total": {"p50": 1.0, "p95": p95, "p99": p95}},
+        "cases": [{"query": q, "category": "c", "rank": r, "ndcg": None if r == "skip" else 0.0} for q, r in cases],
+    }
+
+
+@pytest.mark.parametrize(
+    "base,cur,regressed,improved",
+    [
+        ([("q1", 1)], [("q1", 1)], [], []),
+        ([("q1", 1)], [("q1", 3)], [("q1", 1, 3)], []),
+        ([("q1", 3)], [("q1", None)], [("q1", 3, None)], []),
+        ([("q1", None)], [("q1", 10)], [], [("q1", None, 10)]),
+        ([("q1", 2), ("q2", 5)], [("q2", 1), ("q1", 2), ("new", 1)], [], [("q2", 5, 1)]),
+        ([("q1", "skip")], [("q1", 1)], [], []),  # base had no rank metrics
+    ],
+)
+def test_compare_runs_case_ranks(base, cur, regressed, improved):
+    out = hm_eval.compare_runs(_run(80, base), _run(80, cur))
+    rows = lambda xs: [(r["query"], r["base_rank"], r["cur_rank"]) for r in xs]  # noqa: E731
+    assert rows(out["regressed"]) == regressed and rows(out["improved"]) == improved
+
+
+def test_compare_runs_metric_and_latency_deltas():
+    out = hm_eval.compare_runs(_run(70, [], mrr=0.5, p95=20.0), _run(85, [], mrr=0.625, p95=12.5))
+    assert out["recall_pct"] == {"base": 70, "cur": 85, "delta": 15}
+    assert out["quality"] == {"all": {"mrr": {"base": 0.5, "cur": 0.625, "delta": 0.125}}}
+    assert out["latency"]["total"]["p95"] == {"base": 20.0, "cur": 12.5, "delta": -7.5}
+
+    # a category or layer present on one side only still shows up, with no delta
+    out = hm_eval.compare_runs(_run(None, [], p95=5.0), _run(90, [], mrr=0.5))
+    assert out["recall_pct"]["delta"] is None
+    assert out["quality"]["all"]["mrr"] == {"base": None, "cur": 0.5, "delta": None}
+    assert out["latency"]["total"]["p50"] == {"base": 1.0, "cur": None, "delta": None}
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import gzip
+import json
+
+from hypermemory.export import _RotatingWriter, export_corpus
+
+
+def _workspace(tmp_path):
+    (tmp_path / "memory").mkdir()
+    (tmp_path / "MEMORY.md").write_text(
+        "# MEMORY\n- deploys go through the release branch\n- password = hunter2hunter2\n- " + "x" * 600 + "\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "memory" / "journal.jsonl").write_text(
+        json.dumps({"ts_ms": 1, "channel": "cli", "message": "Bearer abcdefghijklmnopqrs ok"}) + "\n", encoding="utf-8"
+    )
+    return tmp_path
+
+
+def _records(out_dir):
+    out = []
+    for p in sorted(out_dir.glob("export-*.jsonl.gz")):
+        with gzip.open(p, "rt", encoding="utf-8") as f:
+            out += [json.loads(line) for line in f]
+    return out
+
+
+def test_default_export_redacts_and_drops_allowlist_failures(tmp_path):
+    ws = _workspace(tmp_path)
+    stats = export_corpus(ws, out_dir=tmp_path / "out", workers=1)
+    texts = [r["text"] for r in _records(tmp_path / "out")]
+    assert texts == ["# MEMORY", "- deploys go through the release branch", "- [REDACTED]", "[REDACTED] ok"]
+    assert stats.dropped == 1 and stats.records == 4 and stats.redactions == 2
+    assert json.loads((tmp_path / "out" / "summary.json").read_text())["strict"] is True
+
+
+def test_non_strict_keeps_failures_annotated(tmp_path):
+    ws = _workspace(tmp_path)
+    stats = export_corpus(ws, out_dir=tmp_path / "out", strict=False, workers=1)
+    recs = _records(tmp_path / "out")
+    assert stats.dropped == 0 and len(recs) == 5
+    assert [r["allowlist"] for r in recs if "allowlist" in r] == [["too_long", "high_entropy_token"]]
+
+
+def test_rotation_counts_utf8_bytes(tmp_path):
+    w = _RotatingWriter(tmp_path, max_records=100, max_bytes=80)
+    for _ in range(4):
+        w.write({"t": "é" * 20})  # 30 chars but 50 bytes per line
+    w.close()
+    assert w.files == ["export-00000.jsonl.gz", "export-00001.jsonl.gz", "export-00002.jsonl.gz", "export-00003.jsonl.gz"]
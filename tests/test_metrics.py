@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import threading
+import urllib.request
+
+import pytest
+
+from hypermemory.metrics import Counter, Gauge, Histogram, Registry, make_server
+
+
+def _lines(reg: Registry) -> list[str]:
+    return reg.exposition().splitlines()
+
+
+def _fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def test_counter_and_gauge_exposition():
+    reg = Registry()
+    c = reg._get_or_create(Counter, "hm_requests_total", "Requests", ("endpoint",))
+    c.inc(endpoint="embed")
+    c.inc(2, endpoint="embed")
+    c.inc(endpoint='a"b\\c\nd')
+    g = reg._get_or_create(Gauge, "hm_queued", "Queued", ())
+    g.set(3.5)
+    assert _lines(reg) == [
+        "# HELP hm_requests_total Requests",
+        "# TYPE hm_requests_total counter",
+        'hm_requests_total{endpoint="embed"} 3',
+        'hm_requests_total{endpoint="a\\"b\\\\c\\nd"} 1',
+        "# HELP hm_queued Queued",
+        "# TYPE hm_queued gauge",
+        "hm_queued 3.5",
+    ]
+    assert c.value(endpoint="embed") == 3.0 and c.value(endpoint="other") == 0.0
+
+
+@pytest.mark.parametrize(
+    "values,counts",
+    [
+        ([], None),
+        ([0.5], [1, 1, 1, 1]),  # upper bounds are inclusive (le)
+        ([0.1, 1.0, 1.0001, 7.0], [1, 2, 3, 4]),
+        ([99.0], [0, 0, 0, 1]),
+    ],
+)
+def test_histogram_cumulative_buckets(values, counts):
+    reg = Registry()
+    h = reg._get_or_create(Histogram, "hm_seconds", "Latency", ("layer",), buckets=(2.5, 0.5, 1))
+    for v in values:
+        h.observe(v, layer="fts")
+    lines = _lines(reg)
+    if counts is None:
+        assert lines == ["# HELP hm_seconds Latency", "# TYPE hm_seconds histogram"]
+        return
+    assert lines[2:] == [
+        *(f'hm_seconds_bucket{{layer="fts",le="{le}"}} {n}' for le, n in zip(("0.5", "1", "2.5", "+Inf"), counts)),
+        f'hm_seconds_sum{{layer="fts"}} {_fmt(sum(values))}',
+        f'hm_seconds_count{{layer="fts"}} {len(values)}',
+    ]
+
+
+@pytest.mark.parametrize(
+    "labels",
+    [{}, {"endpoint": "embed", "extra": "x"}, {"other": "embed"}],
+)
+def test_wrong_labels_are_rejected(labels):
+    c = Registry()._get_or_create(Counter, "hm_total", "x", ("endpoint",))
+    with pytest.raises(ValueError):
+        c.inc(**labels)
+
+
+def test_reregistering_with_other_type_or_labels_fails():
+    reg = Registry()
+    c = reg._get_or_create(Counter, "hm_total", "x", ("endpoint",))
+    assert reg._get_or_create(Counter, "hm_total", "x", ("endpoint",)) is c
+    with pytest.raises(ValueError):
+        reg._get_or_create(Gauge, "hm_total", "x", ("endpoint",))
+    with pytest.raises(ValueError):
+        reg._get_or_create(Counter, "hm_total", "x", ("mode",))
+
+
+def test_broken_collector_does_not_break_scrape():
+    reg = Registry()
+    reg.register_collector(lambda: 1 / 0)
+    reg.register_collector(lambda: [("hm_lag_seconds", "gauge", "Lag", [("hm_lag_seconds", {"index": "fts"}, 0.0)])])
+    assert _lines(reg)[-1] == 'hm_lag_seconds{index="fts"} 0'
+
+
+def test_http_server_serves_metrics():
+    reg = Registry()
+    reg._get_or_create(Counter, "hm_total", "x", ()).inc()
+    srv = make_server("127.0.0.1:0", reg)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{srv.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as r:
+            assert r.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert r.read().decode() == reg.exposition()
+    finally:
+        srv.shutdown()
+        srv.server_close()
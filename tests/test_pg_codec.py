@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("psycopg")
+
+from hypermemory import pg_codec  # noqa: E402
+
+
+class FakeCon:
+    def __init__(self, existing: set[str] = frozenset()):
+        self.sql: list[str] = []
+        self.existing = existing
+
+    def execute(self, sql, params=None):
+        self.sql.append(sql)
+        found = params[0] if params and params[0] in self.existing else None
+        return type("Cur", (), {"fetchone": lambda _self: (found,)})()
+
+
+@pytest.mark.parametrize("candidates,expected", [(10, 40), (80, 80), (5000, 1000)])
+def test_set_ef_search_is_clamped_to_pgvector_range(candidates, expected):
+    con = FakeCon()
+    pg_codec.set_ef_search(con, candidates)
+    assert con.sql == [f"SET LOCAL hnsw.ef_search = {expected}"]
+
+
+@pytest.mark.parametrize(
+    "codec,expr,query",
+    [
+        ("vector", "(embedding::vector(8))", "%s::vector(8)"),
+        ("halfvec", "(embedding::halfvec(8))", "%s::vector(8)::halfvec(8)"),
+        ("bit", "(binary_quantize(embedding)::bit(8))", "binary_quantize(%s::vector(8))::bit(8)"),
+    ],
+)
+def test_coarse_expressions(codec, expr, query):
+    assert pg_codec.coarse_expr(codec, "embedding", 8) == expr
+    assert pg_codec.coarse_query(codec, 8) == query
+
+
+@pytest.mark.parametrize("codec", pg_codec.CODECS)
+def test_ensure_index_creates_partial_hnsw_for_every_codec(codec):
+    con = FakeCon()
+    pg_codec.ensure_index(con, "hm_cloud_embedding", codec, 384)
+    ddl = con.sql[-1]
+    assert ddl.startswith(f"CREATE INDEX IF NOT EXISTS hm_cloud_embedding_{codec}_384_idx ON hm_cloud_embedding USING hnsw")
+    assert pg_codec.coarse_expr(codec, "embedding", 384) in ddl and ddl.endswith("WHERE dims = 384")
+
+
+def test_ensure_index_skips_ddl_when_index_exists():
+    con = FakeCon(existing={"hm_cloud_embedding_vector_384_idx"})
+    pg_codec.ensure_index(con, "hm_cloud_embedding", "vector", 384)
+    assert not any(q.startswith("CREATE") for q in con.sql)
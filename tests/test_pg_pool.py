@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+from hypermemory import pg_pool  # noqa: E402
+
+IDLE = psycopg.pq.TransactionStatus.IDLE
+UNKNOWN = psycopg.pq.TransactionStatus.UNKNOWN
+
+
+class FakeCon:
+    def __init__(self, fail_commit: bool = False):
+        self.closed = False
+        self.broken = False
+        self.autocommit = False
+        self.fail_commit = fail_commit
+        self.info = SimpleNamespace(transaction_status=IDLE)
+        self.adapters = SimpleNamespace(types={"vector": object()})
+
+    def commit(self):
+        if self.fail_commit:
+            raise psycopg.OperationalError("server closed the connection")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    made: list[FakeCon] = []
+    kwargs: list[dict] = []
+
+    def connect(conninfo, **kw):
+        kwargs.append(kw)
+        made.append(FakeCon())
+        return made[-1]
+
+    monkeypatch.setattr(pg_pool.psycopg, "connect", connect)
+    p = pg_pool.ConnectionPool("postgresql://test", pg_pool.PoolConfig(min_size=1, max_size=2, timeout_s=0.1))
+    p.made, p.kwargs = made, kwargs
+    return p
+
+
+def test_reuses_healthy_connection(pool):
+    with pool.connection() as a:
+        pass
+    with pool.connection() as b:
+        pass
+    assert a is b and len(pool.made) == 1
+
+
+def test_discards_connection_that_went_bad_while_idle(pool):
+    with pool.connection() as a:
+        pass
+    a.info.transaction_status = UNKNOWN  # server went away
+    with pool.connection() as b:
+        pass
+    assert b is not a and a.closed
+
+
+def test_discards_when_commit_raises_and_releases_slot(pool):
+    with pytest.raises(psycopg.OperationalError):
+        with pool.connection() as a:
+            a.fail_commit = True
+    assert a.closed and pool._idle == []
+    for _ in range(3):  # slots were released every time
+        with pool.connection():
+            pass
+
+
+def test_body_error_rolls_back_and_keeps_connection(pool):
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("boom")
+    assert len(pool._idle) == 1 and not pool.made[0].closed
+
+
+def test_connect_timeout_is_passed_to_connect(pool):
+    with pool.connection(connect_timeout=5.0):
+        pass
+    assert pool.kwargs[0] == {"connect_timeout": 5}
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import json
+import shutil
+import threading
+from pathlib import Path
+
+import pytest
+
+from hypermemory import tracing
+from hypermemory.tracing import TraceConfig
+
+FIXTURE = Path(__file__).parent / "fixture-workspace"
+
+
+def test_span_is_noop_without_active_trace():
+    with tracing.span("fts.query") as sp:
+        assert sp is None
+    assert tracing.current() is None
+
+
+def test_nested_spans_build_a_tree():
+    with tracing.trace("retrieve", query="q") as root:
+        with tracing.span("fts", rows=3) as a:
+            assert tracing.current() is a
+            with tracing.span("fts.query"):
+                pass
+        with tracing.span("bm25") as b:
+            b.set(hits=2)
+        assert tracing.current() is root
+    assert tracing.current() is None
+
+    d = root.to_dict()
+    assert d["name"] == "retrieve" and d["attrs"] == {"query": "q"} and d["start_ms"] == 0
+    assert [c["name"] for c in d["children"]] == ["fts", "bm25"]
+    fts, bm25 = d["children"]
+    assert fts["attrs"] == {"rows": 3} and [c["name"] for c in fts["children"]] == ["fts.query"]
+    assert bm25["attrs"] == {"hits": 2} and "children" not in bm25
+    assert 0 <= fts["start_ms"] <= bm25["start_ms"] <= d["ms"]
+    assert fts["children"][0]["ms"] <= fts["ms"] <= d["ms"]
+
+
+def test_exception_is_recorded_and_context_restored():
+    with pytest.raises(KeyError):
+        with tracing.trace("retrieve") as root:
+            with tracing.span("vec"):
+                raise KeyError("x")
+    assert root.children[0].attrs == {"error": "KeyError"} and root.attrs == {"error": "KeyError"}
+    assert tracing.current() is None
+
+
+def test_spans_do_not_follow_other_threads():
+    seen = []
+    with tracing.trace("retrieve") as root:
+        t = threading.Thread(target=lambda: seen.append(tracing.current()))
+        t.start()
+        t.join()
+    assert seen == [None] and root.children == []
+
+
+@pytest.mark.parametrize(
+    "env,enabled,slow_ms",
+    [
+        ({}, False, 0.0),
+        ({"HYPERMEMORY_TRACE": "on"}, True, 0.0),
+        ({"HYPERMEMORY_TRACE": "0", "HYPERMEMORY_SLOW_QUERY_MS": "250"}, False, 250.0),
+        ({"HYPERMEMORY_SLOW_QUERY_MS": ""}, False, 0.0),
+    ],
+)
+def test_trace_config_from_env(monkeypatch, env, enabled, slow_ms):
+    for k in ("HYPERMEMORY_TRACE", "HYPERMEMORY_SLOW_QUERY_MS", "HYPERMEMORY_SLOW_QUERY_LOG"):
+        monkeypatch.delenv(k, raising=False)
+    for k, v in env.items():
+        monkeypatch.setenv(k, v)
+    cfg = TraceConfig.from_env()
+    assert (cfg.enabled, cfg.slow_ms, cfg.active) == (enabled, slow_ms, enabled or slow_ms > 0)
+
+
+def test_log_slow_threshold_and_path(tmp_path):
+    with tracing.trace("retrieve") as root:
+        pass
+    assert not tracing.log_slow(TraceConfig(enabled=False, slow_ms=0, slow_log=""), tmp_path, root)
+    assert not tracing.log_slow(TraceConfig(enabled=False, slow_ms=1e9, slow_log=""), tmp_path, root)
+    assert not (tmp_path / "memory").exists()
+
+    assert tracing.log_slow(TraceConfig(enabled=False, slow_ms=1e-9, slow_log=""), tmp_path, root)
+    rec = json.loads((tmp_path / "memory" / "slow-queries.jsonl").read_text(encoding="utf-8"))
+    assert rec["trace"]["name"] == "retrieve" and rec["threshold_ms"] == 1e-9
+
+    custom = tmp_path / "logs" / "slow.jsonl"
+    assert tracing.log_slow(TraceConfig(enabled=False, slow_ms=1e-9, slow_log=str(custom)), tmp_path, root)
+    assert len(custom.read_text(encoding="utf-8").splitlines()) == 1
+
+
+def test_format_tree_indents_children():
+    d = {"name": "retrieve", "start_ms": 0.0, "ms": 2.5, "attrs": {"mode": "broad"}, "children": [{"name": "fts", "start_ms": 0.1, "ms": 1.0}]}
+    lines = tracing.format_tree(d).splitlines()
+    assert lines[0].startswith("retrieve") and lines[0].endswith("mode=broad") and "2.500ms" in lines[0]
+    assert lines[1].startswith("  fts") and lines[1].endswith("+0.100")
+
+
+def test_retrieve_fills_trace_and_slow_log(tmp_path, monkeypatch):
+    from hypermemory.retrieval import retrieve
+
+    ws = tmp_path / "ws"
+    shutil.copytree(FIXTURE, ws)
+    for k in ("DATABASE_URL", "HYPERMEMORY_CLOUD_FALLBACK", "HYPERMEMORY_TRACE", "HYPERMEMORY_SLOW_QUERY_MS", "HYPERMEMORY_SLOW_QUERY_LOG"):
+        monkeypatch.delenv(k, raising=False)
+    monkeypatch.setenv("HYPERMEMORY_VECTOR_BACKEND", "embedded")
+
+    trace: dict = {}
+    hits = retrieve(ws, "deploy", mode="broad", limit=5, trace=trace)
+    assert trace["name"] == "retrieve" and trace["attrs"]["hits"] == len(hits)
+    names = [c["name"] for c in trace["children"]]
+    assert names[-1] == "fuse" and {"fts", "bm25"} <= set(names)
+    assert not (ws / "memory" / "slow-queries.jsonl").exists()
+
+    monkeypatch.setenv("HYPERMEMORY_SLOW_QUERY_MS", "0.000001")
+    retrieve(ws, "deploy", mode="broad", limit=5)
+    assert len((ws / "memory" / "slow-queries.jsonl").read_text(encoding="utf-8").splitlines()) == 1
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from hypermemory import vector_store  # noqa: E402
+from hypermemory.chunks import Chunk  # noqa: E402
+from hypermemory.vector_store import EmbeddedVectorStore, StoreConfig  # noqa: E402
+
+DIMS = 16
+
+
+def _vec(text: str) -> list[float]:
+    rng = np.random.default_rng(sum(map(ord, text)))
+    return rng.standard_normal(DIMS).tolist()
+
+
+def _chunks(*texts: str) -> list[Chunk]:
+    return [Chunk(doc_id="MEMORY.md", source="curated", source_key=f"k{i}", chunk_ix=0, text=t) for i, t in enumerate(texts)]
+
+
+class Embedder:
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def __call__(self, chunks):
+        self.calls.append([c.text for c in chunks])
+        return [_vec(c.text) for c in chunks]
+
+
+@pytest.mark.parametrize("codec", ["none", "int8", "binary"])
+def test_upsert_then_search_finds_exact_vector(tmp_path, codec):
+    store = EmbeddedVectorStore(tmp_path, "m", StoreConfig(codec=codec, hnsw="0"))
+    texts = [f"note {i}" for i in range(40)]
+    emb = Embedder()
+    assert store.upsert(_chunks(*texts), texts, emb) == 40
+    hits = store.search(_vec("note 7"), limit=3)
+    assert hits[0].content == "note 7" and hits[0].sim == pytest.approx(1.0, abs=1e-5)
+    # unchanged corpus: nothing re-embedded
+    assert store.upsert(_chunks(*texts), texts, emb) == 0 and len(emb.calls) == 1
+
+
+def test_removed_chunks_are_deleted_and_matrix_compacted(tmp_path):
+    store = EmbeddedVectorStore(tmp_path, "m", StoreConfig(hnsw="0"))
+    emb = Embedder()
+    texts = ["alpha", "beta", "gamma", "delta"]
+    store.upsert(_chunks(*texts), texts, emb)
+
+    # drop k1/k3; k0 and k2 keep their text and must not be re-embedded
+    kept = [c for c in _chunks(*texts) if c.source_key in ("k0", "k2")]
+    assert store.upsert(kept, [c.text for c in kept], emb) == 0
+    assert len(emb.calls) == 1
+
+    con = sqlite3.connect(store.meta_path)
+    rows = con.execute("SELECT row, content FROM hm_vec_item ORDER BY row").fetchall()
+    assert rows == [(0, "alpha"), (1, "gamma")]
+    assert con.execute("SELECT rows FROM hm_vec_model").fetchone() == (2,)
+    assert store.matrix_path.stat().st_size == 2 * DIMS * 4
+    for t in ("alpha", "gamma"):
+        assert store.search(_vec(t), limit=1)[0].content == t
+    assert "beta" not in [h.content for h in store.search(_vec("beta"), limit=5)]
+
+    assert store.upsert([], [], emb) == 0
+    assert store.search(_vec("alpha")) == []
+
+
+def test_changed_and_removed_in_one_pass(tmp_path):
+    store = EmbeddedVectorStore(tmp_path, "m", StoreConfig(hnsw="0"))
+    emb = Embedder()
+    store.upsert(_chunks("a", "b", "c"), ["a", "b", "c"], emb)
+    cs = _chunks("a", "b2", "c")
+    del cs[0]
+    assert store.upsert(cs, ["b2", "c"], emb) == 1
+    assert store.search(_vec("b2"), limit=1)[0].content == "b2"
+    assert store.search(_vec("c"), limit=1)[0].content == "c"
+
+
+def test_exists_checks_model(tmp_path):
+    assert not vector_store.exists(tmp_path)
+    EmbeddedVectorStore(tmp_path, "model-a", StoreConfig(hnsw="0")).upsert(_chunks("x"), ["x"], Embedder())
+    assert vector_store.exists(tmp_path)
+    assert vector_store.exists(tmp_path, "model-a")
+    assert not vector_store.exists(tmp_path, "model-b")
+
+
+def test_vec_layer_is_empty_without_numpy(tmp_path, monkeypatch):
+    from hypermemory import embed_client, retrieval
+
+    EmbeddedVectorStore(tmp_path, "local", StoreConfig(hnsw="0")).upsert(_chunks("x"), ["x"], Embedder())
+    monkeypatch.setenv("HYPERMEMORY_VECTOR_BACKEND", "embedded")
+    monkeypatch.delenv("HYPERMEMORY_LOCAL_MODEL_ID", raising=False)
+    monkeypatch.setattr(embed_client, "embed_query", lambda *a, **k: _vec("x"))
+    assert retrieval.vec_layer(tmp_path, "x")[0][1].endswith(" x")
+
+    monkeypatch.setattr(vector_store, "np", None)
+    assert retrieval.vec_layer(tmp_path, "x") == []
+
+
+@pytest.mark.parametrize("codec,min_recall", [("int8", 0.99), ("binary", 0.95)])
+def test_codec_recall_at_10_with_default_rerank(tmp_path, codec, min_recall):
+    # clustered synthetic corpus; queries are noisy copies of stored rows
+    rng = np.random.default_rng(0)
+    n, dims = 3000, 128
+    centers = rng.standard_normal((60, dims))
+    x = centers[rng.integers(0, 60, n)] + 0.6 * rng.standard_normal((n, dims))
+    queries = x[rng.integers(0, n, 100)] + 0.3 * rng.standard_normal((100, dims))
+    chunks = [Chunk(doc_id="d", source="curated", source_key=str(i), chunk_ix=0, text=f"t{i}") for i in range(n)]
+    store = EmbeddedVectorStore(tmp_path, "m", StoreConfig(codec=codec, hnsw="0", rerank=10))
+    store.upsert(chunks, [c.text for c in chunks], lambda b: [x[int(c.source_key)] for c in b])
+
+    xn = x / np.linalg.norm(x, axis=1, keepdims=True)
+    recall = []
+    for q in queries:
+        truth = set(np.argsort(-(xn @ (q / np.linalg.norm(q))))[:10].tolist())
+        got = {int(h.source_key) for h in store.search(q, limit=10)}
+        recall.append(len(truth & got) / 10)
+    assert float(np.mean(recall)) >= min_recall